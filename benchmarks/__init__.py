@@ -0,0 +1,7 @@
+import os
+import sys
+
+#benchmarks run against the working tree rather than an installed copy of reconify
+__src = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src')
+if __src not in sys.path:
+    sys.path.insert(0, __src)
@@ -0,0 +1,82 @@
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from . import standInServer
+from reconify import reconifyOpenAIHandler
+
+#import time and cold start of each handler, every run is a fresh interpreter like a new serverless instance
+#usage: python -m benchmarks.coldStart --runs 10 --modes sync,serverless --output results.json
+
+#constants
+DEFAULT_RUNS = 10
+DEFAULT_MODES = 'sync,serverless'
+HANDLERS = ('openai', 'openaiLegacy', 'anthropic', 'mistral', 'cohere', 'bedrock')
+CHILD = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'coldStartChild.py')
+TIMINGS = ('importMs', 'configMs', 'firstCallMs', 'flushMs', 'processMs')
+
+def __spawn(args):
+    started = time.perf_counter()
+    completed = subprocess.run([sys.executable] + args, capture_output=True, text=True, check=True)
+    return completed.stdout, (time.perf_counter() - started) * 1000
+
+def __measure(handler, mode, runs, url):
+    samples = []
+    for _ in range(runs):
+        output, processMs = __spawn([CHILD, handler, mode, url])
+        sample = json.loads(output.strip().splitlines()[-1])
+        sample['processMs'] = processMs
+        samples.append(sample)
+    result = {'handler': handler, 'mode': mode, 'runs': runs, 'loadedOnImport': samples[-1]['loadedOnImport']}
+    for key in TIMINGS:
+        result[key] = round(statistics.median(s[key] for s in samples), 3)
+    return result
+
+def __list(value):
+    return [v.strip() for v in value.split(',') if v.strip()]
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Import time and cold start of the reconify handlers')
+    parser.add_argument('--runs', type=int, default=DEFAULT_RUNS, help='fresh interpreters per measurement, the median is reported')
+    parser.add_argument('--modes', default=DEFAULT_MODES, help='comma separated delivery modes: sync, serverless')
+    parser.add_argument('--handlers', default=None, help='comma separated handlers to run, all by default')
+    parser.add_argument('--output', default=None, help='write the json results to this file instead of stdout')
+    args = parser.parse_args(argv)
+
+    handlers = __list(args.handlers) if args.handlers else HANDLERS
+    server, url = standInServer.spawn()
+    #interpreter start up on its own, so it can be subtracted from processMs
+    baseline = round(statistics.median(__spawn(['-c', 'pass'])[1] for _ in range(args.runs)), 3)
+    results = []
+    for mode in __list(args.modes):
+        for handler in handlers:
+            result = __measure(handler, mode, args.runs, url)
+            results.append(result)
+            print(f"{handler:>12} {mode:>10} import {result['importMs']:.1f}ms config {result['configMs']:.1f}ms "
+                f"first call {result['firstCallMs']:.1f}ms flush {result['flushMs']:.1f}ms "
+                f"process {result['processMs']:.1f}ms", file=sys.stderr)
+    server.terminate()
+
+    report = {
+        'benchmark': 'coldStart',
+        'reconifyVersion': reconifyOpenAIHandler.RECONIFY_MODULE_VERSION,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'timestamp': round(time.time()),
+        'runs': args.runs,
+        'interpreterMs': baseline,
+        'results': results
+    }
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
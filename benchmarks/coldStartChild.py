@@ -0,0 +1,64 @@
+import os
+import sys
+import time
+
+#one cold start in a fresh interpreter, started by coldStart.py and reported as json on stdout
+#nothing else is imported before the handler so its import time is measured from a clean process
+#usage: python benchmarks/coldStartChild.py <handler> <mode> <tracker url>
+
+#modules that used to be imported with every handler
+HEAVY = ('requests', 'urllib3', 'httpx', 'json', 'orjson', 'uuid', 'hashlib', 'inspect')
+
+def __cases(fakeClients):
+    chat = [{'role': 'user', 'content': 'Write a short note about foxes.'}]
+    body = '{"anthropic_version":"bedrock-2023-05-31","max_tokens":256,"messages":[{"role":"user","content":"Write a note"}]}'
+    return {
+        'openai': (fakeClients.openaiClient,
+            lambda c: c.chat.completions.create(model='gpt-4o', messages=chat)),
+        'openaiLegacy': (fakeClients.openaiLegacyModule,
+            lambda c: c.ChatCompletion.create(model='gpt-4', messages=chat)),
+        'anthropic': (fakeClients.anthropicClient,
+            lambda c: c.messages.create(model='claude-3-5-sonnet', max_tokens=256, messages=chat)),
+        'mistral': (fakeClients.mistralClient,
+            lambda c: c.chat(model='mistral-large-latest', messages=chat)),
+        'cohere': (fakeClients.cohereClient,
+            lambda c: c.chat(model='command-r', message='Write a short note about foxes.')),
+        'bedrock': (fakeClients.bedrockClient,
+            lambda c: c.invoke_model(modelId='anthropic.claude-3-haiku-20240307-v1:0', body=body)),
+    }
+
+def main(handler, mode, url):
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    sys.path.insert(0, os.path.join(root, 'src'))
+    #handler name to module, the provider clients are only imported after the handler
+    names = {
+        'openai': 'reconifyOpenAIHandler', 'openaiLegacy': 'reconifyOpenAILegacyHandler', 'anthropic': 'reconifyAnthropicHandler',
+        'mistral': 'reconifyMistralHandler', 'cohere': 'reconifyCohereHandler', 'bedrock': 'reconifyBedrockRuntimeHandler'
+    }
+    started = time.perf_counter()
+    module = __import__('reconify.' + names[handler], fromlist=['config'])
+    imported = time.perf_counter()
+    loaded = [name for name in HEAVY if name in sys.modules]
+
+    #the provider sdks import json themselves, so the fake clients loading it first is realistic
+    sys.path.insert(0, root)
+    from benchmarks import fakeClients
+    factory, call = __cases(fakeClients)[handler]
+    client = factory()
+    options = {'tracker': url + '/track', 'uploader': url + '/upload'}
+    if mode == 'serverless':
+        options['serverless'] = True
+    configStarted = time.perf_counter()
+    module.config(client, 'app', 'key', **options)
+    configured = time.perf_counter()
+    call(client)
+    called = time.perf_counter()
+    module.flush(10)
+    flushed = time.perf_counter()
+
+    print('{"importMs": %.3f, "configMs": %.3f, "firstCallMs": %.3f, "flushMs": %.3f, "loadedOnImport": [%s]}' % (
+        (imported - started) * 1000, (configured - configStarted) * 1000, (called - configured) * 1000,
+        (flushed - called) * 1000, ', '.join('"%s"' % name for name in loaded)))
+
+if __name__ == '__main__':
+    main(sys.argv[1], sys.argv[2], sys.argv[3])
@@ -0,0 +1,136 @@
+import argparse
+import json
+import platform
+import random
+import statistics
+import sys
+import time
+from reconify import reconifyEncoder, reconifyOpenAIHandler, reconifyWire
+
+#cpu spent encoding and compressing tracker payloads against the bytes it saves, on single events and batches
+#usage: python -m benchmarks.compression --repeat 20 --output results.json
+
+#constants
+DEFAULT_REPEAT = 20
+DEFAULT_BATCH = 100
+DEFAULT_CONFIGS = 'json,json+gzip:1,json+gzip:5,json+gzip:9,json+zstd:1,json+zstd:3,msgpack,msgpack+gzip:5,msgpack+zstd:3'
+WORDS = ('the', 'of', 'and', 'to', 'a', 'in', 'is', 'that', 'for', 'it', 'as', 'with', 'was', 'on', 'be', 'by', 'this',
+    'are', 'or', 'from', 'at', 'which', 'can', 'have', 'an', 'not', 'will', 'you', 'your', 'customer', 'order', 'account',
+    'please', 'help', 'return', 'policy', 'shipping', 'refund', 'product', 'price', 'delivery', 'support', 'model',
+    'answer', 'question', 'document', 'section', 'example', 'information', 'service', 'request', 'payment', 'date',
+    'number', 'team', 'data', 'report', 'update', 'issue', 'time', 'days', 'within', 'after', 'before', 'should', 'would',
+    'could', 'also', 'more', 'other', 'available', 'following', 'contact', 'details', 'note', 'case', 'team', 'weather')
+
+def __text(rng, words):
+    #word frequencies fall off like natural text so the compression ratio is close to real prompts
+    picked = rng.choices(WORDS, weights=[1 / (i + 1) for i in range(len(WORDS))], k=words)
+    picked += [str(rng.randint(1, 99999)) for _ in range(words // 25)]
+    rng.shuffle(picked)
+    return ' '.join(picked).capitalize() + '.'
+
+def __payload(rng, messages, response):
+    return {
+        'reconify': {'format': 'openai', 'appKey': 'benchmark', 'apiKey': 'benchmark', 'type': 'chat', 'version': reconifyOpenAIHandler.RECONIFY_MODULE_VERSION},
+        'timestampRequest': int(time.time() * 1000),
+        'timestampResponse': int(time.time() * 1000) + rng.randint(300, 9000),
+        'session': '%032x' % rng.getrandbits(128),
+        'request': {'model': 'gpt-4o', 'temperature': 0.2, 'messages': messages},
+        'response': {
+            'id': 'chatcmpl-%024x' % rng.getrandbits(96),
+            'object': 'chat.completion',
+            'model': 'gpt-4o-2024-08-06',
+            'choices': [{'index': 0, 'message': {'role': 'assistant', 'content': response}, 'finish_reason': 'stop'}],
+            'usage': {'prompt_tokens': rng.randint(50, 30000), 'completion_tokens': rng.randint(20, 800)}
+        }
+    }
+
+def corpus(seed=1):
+    #the sizes of chats seen in practice: a short question, a support conversation and a retrieval prompt
+    rng = random.Random(seed)
+    short = __payload(rng, [{'role': 'user', 'content': __text(rng, 40)}], __text(rng, 120))
+    conversation = []
+    for _ in range(8):
+        conversation.append({'role': 'user', 'content': __text(rng, 60)})
+        conversation.append({'role': 'assistant', 'content': __text(rng, 150)})
+    support = __payload(rng, [{'role': 'system', 'content': __text(rng, 200)}] + conversation + [{'role': 'user', 'content': __text(rng, 40)}], __text(rng, 200))
+    context = '\n\n'.join(f'Document {i}: ' + __text(rng, 400) for i in range(12))
+    retrieval = __payload(rng, [{'role': 'system', 'content': context}, {'role': 'user', 'content': __text(rng, 30)}], __text(rng, 300))
+    return {'short': short, 'conversation': support, 'retrieval': retrieval}
+
+def __parse(config):
+    #encoding[+compression[:level]]
+    encoding, _, compression = config.partition('+')
+    compression, _, level = compression.partition(':')
+    return encoding, compression or None, int(level) if level else None
+
+def __time(function, repeat):
+    #median of repeat runs, in microseconds
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = function()
+        samples.append(time.perf_counter() - started)
+    return result, statistics.median(samples) * 1e6
+
+def __measure(config, name, payloads, repeat):
+    encoding, compression, level = __parse(config)
+    reconifyEncoder.configure(encoding=encoding)
+    reconifyWire.configure(compression=compression, compressionLevel=level, compressionThreshold=0)
+    plain = sum(len(reconifyEncoder.encodePayload(p, False)) for p in payloads)
+    bodies, encodeUs = __time(lambda: [reconifyEncoder.encodePayload(p) for p in payloads], repeat)
+    body = bodies[0] if len(bodies) == 1 else reconifyEncoder.frame(bodies)
+    (data, headers), compressUs = __time(lambda: reconifyWire.prepare('http://localhost/track', body), repeat)
+    #without the optional package the encoding or compression falls back, reported as what was used
+    used = ('msgpack' if reconifyEncoder.isBinary(body) else 'json') + ('+' + headers['Content-Encoding'] if 'Content-Encoding' in headers else '')
+    saved = plain - len(data)
+    return {
+        'config': config,
+        'used': used,
+        'corpus': name,
+        'events': len(payloads),
+        'jsonBytes': plain,
+        'wireBytes': len(data),
+        'ratio': round(plain / len(data), 2),
+        'encodeUs': round(encodeUs, 1),
+        'compressUs': round(compressUs, 1),
+        'usPerKbSaved': round((encodeUs + compressUs) / (saved / 1024), 2) if saved > 0 else None
+    }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='CPU against bytes saved for the tracker encodings and compressions')
+    parser.add_argument('--repeat', type=int, default=DEFAULT_REPEAT, help='runs per measurement, the median is reported')
+    parser.add_argument('--batch', type=int, default=DEFAULT_BATCH, help='events in the batch measurements')
+    parser.add_argument('--configs', default=DEFAULT_CONFIGS, help='comma separated encoding[+compression[:level]]')
+    parser.add_argument('--output', default=None, help='write the json results to this file instead of stdout')
+    args = parser.parse_args(argv)
+
+    payloads = corpus()
+    #a batch mixes the chat sizes like a busy application would
+    mixed = [corpus(seed)[name] for seed in range(args.batch) for name in ('short', 'conversation', 'retrieval')][:args.batch]
+    cases = [(name, [payload]) for name, payload in payloads.items()] + [(f'batch{args.batch}', mixed)]
+    results = []
+    for config in [c.strip() for c in args.configs.split(',') if c.strip()]:
+        for name, events in cases:
+            result = __measure(config, name, events, args.repeat)
+            results.append(result)
+            print(f"{result['used']:>13} {config:>15} {name:>12} {result['jsonBytes']:>8}B -> {result['wireBytes']:>8}B "
+                f"x{result['ratio']:<5} encode {result['encodeUs']:.0f}us compress {result['compressUs']:.0f}us", file=sys.stderr)
+
+    report = {
+        'benchmark': 'compression',
+        'reconifyVersion': reconifyOpenAIHandler.RECONIFY_MODULE_VERSION,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'timestamp': round(time.time()),
+        'repeat': args.repeat,
+        'results': results
+    }
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
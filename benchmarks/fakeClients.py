@@ -0,0 +1,218 @@
+import base64
+import io
+import json
+import os
+import time
+from types import SimpleNamespace
+
+#fake provider clients with the same call surface the handlers patch, responses are canned
+#and every factory returns a new client so each one is only configured once
+
+IMAGE_B64 = base64.b64encode(os.urandom(48 * 1024)).decode('ascii')
+CHAT_TEXT = 'The quick brown fox jumps over the lazy dog. ' * 8
+MESSAGES = [
+    {'role': 'system', 'content': 'You are a helpful assistant. ' * 20},
+    {'role': 'user', 'content': 'Write a short note about foxes.'}
+]
+
+def __usage():
+    return SimpleNamespace(prompt_tokens=120, completion_tokens=80, total_tokens=200)
+
+def __openaiChat(**kwargs):
+    message = SimpleNamespace(role='assistant', content=CHAT_TEXT, tool_calls=None)
+    return SimpleNamespace(id='chatcmpl-1', object='chat.completion', created=int(time.time()), model=kwargs.get('model'),
+        choices=[SimpleNamespace(index=0, message=message, finish_reason='stop')], usage=__usage())
+
+def __openaiCompletion(**kwargs):
+    return SimpleNamespace(id='cmpl-1', object='text_completion', created=int(time.time()), model=kwargs.get('model'),
+        choices=[SimpleNamespace(index=0, text=CHAT_TEXT, finish_reason='stop')], usage=__usage())
+
+def __openaiImage(**kwargs):
+    if kwargs.get('response_format') == 'b64_json':
+        data = [SimpleNamespace(b64_json=IMAGE_B64, url=None, revised_prompt=None)]
+    else:
+        data = [SimpleNamespace(b64_json=None, url='https://example.com/image.png', revised_prompt=None)]
+    return SimpleNamespace(created=int(time.time()), data=data)
+
+def openaiClient():
+    return SimpleNamespace(
+        chat=SimpleNamespace(completions=SimpleNamespace(create=__openaiChat)),
+        completions=SimpleNamespace(create=__openaiCompletion),
+        images=SimpleNamespace(generate=__openaiImage)
+    )
+
+def openaiLegacyModule():
+    def chat(**kwargs):
+        return {'id': 'chatcmpl-1', 'object': 'chat.completion', 'model': kwargs.get('model'),
+            'choices': [{'index': 0, 'message': {'role': 'assistant', 'content': CHAT_TEXT}, 'finish_reason': 'stop'}],
+            'usage': {'prompt_tokens': 120, 'completion_tokens': 80, 'total_tokens': 200}}
+    def completion(**kwargs):
+        return {'id': 'cmpl-1', 'object': 'text_completion', 'model': kwargs.get('model'),
+            'choices': [{'index': 0, 'text': CHAT_TEXT, 'finish_reason': 'stop'}],
+            'usage': {'prompt_tokens': 120, 'completion_tokens': 80, 'total_tokens': 200}}
+    def image(**kwargs):
+        if kwargs.get('response_format') == 'b64_json':
+            return {'created': int(time.time()), 'data': [{'b64_json': IMAGE_B64}]}
+        return {'created': int(time.time()), 'data': [{'url': 'https://example.com/image.png'}]}
+    return SimpleNamespace(
+        ChatCompletion=SimpleNamespace(create=chat),
+        Completion=SimpleNamespace(create=completion),
+        Image=SimpleNamespace(create=image)
+    )
+
+def anthropicClient():
+    def messages(**kwargs):
+        return SimpleNamespace(id='msg_1', type='message', role='assistant', model=kwargs.get('model'),
+            content=[SimpleNamespace(type='text', text=CHAT_TEXT)], stop_reason='end_turn', stop_sequence=None,
+            usage=SimpleNamespace(input_tokens=120, output_tokens=80))
+    def completion(**kwargs):
+        return SimpleNamespace(id='compl_1', type='completion', completion=CHAT_TEXT, stop_reason='stop_sequence', model=kwargs.get('model'))
+    return SimpleNamespace(
+        messages=SimpleNamespace(create=messages),
+        completions=SimpleNamespace(create=completion)
+    )
+
+def mistralClient():
+    def chat(**kwargs):
+        message = SimpleNamespace(role='assistant', content=CHAT_TEXT, tool_calls=None)
+        return SimpleNamespace(id='cmpl-1', object='chat.completion', created=int(time.time()), model=kwargs.get('model'),
+            choices=[SimpleNamespace(index=0, message=message, finish_reason='stop')], usage=__usage())
+    return SimpleNamespace(chat=chat)
+
+def cohereClient():
+    def chat(**kwargs):
+        return SimpleNamespace(text=CHAT_TEXT, generation_id='gen-1', finish_reason='COMPLETE',
+            meta={'billed_units': {'input_tokens': 120, 'output_tokens': 80}})
+    def generate(**kwargs):
+        return [SimpleNamespace(id='gen-1', text=CHAT_TEXT, finish_reason='COMPLETE')]
+    return SimpleNamespace(chat=chat, generate=generate)
+
+#stands in for botocore's EventStream, events can only be iterated once
+class FakeEventStream:
+    def __init__(self, events):
+        self._events = iter(events)
+        self.closed = False
+
+    def __iter__(self):
+        return self._events
+
+    def close(self):
+        self.closed = True
+
+def __bedrockChunks(model):
+    words = [w + ' ' for w in CHAT_TEXT.split(' ')]
+    metrics = {'inputTokenCount': 120, 'outputTokenCount': 80, 'invocationLatency': 900, 'firstByteLatency': 200}
+    if model.startswith('anthropic.'):
+        chunks = [{'type': 'message_start', 'message': {'id': 'msg_1', 'role': 'assistant', 'model': model, 'usage': {'input_tokens': 120}}},
+            {'type': 'content_block_start', 'index': 0, 'content_block': {'type': 'text', 'text': ''}}]
+        chunks += [{'type': 'content_block_delta', 'index': 0, 'delta': {'type': 'text_delta', 'text': w}} for w in words]
+        chunks += [{'type': 'message_delta', 'delta': {'stop_reason': 'end_turn'}, 'usage': {'output_tokens': 80}},
+            {'type': 'message_stop', 'amazon-bedrock-invocationMetrics': metrics}]
+    elif model.startswith('meta.'):
+        chunks = [{'generation': w, 'prompt_token_count': None, 'generation_token_count': i + 1, 'stop_reason': None} for i, w in enumerate(words)]
+        chunks.append({'generation': '', 'stop_reason': 'stop', 'amazon-bedrock-invocationMetrics': metrics})
+    elif model.startswith('mistral.'):
+        chunks = [{'outputs': [{'text': w, 'stop_reason': None}]} for w in words]
+        chunks.append({'outputs': [{'text': '', 'stop_reason': 'stop'}], 'amazon-bedrock-invocationMetrics': metrics})
+    elif model.startswith('cohere.'):
+        chunks = [{'generations': [{'text': w}], 'is_finished': False} for w in words]
+        chunks.append({'is_finished': True, 'finish_reason': 'COMPLETE', 'amazon-bedrock-invocationMetrics': metrics})
+    else:
+        chunks = [{'outputText': w, 'index': 0, 'totalOutputTextTokenCount': None, 'completionReason': None, 'inputTextTokenCount': 120} for w in words]
+        chunks.append({'outputText': '', 'totalOutputTextTokenCount': 80, 'completionReason': 'FINISH', 'amazon-bedrock-invocationMetrics': metrics})
+    return [{'chunk': {'bytes': json.dumps(chunk).encode('utf-8')}} for chunk in chunks]
+
+def __converseEvents():
+    events = [{'messageStart': {'role': 'assistant'}}]
+    events += [{'contentBlockDelta': {'delta': {'text': w + ' '}, 'contentBlockIndex': 0}} for w in CHAT_TEXT.split(' ')]
+    events += [{'contentBlockStop': {'contentBlockIndex': 0}}, {'messageStop': {'stopReason': 'end_turn'}},
+        {'metadata': {'usage': {'inputTokens': 120, 'outputTokens': 80, 'totalTokens': 200}, 'metrics': {'latencyMs': 900}}}]
+    return events
+
+def bedrockClient():
+    def invokeModel(**kwargs):
+        model = kwargs.get('modelId', '')
+        if model.startswith('stability.'):
+            body = {'result': 'success', 'artifacts': [{'seed': 1, 'base64': IMAGE_B64, 'finishReason': 'SUCCESS'}]}
+        else:
+            body = {'id': 'msg_1', 'type': 'message', 'role': 'assistant', 'content': [{'type': 'text', 'text': CHAT_TEXT}],
+                'stop_reason': 'end_turn', 'usage': {'input_tokens': 120, 'output_tokens': 80}}
+        #a new stream per call, like botocore's StreamingBody it can only be read once
+        return {'ResponseMetadata': {'RequestId': 'req-1', 'HTTPStatusCode': 200}, 'contentType': 'application/json',
+            'body': io.BytesIO(json.dumps(body).encode('utf-8'))}
+    def invokeModelWithResponseStream(**kwargs):
+        return {'ResponseMetadata': {'RequestId': 'req-1', 'HTTPStatusCode': 200}, 'contentType': 'application/json',
+            'body': FakeEventStream(__bedrockChunks(kwargs.get('modelId', '')))}
+    def converse(**kwargs):
+        return {'ResponseMetadata': {'RequestId': 'req-1', 'HTTPStatusCode': 200},
+            'output': {'message': {'role': 'assistant', 'content': [{'text': CHAT_TEXT}]}}, 'stopReason': 'end_turn',
+            'usage': {'inputTokens': 120, 'outputTokens': 80, 'totalTokens': 200}, 'metrics': {'latencyMs': 900}}
+    def converseStream(**kwargs):
+        return {'ResponseMetadata': {'RequestId': 'req-1', 'HTTPStatusCode': 200}, 'stream': FakeEventStream(__converseEvents())}
+    return SimpleNamespace(invoke_model=invokeModel, invoke_model_with_response_stream=invokeModelWithResponseStream,
+        converse=converse, converse_stream=converseStream)
+
+#async clients are the real AsyncOpenAI and AsyncAnthropic over a mock transport, so the sdk decorators that
+#hide coroutine methods from inspection are part of what is measured, latency is the simulated model time
+def __httpx(sdk):
+    #the http library the sdk is built on, newer releases use httpx2
+    import importlib
+    return importlib.import_module(sdk.DefaultAsyncHttpxClient.__mro__[1].__module__.split('.')[0])
+
+def __sse(events):
+    #server-sent events from (event name or None, data) pairs
+    lines = []
+    for event, data in events:
+        if event:
+            lines.append(f'event: {event}\n')
+        lines.append(f'data: {data if isinstance(data, str) else json.dumps(data)}\n\n')
+    return ''.join(lines).encode('utf-8')
+
+def __openaiResponse(body):
+    words = [w + ' ' for w in CHAT_TEXT.split(' ')]
+    model = body.get('model')
+    if not body.get('stream'):
+        return {'id': 'chatcmpl-1', 'object': 'chat.completion', 'created': int(time.time()), 'model': model,
+            'choices': [{'index': 0, 'message': {'role': 'assistant', 'content': CHAT_TEXT}, 'finish_reason': 'stop'}],
+            'usage': {'prompt_tokens': 120, 'completion_tokens': 80, 'total_tokens': 200}}
+    chunk = {'id': 'chatcmpl-1', 'object': 'chat.completion.chunk', 'created': int(time.time()), 'model': model}
+    events = [(None, dict(chunk, choices=[{'index': 0, 'delta': {'role': 'assistant', 'content': w}, 'finish_reason': None}])) for w in words]
+    events.append((None, dict(chunk, choices=[{'index': 0, 'delta': {}, 'finish_reason': 'stop'}])))
+    events.append((None, '[DONE]'))
+    return __sse(events)
+
+def __anthropicResponse(body):
+    words = [w + ' ' for w in CHAT_TEXT.split(' ')]
+    message = {'id': 'msg_1', 'type': 'message', 'role': 'assistant', 'model': body.get('model'), 'content': [],
+        'stop_reason': None, 'stop_sequence': None, 'usage': {'input_tokens': 120, 'output_tokens': 0}}
+    if not body.get('stream'):
+        return dict(message, content=[{'type': 'text', 'text': CHAT_TEXT}], stop_reason='end_turn', usage={'input_tokens': 120, 'output_tokens': 80})
+    events = [('message_start', {'type': 'message_start', 'message': message}),
+        ('content_block_start', {'type': 'content_block_start', 'index': 0, 'content_block': {'type': 'text', 'text': ''}})]
+    events += [('content_block_delta', {'type': 'content_block_delta', 'index': 0, 'delta': {'type': 'text_delta', 'text': w}}) for w in words]
+    events += [('content_block_stop', {'type': 'content_block_stop', 'index': 0}),
+        ('message_delta', {'type': 'message_delta', 'delta': {'stop_reason': 'end_turn', 'stop_sequence': None}, 'usage': {'output_tokens': 80}}),
+        ('message_stop', {'type': 'message_stop'})]
+    return __sse(events)
+
+def __mockHttpClient(sdk, respond, latency):
+    httpx = __httpx(sdk)
+    async def handle(request):
+        if latency:
+            import asyncio
+            await asyncio.sleep(latency)
+        body = respond(json.loads(request.content))
+        if isinstance(body, bytes):
+            return httpx.Response(200, content=body, headers={'content-type': 'text/event-stream'})
+        return httpx.Response(200, json=body)
+    return httpx.AsyncClient(transport=httpx.MockTransport(handle))
+
+def asyncOpenaiClient(latency=0):
+    import openai
+    return openai.AsyncOpenAI(api_key='benchmark', base_url='http://openai.invalid/v1', max_retries=0,
+        http_client=__mockHttpClient(openai, __openaiResponse, latency))
+
+def asyncAnthropicClient(latency=0):
+    import anthropic
+    return anthropic.AsyncAnthropic(api_key='benchmark', base_url='http://anthropic.invalid', max_retries=0,
+        http_client=__mockHttpClient(anthropic, __anthropicResponse, latency))
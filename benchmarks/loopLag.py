@@ -0,0 +1,143 @@
+import argparse
+import asyncio
+import json
+import platform
+import sys
+import time
+from . import fakeClients
+from . import standInServer
+from reconify import reconifyAnthropicHandler
+from reconify import reconifyOpenAIHandler
+from reconify import reconifyTransport
+
+#event loop lag under concurrent async calls, with and without instrumentation, against the real sdk clients
+#over a mock transport that simulates the model time, and a stand-in tracker in its own process
+#usage: python -m benchmarks.loopLag --concurrency 1,16,64,256 --seconds 3 --modes background,batch --output results.json
+
+#constants
+DEFAULT_CONCURRENCY = '1,16,64,256'
+DEFAULT_SECONDS = 3
+DEFAULT_LATENCY = 0.02
+DEFAULT_MODES = 'background,batch'
+TICK = 0.005
+FLUSH_TIMEOUT = 60
+#async clients always send from the background sender
+MODES = {
+    'background': {'batch': False},
+    'batch': {'batch': True}
+}
+#handler, path, handler module, client factory, call
+CASES = [
+    ('openai', 'chat', reconifyOpenAIHandler, fakeClients.asyncOpenaiClient,
+        lambda c: c.chat.completions.create(model='gpt-4o', messages=fakeClients.MESSAGES)),
+    ('openai', 'stream', reconifyOpenAIHandler, fakeClients.asyncOpenaiClient, lambda c: __drain(
+        c.chat.completions.create(model='gpt-4o', messages=fakeClients.MESSAGES, stream=True))),
+    ('anthropic', 'chat', reconifyAnthropicHandler, fakeClients.asyncAnthropicClient,
+        lambda c: c.messages.create(model='claude-3-5-sonnet', max_tokens=256, messages=fakeClients.MESSAGES[1:])),
+    ('anthropic', 'stream', reconifyAnthropicHandler, fakeClients.asyncAnthropicClient, lambda c: __drain(
+        c.messages.create(model='claude-3-5-sonnet', max_tokens=256, messages=fakeClients.MESSAGES[1:], stream=True)))
+]
+
+async def __drain(create):
+    stream = await create
+    async for _ in stream:
+        pass
+
+def __percentile(samples, p):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * p))]
+
+async def __run(call, client, concurrency, seconds):
+    #lag is how late a TICK second sleep wakes up while the calls run
+    lags = []
+    calls = 0
+    end = time.perf_counter() + seconds
+    async def monitor():
+        while time.perf_counter() < end:
+            started = time.perf_counter()
+            await asyncio.sleep(TICK)
+            lags.append(time.perf_counter() - started - TICK)
+    async def worker():
+        nonlocal calls
+        while time.perf_counter() < end:
+            await call(client)
+            calls += 1
+    await asyncio.gather(monitor(), *[worker() for _ in range(concurrency)])
+    return {
+        'calls': calls,
+        'callsPerSecond': round(calls / seconds, 1),
+        'lagP50Ms': round(__percentile(lags, 0.5) * 1000, 3),
+        'lagP99Ms': round(__percentile(lags, 0.99) * 1000, 3),
+        'lagMaxMs': round(max(lags) * 1000, 3)
+    }
+
+def __measure(case, mode, concurrencies, seconds, latency, url):
+    handler, path, module, factory, call = case
+    raw = factory(latency)
+    instrumented = factory(latency)
+    module.config(instrumented, 'benchmark', 'benchmark', tracker=url + '/track', **MODES[mode])
+    results = []
+    for concurrency in concurrencies:
+        baseline = asyncio.run(__run(call, raw, concurrency, seconds))
+        standInServer.reset(url)
+        measured = asyncio.run(__run(call, instrumented, concurrency, seconds))
+        reconifyTransport.flush(FLUSH_TIMEOUT)
+        results.append({
+            'handler': handler,
+            'path': path,
+            'mode': mode,
+            'concurrency': concurrency,
+            'baseline': baseline,
+            'instrumented': measured,
+            'addedLagP99Ms': round(measured['lagP99Ms'] - baseline['lagP99Ms'], 3),
+            'tracker': standInServer.snapshot(url)
+        })
+    return results
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Event loop lag of the async handlers under concurrent load')
+    parser.add_argument('--concurrency', default=DEFAULT_CONCURRENCY, help='comma separated numbers of concurrent tasks')
+    parser.add_argument('--seconds', type=float, default=DEFAULT_SECONDS, help='seconds per measurement')
+    parser.add_argument('--latency', type=float, default=DEFAULT_LATENCY, help='simulated model time in seconds for each call')
+    parser.add_argument('--modes', default=DEFAULT_MODES, help='comma separated delivery modes: ' + ', '.join(MODES))
+    parser.add_argument('--handlers', default=None, help='comma separated handlers to run, all by default')
+    parser.add_argument('--output', default=None, help='write the json results to this file instead of stdout')
+    args = parser.parse_args(argv)
+
+    concurrencies = [int(c) for c in args.concurrency.split(',') if c.strip()]
+    handlers = [h.strip() for h in args.handlers.split(',')] if args.handlers else None
+    server, url = standInServer.spawn()
+    results = []
+    for mode in [m.strip() for m in args.modes.split(',') if m.strip()]:
+        for case in CASES:
+            if handlers is not None and case[0] not in handlers:
+                continue
+            for result in __measure(case, mode, concurrencies, args.seconds, args.latency, url):
+                results.append(result)
+                baseline = result['baseline']
+                measured = result['instrumented']
+                print(f"{result['handler']:>10} {result['path']:>7} {mode:>10} {result['concurrency']:>4} tasks "
+                    f"lag p99 {baseline['lagP99Ms']:.2f}ms -> {measured['lagP99Ms']:.2f}ms "
+                    f"max {baseline['lagMaxMs']:.2f}ms -> {measured['lagMaxMs']:.2f}ms "
+                    f"{baseline['callsPerSecond']:.0f} -> {measured['callsPerSecond']:.0f} calls/s", file=sys.stderr)
+    server.terminate()
+
+    report = {
+        'benchmark': 'loopLag',
+        'reconifyVersion': reconifyOpenAIHandler.RECONIFY_MODULE_VERSION,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'timestamp': round(time.time()),
+        'seconds': args.seconds,
+        'latency': args.latency,
+        'results': results
+    }
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,203 @@
+import argparse
+import json
+import platform
+import sys
+import threading
+import time
+import tracemalloc
+from . import fakeClients
+from . import standInServer
+from reconify import reconifyTransport
+from reconify import reconifyOpenAIHandler
+from reconify import reconifyOpenAILegacyHandler
+from reconify import reconifyAnthropicHandler
+from reconify import reconifyMistralHandler
+from reconify import reconifyCohereHandler
+from reconify import reconifyBedrockRuntimeHandler
+
+#per call overhead of the handlers against fake provider clients and a local stand-in tracker
+#usage: python -m benchmarks.overhead --threads 1,4,16,64 --calls 2000 --output results.json
+
+#constants
+DEFAULT_THREADS = '1,4,16,64'
+DEFAULT_CALLS = 2000
+DEFAULT_MODES = 'sync,background'
+WARMUP_CALLS = 20
+ALLOCATION_CALLS = 200
+FLUSH_TIMEOUT = 60
+MODES = {
+    'sync': {'background': False},
+    'background': {'background': True}
+}
+BEDROCK_CHAT_BODY = json.dumps({'anthropic_version': 'bedrock-2023-05-31', 'max_tokens': 256, 'messages': fakeClients.MESSAGES[1:]})
+BEDROCK_IMAGE_BODY = json.dumps({'text_prompts': [{'text': 'a fox in the snow'}], 'cfg_scale': 7, 'steps': 30})
+
+#handler, path, handler module, client factory, call
+CASES = [
+    ('openai', 'chat', reconifyOpenAIHandler, fakeClients.openaiClient,
+        lambda c: c.chat.completions.create(model='gpt-4o', messages=fakeClients.MESSAGES)),
+    ('openai', 'completion', reconifyOpenAIHandler, fakeClients.openaiClient,
+        lambda c: c.completions.create(model='gpt-3.5-turbo-instruct', prompt='Write a short note about foxes.')),
+    ('openai', 'image', reconifyOpenAIHandler, fakeClients.openaiClient,
+        lambda c: c.images.generate(model='dall-e-3', prompt='a fox in the snow', response_format='b64_json')),
+    ('openaiLegacy', 'chat', reconifyOpenAILegacyHandler, fakeClients.openaiLegacyModule,
+        lambda c: c.ChatCompletion.create(model='gpt-4', messages=fakeClients.MESSAGES)),
+    ('openaiLegacy', 'completion', reconifyOpenAILegacyHandler, fakeClients.openaiLegacyModule,
+        lambda c: c.Completion.create(model='text-davinci-003', prompt='Write a short note about foxes.')),
+    ('openaiLegacy', 'image', reconifyOpenAILegacyHandler, fakeClients.openaiLegacyModule,
+        lambda c: c.Image.create(prompt='a fox in the snow', response_format='b64_json')),
+    ('anthropic', 'chat', reconifyAnthropicHandler, fakeClients.anthropicClient,
+        lambda c: c.messages.create(model='claude-3-5-sonnet', max_tokens=256, messages=fakeClients.MESSAGES[1:])),
+    ('anthropic', 'completion', reconifyAnthropicHandler, fakeClients.anthropicClient,
+        lambda c: c.completions.create(model='claude-2.1', max_tokens_to_sample=256, prompt='\n\nHuman: Write a note\n\nAssistant:')),
+    ('mistral', 'chat', reconifyMistralHandler, fakeClients.mistralClient,
+        lambda c: c.chat(model='mistral-large-latest', messages=fakeClients.MESSAGES)),
+    ('cohere', 'chat', reconifyCohereHandler, fakeClients.cohereClient,
+        lambda c: c.chat(model='command-r', message='Write a short note about foxes.')),
+    ('cohere', 'completion', reconifyCohereHandler, fakeClients.cohereClient,
+        lambda c: c.generate(model='command', prompt='Write a short note about foxes.')),
+    ('bedrock', 'chat', reconifyBedrockRuntimeHandler, fakeClients.bedrockClient,
+        lambda c: c.invoke_model(modelId='anthropic.claude-3-haiku-20240307-v1:0', body=BEDROCK_CHAT_BODY)),
+    ('bedrock', 'image', reconifyBedrockRuntimeHandler, fakeClients.bedrockClient,
+        lambda c: c.invoke_model(modelId='stability.stable-diffusion-xl-v1', body=BEDROCK_IMAGE_BODY)),
+    ('bedrock', 'stream', reconifyBedrockRuntimeHandler, fakeClients.bedrockClient,
+        lambda c: list(c.invoke_model_with_response_stream(modelId='anthropic.claude-3-haiku-20240307-v1:0', body=BEDROCK_CHAT_BODY)['body'])),
+    ('bedrock', 'converse', reconifyBedrockRuntimeHandler, fakeClients.bedrockClient,
+        lambda c: c.converse(modelId='anthropic.claude-3-haiku-20240307-v1:0', messages=[{'role': 'user', 'content': [{'text': 'Write a note'}]}])),
+    ('bedrock', 'converseStream', reconifyBedrockRuntimeHandler, fakeClients.bedrockClient,
+        lambda c: list(c.converse_stream(modelId='anthropic.claude-3-haiku-20240307-v1:0', messages=[{'role': 'user', 'content': [{'text': 'Write a note'}]}])['stream'])),
+]
+
+def __percentile(values, q):
+    return values[min(len(values) - 1, int(round(q * (len(values) - 1))))]
+
+def __run(call, client, threads, calls, drain=False):
+    #latency of each call as seen by the caller, cpu covers the whole process including the senders
+    perThread = max(1, calls // threads)
+    barrier = threading.Barrier(threads + 1)
+    latencies = [None] * threads
+    def worker(index):
+        local = []
+        barrier.wait()
+        for _ in range(perThread):
+            start = time.perf_counter()
+            call(client)
+            local.append(time.perf_counter() - start)
+        latencies[index] = local
+    workers = [threading.Thread(target=worker, args=(i,)) for i in range(threads)]
+    for w in workers:
+        w.start()
+    barrier.wait()
+    cpuStart = time.process_time()
+    wallStart = time.perf_counter()
+    for w in workers:
+        w.join()
+    wall = time.perf_counter() - wallStart
+    if drain:
+        reconifyTransport.flush(FLUSH_TIMEOUT)
+    cpu = time.process_time() - cpuStart
+    merged = sorted(l for local in latencies for l in local)
+    return {
+        'calls': len(merged),
+        'p50Us': round(__percentile(merged, 0.5) * 1e6, 2),
+        'p99Us': round(__percentile(merged, 0.99) * 1e6, 2),
+        'cpuUsPerCall': round(cpu / len(merged) * 1e6, 2),
+        'callsPerSecond': round(len(merged) / wall, 1)
+    }
+
+def __allocations(call, client, calls):
+    #peak bytes allocated while a single call runs, averaged over calls
+    if not hasattr(tracemalloc, 'reset_peak'):
+        return None
+    tracemalloc.start()
+    total = 0
+    for _ in range(calls):
+        tracemalloc.reset_peak()
+        start = tracemalloc.get_traced_memory()[0]
+        call(client)
+        total += tracemalloc.get_traced_memory()[1] - start
+    tracemalloc.stop()
+    reconifyTransport.flush(FLUSH_TIMEOUT)
+    return round(total / calls)
+
+def __measure(case, mode, threadCounts, calls, url):
+    handler, path, module, factory, call = case
+    raw = factory()
+    instrumented = factory()
+    module.config(instrumented, 'benchmark', 'benchmark', tracker=url + '/track', uploader=url + '/upload', **MODES[mode])
+    for _ in range(WARMUP_CALLS):
+        call(raw)
+        call(instrumented)
+    reconifyTransport.flush(FLUSH_TIMEOUT)
+    rawAllocations = __allocations(call, raw, ALLOCATION_CALLS)
+    allocations = __allocations(call, instrumented, ALLOCATION_CALLS)
+    results = []
+    for threads in threadCounts:
+        dropped = reconifyTransport.getDroppedCounts()
+        standInServer.reset(url)
+        baseline = __run(call, raw, threads, calls)
+        measured = __run(call, instrumented, threads, calls, drain=True)
+        droppedAfter = reconifyTransport.getDroppedCounts()
+        results.append({
+            'handler': handler,
+            'path': path,
+            'mode': mode,
+            'threads': threads,
+            'baseline': baseline,
+            'instrumented': measured,
+            'addedP50Us': round(measured['p50Us'] - baseline['p50Us'], 2),
+            'addedP99Us': round(measured['p99Us'] - baseline['p99Us'], 2),
+            'addedCpuUsPerCall': round(measured['cpuUsPerCall'] - baseline['cpuUsPerCall'], 2),
+            'addedAllocatedBytesPerCall': None if allocations is None else allocations - rawAllocations,
+            'tracker': standInServer.snapshot(url),
+            'dropped': {k: droppedAfter[k] - dropped.get(k, 0) for k in droppedAfter}
+        })
+    return results
+
+def __list(value):
+    return [v.strip() for v in value.split(',') if v.strip()]
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Per call overhead of the reconify handlers')
+    parser.add_argument('--threads', default=DEFAULT_THREADS, help='comma separated thread counts')
+    parser.add_argument('--calls', type=int, default=DEFAULT_CALLS, help='calls per measurement, split across the threads')
+    parser.add_argument('--modes', default=DEFAULT_MODES, help='comma separated delivery modes: ' + ', '.join(MODES))
+    parser.add_argument('--handlers', default=None, help='comma separated handlers to run, all by default')
+    parser.add_argument('--paths', default=None, help='comma separated paths to run (chat, completion, image, stream, converse, converseStream), all by default')
+    parser.add_argument('--output', default=None, help='write the json results to this file instead of stdout')
+    args = parser.parse_args(argv)
+
+    threadCounts = [int(t) for t in __list(args.threads)]
+    handlers = __list(args.handlers) if args.handlers else None
+    paths = __list(args.paths) if args.paths else None
+    server, url = standInServer.spawn()
+    results = []
+    for mode in __list(args.modes):
+        for case in CASES:
+            if (handlers and case[0] not in handlers) or (paths and case[1] not in paths):
+                continue
+            for result in __measure(case, mode, threadCounts, args.calls, url):
+                results.append(result)
+                print(f"{result['handler']:>12} {result['path']:>10} {result['mode']:>10} {result['threads']:>3} threads "
+                    f"p50 +{result['addedP50Us']:.1f}us p99 +{result['addedP99Us']:.1f}us cpu +{result['addedCpuUsPerCall']:.1f}us "
+                    f"alloc +{result['addedAllocatedBytesPerCall']}B", file=sys.stderr)
+    server.terminate()
+
+    report = {
+        'benchmark': 'overhead',
+        'reconifyVersion': reconifyOpenAIHandler.RECONIFY_MODULE_VERSION,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'timestamp': round(time.time()),
+        'calls': args.calls,
+        'results': results
+    }
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
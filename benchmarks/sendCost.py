@@ -0,0 +1,124 @@
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+from . import fakeClients
+from . import standInServer
+from reconify import reconifyAnthropicHandler
+from reconify import reconifyOpenAIHandler
+from reconify import reconifyTransport
+
+#per event send cost against a local https stand-in, a new connection for every post as before the shared pool
+#against the pool, and openai and anthropic handlers in one process sharing it
+#usage: python -m benchmarks.sendCost --events 500 --modes unpooled,pooled,handlers --output results.json
+
+#constants
+DEFAULT_EVENTS = 500
+DEFAULT_MODES = 'unpooled,pooled,handlers'
+WARMUP_EVENTS = 10
+MODES = ('unpooled', 'pooled', 'handlers', 'http2')
+EVENT = {
+    'reconify': {'format': 'openai', 'appKey': 'benchmark', 'apiKey': 'benchmark', 'type': 'chat', 'version': reconifyOpenAIHandler.RECONIFY_MODULE_VERSION},
+    'request': {'model': 'gpt-4o', 'messages': fakeClients.MESSAGES},
+    'response': {'choices': [{'index': 0, 'message': {'role': 'assistant', 'content': fakeClients.CHAT_TEXT}, 'finish_reason': 'stop'}]},
+    'user': {}, 'session': '', 'sessionTimeout': '',
+    'timestamps': {'request': 0, 'response': 0}
+}
+
+def __percentile(samples, p):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * p))]
+
+def __sender(mode, url):
+    #returns a function that sends one event the way the mode does
+    if mode == 'unpooled':
+        import requests
+        #what every handler did before the pool, requests.post opens a new connection each time
+        return lambda: requests.post(url + '/track', json=EVENT)
+    if mode in ('pooled', 'http2'):
+        reconifyTransport.configure(http2=mode == 'http2')
+        return lambda: reconifyTransport.send(url + '/track', EVENT)
+    openai = fakeClients.openaiClient()
+    anthropic = fakeClients.anthropicClient()
+    reconifyTransport.configure(http2=False)
+    reconifyOpenAIHandler.config(openai, 'benchmark', 'benchmark', tracker=url + '/track')
+    reconifyAnthropicHandler.config(anthropic, 'benchmark', 'benchmark', tracker=url + '/track')
+    calls = [
+        lambda: openai.chat.completions.create(model='gpt-4o', messages=fakeClients.MESSAGES),
+        lambda: anthropic.messages.create(model='claude-3-5-sonnet', max_tokens=256, messages=fakeClients.MESSAGES[1:])
+    ]
+    state = {'i': 0}
+    def send():
+        state['i'] += 1
+        calls[state['i'] % 2]()
+    return send
+
+def __measure(mode, events, url):
+    send = __sender(mode, url)
+    for _ in range(WARMUP_EVENTS):
+        send()
+    standInServer.reset(url)
+    samples = []
+    cpu = time.process_time()
+    started = time.perf_counter()
+    for _ in range(events):
+        begin = time.perf_counter()
+        send()
+        samples.append(time.perf_counter() - begin)
+    wall = time.perf_counter() - started
+    cpu = time.process_time() - cpu
+    tracker = standInServer.snapshot(url)
+    return {
+        'mode': mode,
+        'events': events,
+        'p50Ms': round(__percentile(samples, 0.5) * 1000, 3),
+        'p99Ms': round(__percentile(samples, 0.99) * 1000, 3),
+        'cpuUsPerEvent': round(cpu / events * 1e6, 1),
+        'eventsPerSecond': round(events / wall, 1),
+        'received': tracker['requests'],
+        #less the connection of the stats request itself
+        'connections': tracker['connections'] - 1
+    }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Per event send cost with and without the shared connection pool')
+    parser.add_argument('--events', type=int, default=DEFAULT_EVENTS, help='events sent per mode, one at a time')
+    parser.add_argument('--modes', default=DEFAULT_MODES, help='comma separated modes: ' + ', '.join(MODES))
+    parser.add_argument('--plain', action='store_true', help='use http instead of https')
+    parser.add_argument('--output', default=None, help='write the json results to this file instead of stdout')
+    args = parser.parse_args(argv)
+
+    server, url = standInServer.spawn(tls=not args.plain)
+    if not args.plain:
+        #requests and httpx trust the stand-in certificate through the environment
+        cert = standInServer.certificate()[0]
+        os.environ['REQUESTS_CA_BUNDLE'] = cert
+        os.environ['SSL_CERT_FILE'] = cert
+    results = []
+    for mode in [m.strip() for m in args.modes.split(',') if m.strip()]:
+        result = __measure(mode, args.events, url)
+        results.append(result)
+        print(f"{mode:>10} p50 {result['p50Ms']:.2f}ms p99 {result['p99Ms']:.2f}ms cpu {result['cpuUsPerEvent']:.0f}us "
+            f"{result['eventsPerSecond']:.0f}/s {result['connections']} connection(s) for {result['received']} posts", file=sys.stderr)
+    server.terminate()
+
+    report = {
+        'benchmark': 'sendCost',
+        'reconifyVersion': reconifyOpenAIHandler.RECONIFY_MODULE_VERSION,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'timestamp': round(time.time()),
+        'tls': not args.plain,
+        'results': results
+    }
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,102 @@
+import argparse
+import json
+import platform
+import statistics
+import sys
+import time
+from types import SimpleNamespace
+from .compression import corpus
+from reconify import reconifyEncoder
+from reconify import reconifyOpenAIHandler
+
+#cost of turning a logged call into wire bytes, the json.loads(json.dumps(output)) round trip the handlers used
+#followed by requests.post(json=payload) against reconifyEncoder with the standard library and with orjson
+#usage: python -m benchmarks.serialization --repeat 200 --output results.json
+
+#constants
+DEFAULT_REPEAT = 200
+DEFAULT_PATHS = 'roundTrip,json,auto'
+PATHS = ('roundTrip', 'json', 'auto')
+HISTORY_COPIES = 12
+
+class __CompletionEncoder(json.JSONEncoder):
+    #the encoder the handlers used before reconifyEncoder
+    def default(self, o):
+        return o.__dict__
+
+def __roundTrip(payload):
+    event = dict(payload)
+    event['response'] = json.loads(json.dumps(payload['response'], cls=__CompletionEncoder))
+    #what requests.post(json=payload) did with the result
+    return json.dumps(event, allow_nan=False).encode('utf-8')
+
+def __namespace(value):
+    #responses come back from the sdks as objects rather than dicts
+    if isinstance(value, dict):
+        return SimpleNamespace(**{k: __namespace(v) for k, v in value.items()})
+    if isinstance(value, list):
+        return [__namespace(v) for v in value]
+    return value
+
+def __cases():
+    chats = corpus()
+    history = dict(chats['conversation'])
+    history['request'] = dict(history['request'], messages=history['request']['messages'] * HISTORY_COPIES)
+    chats['history'] = history
+    return {name: dict(payload, response=__namespace(payload['response'])) for name, payload in chats.items()}
+
+def __encoder(path):
+    if path == 'roundTrip':
+        return __roundTrip
+    reconifyEncoder.configure(serializer=path)
+    return reconifyEncoder.encodePayload
+
+def __measure(path, name, payload, repeat):
+    encode = __encoder(path)
+    size = len(encode(payload))
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        encode(payload)
+        samples.append(time.perf_counter() - started)
+    return {'path': path, 'payload': name, 'bytes': size, 'medianUs': round(statistics.median(samples) * 1e6, 1)}
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Serialization cost per logged call, before and after reconifyEncoder')
+    parser.add_argument('--repeat', type=int, default=DEFAULT_REPEAT, help='runs per measurement, the median is reported')
+    parser.add_argument('--paths', default=DEFAULT_PATHS, help='comma separated paths: ' + ', '.join(PATHS))
+    parser.add_argument('--output', default=None, help='write the json results to this file instead of stdout')
+    args = parser.parse_args(argv)
+
+    cases = __cases()
+    results = []
+    for name, payload in cases.items():
+        before = None
+        for path in [p.strip() for p in args.paths.split(',') if p.strip()]:
+            result = __measure(path, name, payload, args.repeat)
+            if path == 'roundTrip':
+                before = result['medianUs']
+            elif before:
+                result['speedup'] = round(before / result['medianUs'], 2)
+            results.append(result)
+            print(f"{name:>12} {path:>9} {result['bytes']:>8}B {result['medianUs']:>9.1f}us"
+                + (f" x{result['speedup']}" if 'speedup' in result else ''), file=sys.stderr)
+
+    report = {
+        'benchmark': 'serialization',
+        'reconifyVersion': reconifyOpenAIHandler.RECONIFY_MODULE_VERSION,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'timestamp': round(time.time()),
+        'repeat': args.repeat,
+        'results': results
+    }
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,131 @@
+import json
+import multiprocessing
+import os
+import ssl
+import subprocess
+import tempfile
+import threading
+import time
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+#local stand-in for the tracker and uploader, it accepts every post and keeps counts
+STATS_PATH = '/__stats'
+
+__certificate = None
+
+class StandInHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    stats = {'requests': 0, 'bytes': 0, 'connections': 0}
+    keep = False
+    received = []
+    status = 200
+    #injected faults: seconds to wait before answering, and statuses for the next posts before status applies
+    delay = 0
+    statuses = []
+    lock = threading.Lock()
+
+    def setup(self):
+        #once per connection, so keep-alive reuse shows in the counts
+        with self.lock:
+            self.stats['connections'] += 1
+        super().setup()
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length', 0))
+        body = self.rfile.read(length)
+        with self.lock:
+            self.stats['requests'] += 1
+            self.stats['bytes'] += length
+            if self.keep:
+                self.received.append((self.path, dict(self.headers), body))
+            status = self.statuses.pop(0) if self.statuses else self.status
+        if self.delay:
+            time.sleep(self.delay)
+        self.__respond(status)
+
+    def do_GET(self):
+        #counts are read over http when the server runs in its own process
+        with self.lock:
+            body = json.dumps(self.stats).encode('utf-8')
+        self.__respond(200, body)
+
+    def do_DELETE(self):
+        reset()
+        self.__respond(200)
+
+    def __respond(self, status, body=b''):
+        self.send_response(status)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+def certificate():
+    #returns (certificate, key) files of a self-signed certificate for 127.0.0.1, made once per process
+    #clients trust it through REQUESTS_CA_BUNDLE or SSL_CERT_FILE
+    global __certificate
+    if __certificate is None:
+        folder = tempfile.mkdtemp(prefix='reconify-stand-in-')
+        cert = os.path.join(folder, 'cert.pem')
+        key = os.path.join(folder, 'key.pem')
+        subprocess.run(['openssl', 'req', '-x509', '-newkey', 'rsa:2048', '-nodes', '-days', '1', '-keyout', key, '-out', cert,
+            '-subj', '/CN=127.0.0.1', '-addext', 'subjectAltName=IP:127.0.0.1'], check=True, capture_output=True)
+        __certificate = (cert, key)
+    return __certificate
+
+class StandInServer(ThreadingHTTPServer):
+    #the default backlog of 5 refuses connections when many workers connect at once
+    request_queue_size = 128
+
+def __server(port, tls):
+    server = StandInServer(('127.0.0.1', port), StandInHandler)
+    server.daemon_threads = True
+    scheme = 'http'
+    if tls:
+        context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+        context.load_cert_chain(*tls)
+        server.socket = context.wrap_socket(server.socket, server_side=True)
+        scheme = 'https'
+    return server, f'{scheme}://127.0.0.1:{server.server_port}'
+
+def start(port=0, tls=False):
+    #returns the server and its base url, the server runs in this process until shutdown is called
+    server, url = __server(port, certificate() if tls else None)
+    threading.Thread(target=server.serve_forever, name='stand-in', daemon=True).start()
+    return server, url
+
+def __serve(connection, tls):
+    server, url = __server(0, tls)
+    connection.send(url)
+    server.serve_forever()
+
+def spawn(tls=False):
+    #runs the server in a child process so its cpu time is not counted against the handlers
+    parent, child = multiprocessing.Pipe()
+    process = multiprocessing.Process(target=__serve, args=(child, certificate() if tls else None), daemon=True)
+    process.start()
+    return process, parent.recv()
+
+def __context(url):
+    if url.startswith('https:'):
+        return ssl.create_default_context(cafile=certificate()[0])
+    return None
+
+def reset(url=None):
+    if url is not None:
+        urllib.request.urlopen(urllib.request.Request(url + STATS_PATH, method='DELETE'), context=__context(url)).read()
+        return
+    with StandInHandler.lock:
+        StandInHandler.stats['requests'] = 0
+        StandInHandler.stats['bytes'] = 0
+        StandInHandler.stats['connections'] = 0
+        StandInHandler.received.clear()
+
+def snapshot(url=None):
+    if url is not None:
+        return json.loads(urllib.request.urlopen(url + STATS_PATH, context=__context(url)).read())
+    with StandInHandler.lock:
+        return dict(StandInHandler.stats)
@@ -0,0 +1,84 @@
+import argparse
+import json
+import os
+import sys
+import time
+from . import reconifyUniversalHandler
+from . import reconifyImport
+
+#command line tools
+#usage: python -m reconify import chats.jsonl.gz --app-key KEY --api-key KEY --map request=input --map response=output
+
+#constants
+PROGRESS_INTERVAL = 5
+CHECKPOINT_SUFFIX = '.checkpoint'
+
+def __mapping(args):
+    mapping = {}
+    if args.mapping:
+        with open(args.mapping, 'r') as f:
+            mapping.update(json.load(f))
+    for item in args.map or []:
+        target, _, source = item.partition('=')
+        if not target or target not in reconifyImport.DEFAULT_MAPPING:
+            raise SystemExit(f"Unknown field '{target}', expected one of: " + ', '.join(reconifyImport.DEFAULT_MAPPING))
+        mapping[target] = source
+    return mapping
+
+def __import(args):
+    if not args.app_key or not args.api_key:
+        raise SystemExit('An app key and api key are required, pass --app-key and --api-key or set RECONIFY_APP_KEY and RECONIFY_API_KEY')
+    options = {}
+    if args.tracker:
+        options['tracker'] = args.tracker
+    if args.debug:
+        options['debug'] = True
+    reconifyUniversalHandler.config(args.app_key, args.api_key, **options)
+
+    checkpoint = args.checkpoint or args.file + CHECKPOINT_SUFFIX
+    if args.restart and os.path.exists(checkpoint):
+        os.remove(checkpoint)
+    last = [time.monotonic()]
+    def progress(counts):
+        if time.monotonic() - last[0] >= PROGRESS_INTERVAL:
+            last[0] = time.monotonic()
+            print(f"read {counts['read']} sent {counts['sent']} skipped {counts['skipped']} failed {counts['failed']}", file=sys.stderr)
+    try:
+        counts = reconifyUniversalHandler.importChats(args.file, __mapping(args), batchSize=args.batch_size,
+            concurrency=args.concurrency, rate=args.rate, checkpoint=checkpoint, retries=args.retries, progress=progress)
+    except KeyboardInterrupt:
+        print('Interrupted, run the same command again to resume from', checkpoint, file=sys.stderr)
+        return 130
+    json.dump(counts, sys.stdout)
+    print()
+    if not counts['complete']:
+        print('Import stopped after a batch could not be sent, run the same command again to resume', file=sys.stderr)
+        return 1
+    return 0
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m reconify', description='Reconify command line tools')
+    commands = parser.add_subparsers(dest='command')
+    importer = commands.add_parser('import', help='send recorded chats from a jsonl file, optionally gzip, through the universal handler')
+    importer.add_argument('file', help='jsonl file with one chat per line, gzip files are detected')
+    importer.add_argument('--app-key', default=os.environ.get('RECONIFY_APP_KEY'), help='defaults to RECONIFY_APP_KEY')
+    importer.add_argument('--api-key', default=os.environ.get('RECONIFY_API_KEY'), help='defaults to RECONIFY_API_KEY')
+    importer.add_argument('--tracker', default=None, help='tracker url, batches are sent to its /batch endpoint')
+    importer.add_argument('--map', action='append', metavar='FIELD=PATH',
+        help='read a field from a dotted path in each record, fields: ' + ', '.join(reconifyImport.DEFAULT_MAPPING))
+    importer.add_argument('--mapping', default=None, help='json file with the same field to path mapping')
+    importer.add_argument('--batch-size', type=int, default=reconifyImport.DEFAULT_BATCH_SIZE, help='events per request')
+    importer.add_argument('--concurrency', type=int, default=reconifyImport.DEFAULT_CONCURRENCY, help='requests in flight')
+    importer.add_argument('--rate', type=float, default=None, help='maximum events per second')
+    importer.add_argument('--retries', type=int, default=reconifyImport.DEFAULT_RETRIES, help='attempts per batch before the import stops')
+    importer.add_argument('--checkpoint', default=None, help='checkpoint file, defaults to the file name with ' + CHECKPOINT_SUFFIX)
+    importer.add_argument('--restart', action='store_true', help='ignore the checkpoint and start from the beginning')
+    importer.add_argument('--debug', action='store_true')
+    args = parser.parse_args(argv)
+    if args.command == 'import':
+        return __import(args)
+    parser.print_help()
+    return 2
+
+if __name__ == '__main__':
+    sys.exit(main())
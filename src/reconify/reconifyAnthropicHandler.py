@@ -1,18 +1,15 @@
 import time
-import requests
-import json
-import uuid
+from . import reconifyTransport
+from . import reconifyContext
+from . import reconifyModelStats
+from . import reconifyRollup
+from . import reconifyStream
 
 #constants
 RECONIFY_TRACKER = 'https://track.reconify.com/track'
 RECONIFY_UPLOADER = 'https://track.reconify.com/upload'
 RECONIFY_MODULE_VERSION = '3.0.0'
 
-#private class
-class __CompletionEncoder(json.JSONEncoder):
-    def default(self, o):
-        return o.__dict__
-
 #private variables 
 __format = 'anthropic'
 __appKey = None
@@ -25,11 +22,28 @@ __session = ''
 __sessionTimeout = ''
 __trackImages = True
 
-def __logInteraction(input, output, timestampIn, timestampOut, type):
+def __record(input, output, type, seconds):
+    #local model stats for every call, and the usage summary in rollup mode
+    reconifyModelStats.record(__format, input, output, type, seconds)
+    if reconifyRollup.isEnabled():
+        reconifyTransport.rollup(__tracker, {
+            "format": __format,
+            "appKey": __appKey,
+            "apiKey": __apiKey,
+            "version": RECONIFY_MODULE_VERSION,
+        }, input, output, type, seconds, reconifyContext.resolve(__user, __session, __sessionTimeout))
+
+def __logInteraction(input, output, timestampIn, timestampOut, type, background=False, timestampFirstToken=None, sampleRate=None, identity=None):
+    if identity is None:
+        identity = reconifyContext.resolve(__user, __session, __sessionTimeout)
+    user, session, sessionTimeout = identity
+    if sampleRate is None:
+        sampleRate = reconifyTransport.sample(user, session)
+        if sampleRate is None:
+            return
     if __debug:
         print('Logging interaction')
 
-    json_output = json.loads(json.dumps(output, cls=__CompletionEncoder))
     payload = {
         "reconify" :{
             "format": __format,
@@ -39,25 +53,42 @@ def __logInteraction(input, output, timestampIn, timestampOut, type):
             "version": RECONIFY_MODULE_VERSION,
         },
         "request": input,
-        "response": json_output,
-        "user": __user,
-        "session": __session,
-        "sessionTimeout": __sessionTimeout,
+        "response": output,
+        "user": user,
+        "session": session,
+        "sessionTimeout": sessionTimeout,
         "timestamps": {
             "request": timestampIn,
             "response": timestampOut
         },
     }
+    if timestampFirstToken is not None:
+        payload['timestamps']['firstToken'] = timestampFirstToken
+    if sampleRate < 1:
+        payload['sampleRate'] = sampleRate
     if __debug:
         print('Sending payload: ', payload)
-    try:
-        requests.post(__tracker, json=payload)
-    except requests.exceptions.RequestException as err:
-        if __debug:
-            print('Send error: ', err)
+    reconifyTransport.send(__tracker, payload, background)
 
     return
 
+def __wrapStream(input, stream, timestampIn, type, isAsync=False, started=None):
+    #sampled out streams are returned as they are unless they are needed for the model stats or rollup
+    identity = reconifyContext.resolve(__user, __session, __sessionTimeout)
+    user, session, sessionTimeout = identity
+    sampleRate = reconifyTransport.sample(user, session)
+    if sampleRate is None and not reconifyModelStats.isEnabled() and not reconifyRollup.isEnabled():
+        return stream
+    #log once the caller has consumed the stream, chunks are passed through untouched
+    def onComplete(output, timestampFirstToken, timestampOut):
+        if started is not None:
+            __record(input, output, type, time.perf_counter() - started)
+        if sampleRate is not None:
+            __logInteraction(input, output, timestampIn, timestampOut, type, isAsync, timestampFirstToken, sampleRate, identity)
+    if isAsync:
+        return reconifyStream.AsyncStreamWrapper(stream, reconifyStream.AnthropicEventAccumulator(), onComplete, __debug)
+    return reconifyStream.StreamWrapper(stream, reconifyStream.AnthropicEventAccumulator(), onComplete, __debug)
+
 def config (anthropic, appKey, apiKey, **options):
     global __appKey
     global __apiKey
@@ -86,25 +117,59 @@ def config (anthropic, appKey, apiKey, **options):
     if 'trackImages' in options and options.get('trackImages') == False:
         __trackImages = False
 
-
-    #override completion create
-    anthropic.completions.originalCreate = anthropic.completions.create
-    def __reconifyCompletion(*args, **kwargs):
-        tsIn = round(time.time()*1000)
-        response = anthropic.completions.originalCreate(*args, **kwargs)
-        tsOut = round(time.time()*1000)
-        __logInteraction(kwargs, response, tsIn, tsOut, 'completion')
-        return response 
-    anthropic.completions.create = __reconifyCompletion
+    reconifyTransport.configure(**options)
+
+    #override completion create, newer sdks no longer have the legacy completions api
+    if hasattr(anthropic, 'completions'):
+        anthropic.completions.originalCreate = anthropic.completions.create
+        if reconifyStream._isAsync(anthropic.completions.originalCreate):
+            async def __reconifyCompletion(*args, **kwargs):
+                tsIn = round(time.time()*1000)
+                started = time.perf_counter()
+                response = await anthropic.completions.originalCreate(*args, **kwargs)
+                if kwargs.get('stream') == True:
+                    return __wrapStream(kwargs, response, tsIn, 'completion', True, started)
+                tsOut = round(time.time()*1000)
+                __record(kwargs, response, 'completion', time.perf_counter() - started)
+                __logInteraction(kwargs, response, tsIn, tsOut, 'completion', True)
+                return response
+        else:
+            def __reconifyCompletion(*args, **kwargs):
+                tsIn = round(time.time()*1000)
+                started = time.perf_counter()
+                response = anthropic.completions.originalCreate(*args, **kwargs)
+                if kwargs.get('stream') == True:
+                    return __wrapStream(kwargs, response, tsIn, 'completion', False, started)
+                tsOut = round(time.time()*1000)
+                __record(kwargs, response, 'completion', time.perf_counter() - started)
+                __logInteraction(kwargs, response, tsIn, tsOut, 'completion')
+                return response 
+        anthropic.completions.create = __reconifyCompletion
 
     #override chat create
     anthropic.messages.originalCreate = anthropic.messages.create
-    def __reconifyChat(*args, **kwargs):
-        tsIn = round(time.time()*1000)
-        response = anthropic.messages.originalCreate(*args, **kwargs)
-        tsOut = round(time.time()*1000)
-        __logInteraction(kwargs, response, tsIn, tsOut, 'chat')
-        return response 
+    if reconifyStream._isAsync(anthropic.messages.originalCreate):
+        async def __reconifyChat(*args, **kwargs):
+            tsIn = round(time.time()*1000)
+            started = time.perf_counter()
+            response = await anthropic.messages.originalCreate(*args, **kwargs)
+            if kwargs.get('stream') == True:
+                return __wrapStream(kwargs, response, tsIn, 'chat', True, started)
+            tsOut = round(time.time()*1000)
+            __record(kwargs, response, 'chat', time.perf_counter() - started)
+            __logInteraction(kwargs, response, tsIn, tsOut, 'chat', True)
+            return response
+    else:
+        def __reconifyChat(*args, **kwargs):
+            tsIn = round(time.time()*1000)
+            started = time.perf_counter()
+            response = anthropic.messages.originalCreate(*args, **kwargs)
+            if kwargs.get('stream') == True:
+                return __wrapStream(kwargs, response, tsIn, 'chat', False, started)
+            tsOut = round(time.time()*1000)
+            __record(kwargs, response, 'chat', time.perf_counter() - started)
+            __logInteraction(kwargs, response, tsIn, tsOut, 'chat')
+            return response 
     anthropic.messages.create = __reconifyChat
 
 def setUser(user):
@@ -117,4 +182,19 @@ def setSession(session):
 
 def setSessionTimeout(sessionTimeout):
     global __sessionTimeout
-    __sessionTimeout = sessionTimeout
\ No newline at end of file
+    __sessionTimeout = sessionTimeout
+
+def context(**values):
+    return reconifyContext.context(**values)
+
+def flush(timeout=None):
+    return reconifyTransport.flush(timeout)
+
+def invocation(function):
+    return reconifyTransport.invocation(function)
+
+def stats(output='dict'):
+    return reconifyTransport.stats(output)
+
+def modelStats():
+    return reconifyModelStats.snapshot()
\ No newline at end of file
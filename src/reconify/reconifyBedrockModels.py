@@ -0,0 +1,117 @@
+import threading
+
+#constants
+MAX_CACHED_MODELS = 1024
+#cross-region inference profiles put a geography in front of the model id, e.g. us.anthropic.claude-3-haiku
+REGION_PREFIXES = ('us', 'eu', 'apac', 'us-gov', 'global', 'ca', 'jp', 'au')
+
+#private variables
+__families = {}
+__index = {}
+__resolved = {}
+__lock = threading.Lock()
+
+#how the calls of one model family are logged
+class Family:
+    def __init__(self, prefix, type='chat', fields=None, extract=None, images=None, stream=None):
+        self.prefix = prefix
+        self.type = type
+        self.fields = tuple(fields) if fields is not None else None
+        self._extract = extract
+        self._images = images
+        #the body layout BedrockChunkAccumulator assembles streamed chunks into
+        self.stream = stream
+
+    def extract(self, body):
+        #only the fields the tracker needs, the caller keeps the full body
+        if self._extract is not None:
+            #an application extractor that fails never breaks the wrapped call
+            try:
+                return self._extract(body)
+            except Exception:
+                return body
+        if self.fields is None or not isinstance(body, dict):
+            return body
+        return {key: body[key] for key in self.fields if key in body}
+
+    def images(self, body):
+        #returns [{'base64', 'seed', 'finishReason'}] for image families
+        if self._images is None:
+            return []
+        return self._images(body)
+
+def __stabilityImages(body):
+    if 'artifacts' in body:
+        return [{'base64': a.get('base64'), 'seed': a.get('seed'), 'finishReason': a.get('finishReason')} for a in body.get('artifacts') or []]
+    #stable image and sd3 models return parallel lists
+    images = body.get('images') or []
+    seeds = body.get('seeds') or []
+    reasons = body.get('finish_reasons') or []
+    return [{'base64': image, 'seed': seeds[i] if i < len(seeds) else None, 'finishReason': reasons[i] if i < len(reasons) else None}
+        for i, image in enumerate(images)]
+
+def __titanImages(body):
+    return [{'base64': image, 'seed': None, 'finishReason': None} for image in body.get('images') or []]
+
+def __build():
+    #the index maps the provider part of a model id to its families, longest prefix first
+    index = {}
+    for prefix, family in __families.items():
+        index.setdefault(prefix.split('.', 1)[0], []).append(family)
+    for families in index.values():
+        families.sort(key=lambda f: len(f.prefix), reverse=True)
+    return index
+
+def __normalize(modelId):
+    #foundation model and inference profile arns end with the model id
+    if modelId.startswith('arn:'):
+        modelId = modelId.rsplit('/', 1)[-1]
+    provider, _, rest = modelId.partition('.')
+    if provider in REGION_PREFIXES and provider not in __index and rest:
+        return rest
+    return modelId
+
+def __lookup(modelId):
+    modelId = __normalize(modelId)
+    for family in __index.get(modelId.partition('.')[0], ()):
+        if modelId.startswith(family.prefix):
+            return family
+    return None
+
+def register(prefix, type='chat', fields=None, extract=None, images=None, stream=None):
+    global __index
+    with __lock:
+        __families[prefix] = Family(prefix, type, fields, extract, images, stream)
+        __index = __build()
+        __resolved.clear()
+
+def afterFork():
+    #the families registered before the fork are kept, only the lock is new
+    global __lock
+    __lock = threading.Lock()
+
+def resolve(modelId):
+    #the family for a model id, or None when it is not known, memoized per model id
+    if not modelId:
+        return None
+    try:
+        return __resolved[modelId]
+    except KeyError:
+        pass
+    family = __lookup(modelId)
+    with __lock:
+        if len(__resolved) >= MAX_CACHED_MODELS:
+            __resolved.clear()
+        __resolved[modelId] = family
+    return family
+
+register('anthropic.', fields=('id', 'type', 'role', 'model', 'content', 'stop_reason', 'stop_sequence', 'usage', 'completion', 'stop'), stream='anthropic')
+register('meta.', fields=('generation', 'prompt_token_count', 'generation_token_count', 'stop_reason'), stream='meta')
+register('mistral.', fields=('outputs', 'choices', 'usage'), stream='mistral')
+register('cohere.', fields=('generations', 'text', 'generation_id', 'finish_reason', 'tool_calls', 'meta'), stream='cohere')
+register('ai21.', fields=('completions', 'choices', 'usage'))
+register('amazon.titan-text', fields=('inputTextTokenCount', 'results'), stream='amazon')
+register('amazon.nova', fields=('output', 'stopReason', 'usage'), stream='nova')
+register('stability.', type='image', images=__stabilityImages)
+register('amazon.titan-image', type='image', images=__titanImages)
+register('amazon.nova-canvas', type='image', images=__titanImages)
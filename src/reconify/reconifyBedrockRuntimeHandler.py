@@ -1,7 +1,12 @@
 import time
-import requests
-import json
-import uuid
+from . import reconifyTransport
+from . import reconifyContext
+from . import reconifyModelStats
+from . import reconifyRollup
+from . import reconifyBody
+from . import reconifyStream
+from . import reconifyEncoder
+from . import reconifyBedrockModels
 
 #constants
 RECONIFY_TRACKER = 'https://track.reconify.com/track'
@@ -19,7 +24,25 @@ __session = ''
 __sessionTimeout = ''
 __trackImages = True
 
-def __logInteraction(input, output, timestampIn, timestampOut, type):
+def __record(input, output, type, seconds):
+    #local model stats for every call, and the usage summary in rollup mode
+    reconifyModelStats.record('bedrock', input, output, type, seconds)
+    if reconifyRollup.isEnabled():
+        reconifyTransport.rollup(__tracker, {
+            "format": 'bedrock',
+            "appKey": __appKey,
+            "apiKey": __apiKey,
+            "version": RECONIFY_MODULE_VERSION,
+        }, input, output, type, seconds, reconifyContext.resolve(__user, __session, __sessionTimeout))
+
+def __logInteraction(input, output, timestampIn, timestampOut, type, sampleRate=None, identity=None, timestampFirstToken=None):
+    if identity is None:
+        identity = reconifyContext.resolve(__user, __session, __sessionTimeout)
+    user, session, sessionTimeout = identity
+    if sampleRate is None:
+        sampleRate = reconifyTransport.sample(user, session)
+        if sampleRate is None:
+            return
     if __debug:
         print('Logging interaction')
     
@@ -41,52 +64,60 @@ def __logInteraction(input, output, timestampIn, timestampOut, type):
             "requestId": requestId,
             "body": body
         },
-        "user": __user,
-        "session": __session,
-        "sessionTimeout": __sessionTimeout,
+        "user": user,
+        "session": session,
+        "sessionTimeout": sessionTimeout,
         "timestamps": {
             "request": timestampIn,
             "response": timestampOut
         },
     }
+    if timestampFirstToken is not None:
+        payload['timestamps']['firstToken'] = timestampFirstToken
+    if sampleRate < 1:
+        payload['sampleRate'] = sampleRate
     if __debug:
         print('Sending payload: ', payload)
-    try:
-        requests.post(__tracker, json=payload)
-    except requests.exceptions.RequestException as err:
-        if __debug:
-            print('Send error: ', err)
+    reconifyTransport.send(__tracker, payload)
 
     return
 
+def __wrapStream(input, response, key, accumulator, timestampIn, started):
+    #sampled out streams are returned as they are unless they are needed for the model stats or rollup
+    identity = reconifyContext.resolve(__user, __session, __sessionTimeout)
+    user, session, sessionTimeout = identity
+    sampleRate = reconifyTransport.sample(user, session)
+    if sampleRate is None and not reconifyModelStats.isEnabled() and not reconifyRollup.isEnabled():
+        return response
+    #log once the caller has consumed the stream, events are passed through untouched
+    def onComplete(body, timestampFirstToken, timestampOut):
+        output = {"ResponseMetadata": response.get("ResponseMetadata"), "parsedBody": body}
+        __record(input, output, 'chat', time.perf_counter() - started)
+        if sampleRate is not None:
+            __logInteraction(input, output, timestampIn, timestampOut, 'chat', sampleRate, identity, timestampFirstToken)
+    response[key] = reconifyStream.StreamWrapper(response.get(key), accumulator, onComplete, __debug)
+    return response
+
 def __uploadImage(payload):
     if __debug:
         print('uploading image')
     
-    try:
-        requests.post(__uploader, json=payload)
-    except requests.exceptions.RequestException as err:
-        if __debug:
-            print('upload error: ', err)
+    reconifyTransport.upload(__uploader, payload)
     return
 
-def __logInteractionWithImageData(input, output, timestampIn, timestampOut, type):
+def __logInteractionWithImageData(input, output, data, timestampIn, timestampOut, type):
+    identity = reconifyContext.resolve(__user, __session, __sessionTimeout)
+    user, session, sessionTimeout = identity
+    sampleRate = reconifyTransport.sample(user, session)
+    if sampleRate is None:
+        return
     if __debug:
         print('Logging interaction with image data')
 
-    model = input.get('modelId')
-
     requestId = output.get("ResponseMetadata").get("RequestId")
-    #body = ''
-    #if 'body' in output:
-    #    body = json.loads(output.get("body").read().decode('utf-8'))
-    body = output.get("parsedBody")
-    data = body.get('artifacts')
-    if model.startswith('amazon.'):
-        data = list(map(lambda x: {'base64': x}, body.get('images')))
-
     n = len(data)
     images = []
+    import uuid
     randomId = str(uuid.uuid4())
     for i in range(n):
         images.append(
@@ -113,21 +144,19 @@ def __logInteractionWithImageData(input, output, timestampIn, timestampOut, type
                 "format": 'b64_json'
             }
         },
-        "user": __user,
-        "session": __session,
-        "sessionTimeout": __sessionTimeout,
+        "user": user,
+        "session": session,
+        "sessionTimeout": sessionTimeout,
         "timestamps": {
             "request": timestampIn,
             "response": timestampOut
         },
     }
+    if sampleRate < 1:
+        payload['sampleRate'] = sampleRate
     if __debug:
         print('Sending payload: ', payload)
-    try:
-        requests.post(__tracker, json=payload)
-    except requests.exceptions.RequestException as err:
-        if __debug:
-            print('Send error: ', err)    
+    reconifyTransport.send(__tracker, payload)
 
     #send each image
     for i in range(n):
@@ -149,6 +178,14 @@ def __logInteractionWithImageData(input, output, timestampIn, timestampOut, type
 
     return
 
+def __replaceBody(response):
+    #the caller gets a re-readable body over the bytes read here, with the decoded json alongside
+    data = response.get("body").read()
+    body = reconifyEncoder.loads(data)
+    response["parsedBody"] = body
+    response["body"] = reconifyBody.ResponseBody(data, body)
+    return body
+
 def config (bedrock, appKey, apiKey, **options):
     global __appKey
     global __apiKey
@@ -177,30 +214,81 @@ def config (bedrock, appKey, apiKey, **options):
     if 'trackImages' in options and options.get('trackImages') == False:
         __trackImages = False
 
+    reconifyTransport.configure(**options)
+
     #override invoke_model
     bedrock.originalInvokeModel = bedrock.invoke_model
     def __reconifyInvokeModel(**kwargs):
         tsIn = round(time.time()*1000)
+        started = time.perf_counter()
         response = bedrock.originalInvokeModel(**kwargs)
+        elapsed = time.perf_counter() - started
         tsOut = round(time.time()*1000)
-        model = ''
-        if 'modelId' in kwargs:
-            model = kwargs.get('modelId')
-        
-        if model.startswith('anthropic.') or model.startswith('ai21.') or model.startswith('cohere.') or model.startswith('meta.') or model.startswith('mistral.') or model.startswith('amazon.titan-text'):
-            body = json.loads(response.get("body").read().decode('utf-8'))
-            response["parsedBody"] = body
-            __logInteraction(kwargs, response, tsIn, tsOut, 'chat')
-        elif model.startswith('stability.') or model.startswith('amazon.titan-image'): 
-            body = json.loads(response.get("body").read().decode('utf-8'))
-            response["parsedBody"] = body
-            __logInteractionWithImageData(kwargs, response, tsIn, tsOut, 'image')
+        family = reconifyBedrockModels.resolve(kwargs.get('modelId'))
+        if family is None:
+            #unknown models are logged without their body, which is left unread, the token counts come from the headers
+            __record(kwargs, response, 'chat', elapsed)
+            __logInteraction(kwargs, {"ResponseMetadata": response.get("ResponseMetadata"), "parsedBody": None}, tsIn, tsOut, 'chat')
+            return response
+        body = __replaceBody(response)
+        if family.type == 'image':
+            __record(kwargs, response, 'image', elapsed)
+            __logInteractionWithImageData(kwargs, response, family.images(body), tsIn, tsOut, 'image')
+        else:
+            output = {"ResponseMetadata": response.get("ResponseMetadata"), "parsedBody": family.extract(body)}
+            __record(kwargs, output, family.type, elapsed)
+            __logInteraction(kwargs, output, tsIn, tsOut, family.type)
 
         return response 
     bedrock.invoke_model = __reconifyInvokeModel 
 
+    #override invoke_model_with_response_stream
+    if hasattr(bedrock, 'invoke_model_with_response_stream'):
+        bedrock.originalInvokeModelWithResponseStream = bedrock.invoke_model_with_response_stream
+        def __reconifyInvokeModelWithResponseStream(**kwargs):
+            tsIn = round(time.time()*1000)
+            started = time.perf_counter()
+            response = bedrock.originalInvokeModelWithResponseStream(**kwargs)
+            family = reconifyBedrockModels.resolve(kwargs.get('modelId'))
+            if family is not None and family.type != 'chat':
+                return response
+            stream = family.stream if family is not None else None
+            return __wrapStream(kwargs, response, 'body', reconifyStream.BedrockChunkAccumulator(stream), tsIn, started)
+        bedrock.invoke_model_with_response_stream = __reconifyInvokeModelWithResponseStream
+
+    #override converse
+    if hasattr(bedrock, 'converse'):
+        bedrock.originalConverse = bedrock.converse
+        def __reconifyConverse(**kwargs):
+            tsIn = round(time.time()*1000)
+            started = time.perf_counter()
+            response = bedrock.originalConverse(**kwargs)
+            elapsed = time.perf_counter() - started
+            tsOut = round(time.time()*1000)
+            output = {
+                "ResponseMetadata": response.get("ResponseMetadata"),
+                "parsedBody": {k: v for k, v in response.items() if k != 'ResponseMetadata'}
+            }
+            __record(kwargs, output, 'chat', elapsed)
+            __logInteraction(kwargs, output, tsIn, tsOut, 'chat')
+            return response
+        bedrock.converse = __reconifyConverse
+
+    #override converse_stream
+    if hasattr(bedrock, 'converse_stream'):
+        bedrock.originalConverseStream = bedrock.converse_stream
+        def __reconifyConverseStream(**kwargs):
+            tsIn = round(time.time()*1000)
+            started = time.perf_counter()
+            response = bedrock.originalConverseStream(**kwargs)
+            return __wrapStream(kwargs, response, 'stream', reconifyStream.ConverseEventAccumulator(), tsIn, started)
+        bedrock.converse_stream = __reconifyConverseStream
+
     return
 
+def registerFamily(prefix, type='chat', fields=None, extract=None, images=None, stream=None):
+    reconifyBedrockModels.register(prefix, type, fields, extract, images, stream)
+
 def setUser(user):
     global __user
     __user = user
@@ -211,4 +299,19 @@ def setSession(session):
 
 def setSessionTimeout(sessionTimeout):
     global __sessionTimeout
-    __sessionTimeout = sessionTimeout
\ No newline at end of file
+    __sessionTimeout = sessionTimeout
+
+def context(**values):
+    return reconifyContext.context(**values)
+
+def flush(timeout=None):
+    return reconifyTransport.flush(timeout)
+
+def invocation(function):
+    return reconifyTransport.invocation(function)
+
+def stats(output='dict'):
+    return reconifyTransport.stats(output)
+
+def modelStats():
+    return reconifyModelStats.snapshot()
\ No newline at end of file
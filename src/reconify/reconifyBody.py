@@ -0,0 +1,38 @@
+import io
+
+#constants
+DEFAULT_CHUNK_SIZE = 1024
+
+#stands in for botocore's StreamingBody once the handler has read it, over the same bytes so nothing is copied
+#read() from the start returns the original bytes object and seek(0) makes it readable again
+class ResponseBody(io.BytesIO):
+    def __init__(self, data, parsed=None):
+        super().__init__(data)
+        self.parsed = parsed
+
+    def json(self):
+        #the body as already decoded by the handler
+        return self.parsed
+
+    def __iter__(self):
+        return self.iter_chunks()
+
+    def iter_chunks(self, chunk_size=DEFAULT_CHUNK_SIZE):
+        while True:
+            chunk = self.read(chunk_size)
+            if not chunk:
+                break
+            yield chunk
+
+    def iter_lines(self, chunk_size=DEFAULT_CHUNK_SIZE, keepends=False):
+        pending = b''
+        for chunk in self.iter_chunks(chunk_size):
+            lines = (pending + chunk).splitlines(True)
+            for line in lines[:-1]:
+                yield line.splitlines(keepends)[0]
+            pending = lines[-1]
+        if pending:
+            yield pending.splitlines(keepends)[0]
+
+    def set_socket_timeout(self, timeout):
+        pass
@@ -1,18 +1,15 @@
 import time
-import requests
-import json
-import uuid
+from . import reconifyTransport
+from . import reconifyContext
+from . import reconifyModelStats
+from . import reconifyRollup
+from . import reconifyStream
 
 #constants
 RECONIFY_TRACKER = 'https://track.reconify.com/track'
 RECONIFY_UPLOADER = 'https://track.reconify.com/upload'
 RECONIFY_MODULE_VERSION = '3.0.0'
 
-#private class
-class __CompletionEncoder(json.JSONEncoder):
-    def default(self, o):
-        return o.__dict__
-
 #private variables 
 __format = 'cohere'
 __appKey = None
@@ -25,7 +22,25 @@ __session = ''
 __sessionTimeout = ''
 __trackImages = True
 
-def __logInteraction(input, output, timestampIn, timestampOut, type):
+def __record(input, output, type, seconds):
+    #local model stats for every call, and the usage summary in rollup mode
+    reconifyModelStats.record(__format, input, output, type, seconds)
+    if reconifyRollup.isEnabled():
+        reconifyTransport.rollup(__tracker, {
+            "format": __format,
+            "appKey": __appKey,
+            "apiKey": __apiKey,
+            "version": RECONIFY_MODULE_VERSION,
+        }, input, output, type, seconds, reconifyContext.resolve(__user, __session, __sessionTimeout))
+
+def __logInteraction(input, output, timestampIn, timestampOut, type, background=False, sampleRate=None, identity=None):
+    if identity is None:
+        identity = reconifyContext.resolve(__user, __session, __sessionTimeout)
+    user, session, sessionTimeout = identity
+    if sampleRate is None:
+        sampleRate = reconifyTransport.sample(user, session)
+        if sampleRate is None:
+            return
     if __debug:
         print('Logging interaction')
 
@@ -48,21 +63,19 @@ def __logInteraction(input, output, timestampIn, timestampOut, type):
         },
         "request": input,
         "response": json_output,
-        "user": __user,
-        "session": __session,
-        "sessionTimeout": __sessionTimeout,
+        "user": user,
+        "session": session,
+        "sessionTimeout": sessionTimeout,
         "timestamps": {
             "request": timestampIn,
             "response": timestampOut
         },
     }
+    if sampleRate < 1:
+        payload['sampleRate'] = sampleRate
     if __debug:
         print('Sending payload: ', payload)
-    try:
-        requests.post(__tracker, json=payload)
-    except requests.exceptions.RequestException as err:
-        if __debug:
-            print('Send error: ', err)
+    reconifyTransport.send(__tracker, payload, background)
 
     return
 
@@ -94,24 +107,50 @@ def config (cohere, appKey, apiKey, **options):
     if 'trackImages' in options and options.get('trackImages') == False:
         __trackImages = False
 
+    reconifyTransport.configure(**options)
+
     #override chat create
     cohere.originalChat = cohere.chat
-    def __reconifyChat(*args, **kwargs):
-        tsIn = round(time.time()*1000)
-        response = cohere.originalChat(*args, **kwargs)
-        tsOut = round(time.time()*1000)
-        __logInteraction(kwargs, response, tsIn, tsOut, 'chat')
-        return response 
+    if reconifyStream._isAsync(cohere.originalChat):
+        async def __reconifyChat(*args, **kwargs):
+            tsIn = round(time.time()*1000)
+            started = time.perf_counter()
+            response = await cohere.originalChat(*args, **kwargs)
+            tsOut = round(time.time()*1000)
+            __record(kwargs, response, 'chat', time.perf_counter() - started)
+            __logInteraction(kwargs, response, tsIn, tsOut, 'chat', True)
+            return response
+    else:
+        def __reconifyChat(*args, **kwargs):
+            tsIn = round(time.time()*1000)
+            started = time.perf_counter()
+            response = cohere.originalChat(*args, **kwargs)
+            tsOut = round(time.time()*1000)
+            __record(kwargs, response, 'chat', time.perf_counter() - started)
+            __logInteraction(kwargs, response, tsIn, tsOut, 'chat')
+            return response 
     cohere.chat = __reconifyChat 
 
     #override completion create
     cohere.originalGenerate = cohere.generate
-    def __reconifyGenerate(*args, **kwargs):
-        tsIn = round(time.time()*1000)
-        response = cohere.originalGenerate(*args, **kwargs)
-        tsOut = round(time.time()*1000)
-        __logInteraction(kwargs, response, tsIn, tsOut, 'completion')
-        return response 
+    if reconifyStream._isAsync(cohere.originalGenerate):
+        async def __reconifyGenerate(*args, **kwargs):
+            tsIn = round(time.time()*1000)
+            started = time.perf_counter()
+            response = await cohere.originalGenerate(*args, **kwargs)
+            tsOut = round(time.time()*1000)
+            __record(kwargs, response, 'completion', time.perf_counter() - started)
+            __logInteraction(kwargs, response, tsIn, tsOut, 'completion', True)
+            return response
+    else:
+        def __reconifyGenerate(*args, **kwargs):
+            tsIn = round(time.time()*1000)
+            started = time.perf_counter()
+            response = cohere.originalGenerate(*args, **kwargs)
+            tsOut = round(time.time()*1000)
+            __record(kwargs, response, 'completion', time.perf_counter() - started)
+            __logInteraction(kwargs, response, tsIn, tsOut, 'completion')
+            return response 
     cohere.generate = __reconifyGenerate
 
 def setUser(user):
@@ -124,4 +163,19 @@ def setSession(session):
 
 def setSessionTimeout(sessionTimeout):
     global __sessionTimeout
-    __sessionTimeout = sessionTimeout
\ No newline at end of file
+    __sessionTimeout = sessionTimeout
+
+def context(**values):
+    return reconifyContext.context(**values)
+
+def flush(timeout=None):
+    return reconifyTransport.flush(timeout)
+
+def invocation(function):
+    return reconifyTransport.invocation(function)
+
+def stats(output='dict'):
+    return reconifyTransport.stats(output)
+
+def modelStats():
+    return reconifyModelStats.snapshot()
\ No newline at end of file
@@ -0,0 +1,40 @@
+import contextvars
+from contextlib import contextmanager
+
+#constants
+KEYS = ('user', 'session', 'sessionTimeout')
+
+#private variables
+__values = contextvars.ContextVar('reconify', default=None)
+
+def __merge(values):
+    for key in values:
+        if key not in KEYS:
+            raise TypeError(f'Unknown context value: {key}')
+    current = __values.get()
+    merged = dict(current) if current else {}
+    merged.update(values)
+    return merged
+
+@contextmanager
+def context(**values):
+    #user, session and sessionTimeout for calls made inside the block, only in the current thread or task
+    token = __values.set(__merge(values))
+    try:
+        yield
+    finally:
+        __values.reset(token)
+
+def bind(**values):
+    #same as context for middleware that cannot wrap the request in a with block, returns a token for unbind
+    return __values.set(__merge(values))
+
+def unbind(token):
+    __values.reset(token)
+
+def resolve(user, session, sessionTimeout):
+    #context values take precedence over the ones set with setUser, setSession and setSessionTimeout
+    values = __values.get()
+    if not values:
+        return user, session, sessionTimeout
+    return values.get('user', user), values.get('session', session), values.get('sessionTimeout', sessionTimeout)
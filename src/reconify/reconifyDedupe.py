@@ -0,0 +1,120 @@
+import threading
+from collections import OrderedDict
+from . import reconifyEncoder
+
+#constants
+DEFAULT_MIN_BYTES = 1024
+DEFAULT_CACHE_SIZE = 1000
+BLOCK_KEYS = ('system', 'preamble', 'tools', 'functions', 'toolConfig')
+SYSTEM_ROLES = ('system', 'developer')
+REF = '$ref'
+
+#private variables
+__enabled = False
+__minBytes = DEFAULT_MIN_BYTES
+__cacheSize = DEFAULT_CACHE_SIZE
+__sent = OrderedDict()
+__lock = threading.Lock()
+
+def configure(**options):
+    global __enabled
+    global __minBytes
+    global __cacheSize
+
+    if 'dedupe' in options:
+        __enabled = options.get('dedupe') == True
+
+    if 'dedupeMinBytes' in options:
+        __minBytes = max(1, int(options.get('dedupeMinBytes')))
+
+    if 'dedupeCacheSize' in options:
+        __cacheSize = max(1, int(options.get('dedupeCacheSize')))
+
+def isEnabled():
+    return __enabled
+
+def reset():
+    #blocks are sent again once the tracker may not have received them
+    with __lock:
+        __sent.clear()
+
+def afterFork():
+    #the lock may have been held by a thread that does not exist in the child
+    global __lock
+    __lock = threading.Lock()
+    __sent.clear()
+
+def __role(message):
+    if isinstance(message, dict):
+        return message.get('role')
+    return getattr(message, 'role', None)
+
+def __ref(appKey, value, blocks):
+    encoded = reconifyEncoder.dumps(value)
+    if len(encoded) < __minBytes:
+        return value
+    import hashlib
+    digest = hashlib.sha256(encoded).hexdigest()
+    key = (appKey, digest)
+    with __lock:
+        if key in __sent:
+            __sent.move_to_end(key)
+        else:
+            blocks[digest] = value
+    return {REF: digest}
+
+def apply(payload):
+    #returns a copy of the payload with large system prompts and tool schemas replaced by references,
+    #each block is sent in full with every event that uses it until one of them has been delivered
+    request = payload.get('request')
+    if not isinstance(request, dict):
+        return payload
+    appKey = (payload.get('reconify') or {}).get('appKey')
+    blocks = {}
+    compact = dict(request)
+    for key in BLOCK_KEYS:
+        if compact.get(key):
+            compact[key] = __ref(appKey, compact[key], blocks)
+    messages = compact.get('messages')
+    if isinstance(messages, list):
+        compact['messages'] = [__ref(appKey, m, blocks) if __role(m) in SYSTEM_ROLES else m for m in messages]
+    result = dict(payload)
+    result['request'] = compact
+    if blocks:
+        result['blocks'] = blocks
+    return result
+
+def pending(payload):
+    #the blocks a payload returned by apply carries, to pass to delivered once it has been sent
+    blocks = payload.get('blocks')
+    if not blocks:
+        return None
+    appKey = (payload.get('reconify') or {}).get('appKey')
+    return [(appKey, digest) for digest in blocks]
+
+def delivered(keys):
+    #only blocks the tracker has acknowledged are referred to, so a reference can never reach it first,
+    #whatever the number of senders or the order their requests are handled in
+    with __lock:
+        for key in keys:
+            __sent[key] = True
+            __sent.move_to_end(key)
+        while len(__sent) > __cacheSize:
+            __sent.popitem(last=False)
+
+def expand(event, store):
+    #rebuilds a decoded event the way the tracker does, store keeps the blocks seen so far
+    store.update(event.pop('blocks', {}))
+    request = event.get('request')
+    if not isinstance(request, dict):
+        return event
+    def resolve(value):
+        if isinstance(value, dict) and list(value) == [REF]:
+            return store[value[REF]]
+        return value
+    for key in BLOCK_KEYS:
+        if key in request:
+            request[key] = resolve(request[key])
+    if isinstance(request.get('messages'), list):
+        request['messages'] = [resolve(m) for m in request['messages']]
+    return event
@@ -0,0 +1,125 @@
+import threading
+import time
+from collections import OrderedDict
+from . import reconifyEncoder
+
+#constants
+DEFAULT_SESSIONS = 1000
+DEFAULT_SESSION_TTL = 1800
+SEPARATOR = b'\x1e'
+
+#private variables
+__enabled = False
+__maxSessions = DEFAULT_SESSIONS
+__ttl = DEFAULT_SESSION_TTL
+__sessions = OrderedDict()
+__unacknowledged = OrderedDict()
+__lock = threading.Lock()
+
+def configure(**options):
+    global __enabled
+    global __maxSessions
+    global __ttl
+
+    if 'deltaEncoding' in options:
+        __enabled = options.get('deltaEncoding') == True
+
+    if 'deltaSessions' in options:
+        __maxSessions = max(1, int(options.get('deltaSessions')))
+
+    if 'deltaSessionTtl' in options:
+        __ttl = max(0, float(options.get('deltaSessionTtl')))
+
+def isEnabled():
+    return __enabled
+
+def reset():
+    #the next event of every session is sent in full
+    with __lock:
+        __sessions.clear()
+        __unacknowledged.clear()
+
+def afterFork():
+    #the lock may have been held by a thread that does not exist in the child
+    global __lock
+    __lock = threading.Lock()
+    __sessions.clear()
+    __unacknowledged.clear()
+
+def __expire(now):
+    while __sessions:
+        key, (count, digest, seen) = next(iter(__sessions.items()))
+        if now - seen < __ttl and len(__sessions) <= __maxSessions:
+            break
+        __sessions.popitem(last=False)
+
+def apply(payload):
+    #returns a copy of the payload that only carries the messages added since the last delivered event of the session
+    session = payload.get('session')
+    request = payload.get('request')
+    if not session or not isinstance(request, dict) or not isinstance(request.get('messages'), list):
+        return payload
+    messages = request['messages']
+    key = ((payload.get('reconify') or {}).get('appKey'), session)
+    now = time.monotonic()
+    with __lock:
+        state = __sessions.get(key)
+    count, previous = (state[0], state[1]) if state is not None and now - state[2] < __ttl else (None, None)
+    #rolling digest of the history, the prefix digest is taken where the last event ended
+    import hashlib
+    h = hashlib.sha256()
+    prefix = None
+    for i, message in enumerate(messages):
+        if i == count:
+            prefix = h.hexdigest()
+        h.update(reconifyEncoder.dumps(message))
+        h.update(SEPARATOR)
+    if count == len(messages):
+        prefix = h.hexdigest()
+    digest = h.hexdigest()
+    #the session moves on to this history once the event has been delivered
+    with __lock:
+        __unacknowledged[(key, digest)] = len(messages)
+        __unacknowledged.move_to_end((key, digest))
+        while len(__unacknowledged) > __maxSessions:
+            __unacknowledged.popitem(last=False)
+    result = dict(payload)
+    if prefix is not None and prefix == previous:
+        compact = dict(request)
+        compact['messages'] = messages[count:]
+        result['request'] = compact
+        result['delta'] = {'prefix': previous, 'offset': count, 'digest': digest}
+    else:
+        #first event of the session or the history was edited, send it in full
+        result['delta'] = {'digest': digest}
+    return result
+
+def pending(payload):
+    #the session and history of a payload returned by apply, to pass to delivered once it has been sent
+    delta = payload.get('delta')
+    if not delta:
+        return None
+    return ((payload.get('reconify') or {}).get('appKey'), payload.get('session')), delta['digest']
+
+def delivered(history):
+    #a delta only refers to a history the tracker has acknowledged, it keeps every one it received
+    now = time.monotonic()
+    key, digest = history
+    with __lock:
+        count = __unacknowledged.pop(history, None)
+        if count is None:
+            return
+        __sessions[key] = (count, digest, now)
+        __sessions.move_to_end(key)
+        __expire(now)
+
+def expand(event, store):
+    #rebuilds a decoded event the way the tracker does, store maps digests to the full message history
+    delta = event.pop('delta', None)
+    if delta is None:
+        return event
+    request = event['request']
+    if 'prefix' in delta:
+        request['messages'] = store[delta['prefix']] + request['messages']
+    store[delta['digest']] = request['messages']
+    return event
@@ -0,0 +1,195 @@
+#constants
+MAX_CACHED_HEADERS = 64
+IMAGE_CHUNK_CHARS = 64 * 1024
+FORMAT_PREFIX = b'{"reconify":{"format":"'
+#msgpack of {"reconify": {"format": ..., the map headers before and after the key are left out
+MSGPACK_RECONIFY = b'\xa8reconify'
+MSGPACK_FORMAT = b'\xa6format'
+MSGPACK_EVENTS = b'\x81\xa6events'
+
+#private variables
+__serializer = 'auto'
+__fast = None
+__json = None
+__encoding = 'json'
+__msgpack = None
+__headers = {}
+
+def __default(o):
+    #sdk response objects are sent as their attributes
+    if hasattr(o, '__dict__'):
+        return o.__dict__
+    return None
+
+def __packDefault(o):
+    if hasattr(o, '__dict__'):
+        return o.__dict__
+    #datetimes are sent as iso strings like orjson does
+    if hasattr(o, 'isoformat'):
+        return o.isoformat()
+    return None
+
+def __load():
+    #serializers are imported on the first send so importing a handler stays cheap
+    global __fast
+    global __json
+    global __msgpack
+    import json
+    __fast = None
+    __msgpack = None
+    if __encoding == 'msgpack':
+        #without the msgpack package events are sent as json
+        try:
+            import msgpack
+            __msgpack = msgpack
+        except ImportError:
+            pass
+    if __serializer != 'json':
+        try:
+            import orjson
+            __fast = orjson
+        except ImportError:
+            pass
+    __json = json
+
+def configure(**options):
+    global __serializer
+    global __encoding
+    global __json
+    if 'serializer' in options:
+        __serializer = options.get('serializer')
+        __json = None
+    if 'encoding' in options:
+        __encoding = options.get('encoding') or 'json'
+        __json = None
+    #the reconify block depends on the keys so it is encoded again after every config
+    __headers.clear()
+
+def dumps(o):
+    #single pass from sdk objects to utf-8 bytes
+    if __json is None:
+        __load()
+    if __fast is not None:
+        try:
+            return __fast.dumps(o, default=__default, option=__fast.OPT_NON_STR_KEYS)
+        except TypeError:
+            pass
+    #escaped ascii is faster to produce in the standard library encoder than raw utf-8
+    return __json.dumps(o, default=__default, separators=(',', ':')).encode('utf-8')
+
+def loads(s):
+    #used for provider responses the handlers have to decode themselves
+    if __json is None:
+        __load()
+    if __fast is not None:
+        return __fast.loads(s)
+    return __json.loads(s)
+
+def isBinary(body):
+    #msgpack events start with a map header, json events with a brace
+    return isinstance(body, bytes) and len(body) > 0 and 0x80 <= body[0] <= 0x8f
+
+def encodePayload(payload, binary=True):
+    #msgpack when it is the configured encoding and binary is not turned off for the tracker
+    if __json is None:
+        __load()
+    if binary and __msgpack is not None:
+        return __msgpack.packb(payload, default=__packDefault, use_bin_type=True)
+    header = payload.get('reconify')
+    if not isinstance(header, dict):
+        return dumps(payload)
+    key = tuple(header.items())
+    prefix = __headers.get(key)
+    if prefix is None:
+        prefix = b'{"reconify":' + dumps(header)
+        if len(__headers) >= MAX_CACHED_HEADERS:
+            __headers.clear()
+        __headers[key] = prefix
+    body = {k: v for k, v in payload.items() if k != 'reconify'}
+    if not body:
+        return prefix + b'}'
+    return prefix + b',' + dumps(body)[1:]
+
+#multipart body that decodes a base64 image while it is being sent, so the raw bytes are never held in full
+class MultipartImage:
+    def __init__(self, metadata, b64, filename, format=None):
+        import uuid
+        self.b64 = b64
+        self.format = format
+        self.boundary = uuid.uuid4().hex
+        self.head = (
+            f'--{self.boundary}\r\n'
+            'Content-Disposition: form-data; name="metadata"\r\n'
+            'Content-Type: application/json\r\n\r\n'
+        ).encode('utf-8') + metadata + (
+            f'\r\n--{self.boundary}\r\n'
+            f'Content-Disposition: form-data; name="file"; filename="{filename}"\r\n'
+            'Content-Type: image/png\r\n\r\n'
+        ).encode('utf-8')
+        self.tail = f'\r\n--{self.boundary}--\r\n'.encode('utf-8')
+        #padding is read from the end, rstrip would copy the whole string when there is any
+        self.size = len(b64) // 4 * 3 - b64[-2:].count('=')
+
+    def __len__(self):
+        return len(self.head) + self.size + len(self.tail)
+
+    def __iter__(self):
+        import base64
+        yield self.head
+        for i in range(0, len(self.b64), IMAGE_CHUNK_CHARS):
+            yield base64.b64decode(self.b64[i:i + IMAGE_CHUNK_CHARS])
+        yield self.tail
+
+    def headers(self):
+        return {
+            'Content-Type': f'multipart/form-data; boundary={self.boundary}',
+            'Content-Length': str(len(self))
+        }
+
+def encodeImageUpload(payload):
+    #returns a streamed multipart body for the upload, or None when the image is not base64 data
+    upload = payload.get('upload') or {}
+    data = upload.get('data')
+    b64 = data.get('b64_json') if isinstance(data, dict) else getattr(data, 'b64_json', None)
+    if not isinstance(b64, str) or len(b64) % 4 != 0:
+        return None
+    metadata = dict(payload)
+    metadata['upload'] = {k: v for k, v in upload.items() if k != 'data'}
+    metadata['upload']['format'] = 'binary'
+    return MultipartImage(encodePayload(metadata, False), b64, upload.get('filename'), (payload.get('reconify') or {}).get('format'))
+
+def frame(bodies):
+    #one request for a batch of events, msgpack events are framed without decoding them
+    if not isBinary(bodies[0]):
+        return b'{"events":[' + b','.join(bodies) + b']}'
+    count = len(bodies)
+    if count < 16:
+        size = bytes([0x90 | count])
+    elif count < 0x10000:
+        size = b'\xdc' + count.to_bytes(2, 'big')
+    else:
+        size = b'\xdd' + count.to_bytes(4, 'big')
+    return MSGPACK_EVENTS + size + b''.join(bodies)
+
+def toJson(body):
+    #a msgpack event or batch as json, for a tracker that does not take msgpack
+    if not isBinary(body):
+        return body
+    if __json is None:
+        __load()
+    import msgpack
+    return dumps(msgpack.unpackb(body, raw=False, strict_map_key=False))
+
+def formatOf(body):
+    #the handler format of an encoded event, read from the start of the reconify block without decoding
+    if isinstance(body, dict):
+        return (body.get('reconify') or {}).get('format') or 'unknown'
+    if isinstance(body, MultipartImage):
+        return body.format or 'unknown'
+    if body.startswith(FORMAT_PREFIX):
+        end = body.find(b'"', len(FORMAT_PREFIX))
+        if end > 0:
+            return body[len(FORMAT_PREFIX):end].decode('utf-8')
+    if isBinary(body) and body[1:10] == MSGPACK_RECONIFY and body[11:18] == MSGPACK_FORMAT and 0xa0 <= body[18] <= 0xbf:
+        return body[19:19 + body[18] - 0xa0].decode('utf-8')
+    return 'unknown'
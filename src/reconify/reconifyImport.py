@@ -0,0 +1,208 @@
+import gzip
+import json
+import os
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from . import reconifyEncoder
+from . import reconifyTransport
+
+#constants
+DEFAULT_BATCH_SIZE = 100
+DEFAULT_BATCH_BYTES = 1024 * 1024
+DEFAULT_CONCURRENCY = 4
+DEFAULT_RETRIES = 5
+RETRY_BACKOFF = 0.5
+RETRY_BACKOFF_MAX = 30
+GZIP_MAGIC = b'\x1f\x8b'
+#payload field to the dotted path it is read from in each record
+DEFAULT_MAPPING = {
+    'request': 'request',
+    'response': 'response',
+    'user': 'user',
+    'session': 'session',
+    'sessionTimeout': 'sessionTimeout',
+    'type': 'type',
+    'timestampRequest': 'timestamps.request',
+    'timestampResponse': 'timestamps.response'
+}
+
+def __open(path):
+    with open(path, 'rb') as f:
+        magic = f.read(2)
+    if magic == GZIP_MAGIC:
+        return gzip.open(path, 'rb')
+    return open(path, 'rb')
+
+def __lines(path, offset):
+    #yields (offset after the line, line), one line in memory at a time
+    #a gzip file is decompressed again up to the offset when an import is resumed
+    with __open(path) as f:
+        if offset:
+            f.seek(offset)
+        position = offset
+        for line in f:
+            position += len(line)
+            yield position, line
+
+def __records(source, offset):
+    if isinstance(source, (str, os.PathLike)):
+        return __lines(source, offset)
+    return ((None, record) for record in source)
+
+def __compile(mapping):
+    fields = dict(DEFAULT_MAPPING)
+    if mapping:
+        fields.update(mapping)
+    return [(target, source.split('.')) for target, source in fields.items() if source]
+
+def __lookup(record, path):
+    value = record
+    for key in path:
+        if not isinstance(value, dict):
+            return None
+        value = value.get(key)
+    return value
+
+def __timestamp(value):
+    #milliseconds, seconds or an iso 8601 string to milliseconds
+    if value is None or isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        return round(value * 1000) if value < 1e11 else round(value)
+    if isinstance(value, str):
+        try:
+            return __timestamp(float(value))
+        except ValueError:
+            pass
+        from datetime import datetime, timezone
+        try:
+            parsed = datetime.fromisoformat(value.replace('Z', '+00:00'))
+        except ValueError:
+            return None
+        if parsed.tzinfo is None:
+            parsed = parsed.replace(tzinfo=timezone.utc)
+        return round(parsed.timestamp() * 1000)
+    return None
+
+def mapRecord(record, mapping):
+    #returns the payload fields of one record, or None when it has neither a request nor a response
+    if isinstance(record, (bytes, str)):
+        record = reconifyEncoder.loads(record)
+    if not isinstance(record, dict):
+        return None
+    fields = {target: __lookup(record, path) for target, path in mapping}
+    if fields.get('request') is None and fields.get('response') is None:
+        return None
+    fields['timestampRequest'] = __timestamp(fields.get('timestampRequest'))
+    fields['timestampResponse'] = __timestamp(fields.get('timestampResponse'))
+    return fields
+
+def __loadCheckpoint(path, source):
+    #returns the offset to resume from, the checkpoint is ignored when it belongs to another file
+    try:
+        with open(path, 'r') as f:
+            state = json.load(f)
+    except (OSError, ValueError):
+        return 0
+    if state.get('source') != os.path.abspath(source):
+        return 0
+    return state.get('offset', 0)
+
+def __saveCheckpoint(path, source, offset):
+    tmp = path + '.tmp'
+    with open(tmp, 'w') as f:
+        json.dump({'source': os.path.abspath(source), 'offset': offset}, f)
+    os.replace(tmp, path)
+
+def __send(url, bodies, retries):
+    for attempt in range(retries + 1):
+        try:
+            if reconifyTransport.deliver(url, bodies):
+                return True
+        except Exception:
+            pass
+        if attempt < retries:
+            time.sleep(random.uniform(0, min(RETRY_BACKOFF_MAX, RETRY_BACKOFF * (2 ** attempt))))
+    return False
+
+def run(source, build, url, mapping=None, batchSize=DEFAULT_BATCH_SIZE, batchBytes=DEFAULT_BATCH_BYTES,
+        concurrency=DEFAULT_CONCURRENCY, rate=None, checkpoint=None, retries=DEFAULT_RETRIES, progress=None, debug=False):
+    #sends every record of a jsonl file (optionally gzip) or an iterable in parallel batches, returns the counts for this run
+    #records are read and encoded one batch at a time so memory stays constant whatever the size of the file
+    #the checkpoint only moves past a batch once it and every batch before it have been delivered
+    isFile = isinstance(source, (str, os.PathLike))
+    offset = 0
+    if checkpoint is not None and isFile:
+        offset = __loadCheckpoint(checkpoint, source)
+    counts = {'read': 0, 'sent': 0, 'skipped': 0, 'failed': 0, 'resumedAt': offset}
+    fields = __compile(mapping)
+    inflight = deque()
+    stopped = threading.Event()
+    started = time.monotonic()
+    queued = 0
+
+    def settle():
+        future, end, count = inflight.popleft()
+        if future.result() and not stopped.is_set():
+            counts['sent'] += count
+            if checkpoint is not None and end is not None:
+                __saveCheckpoint(checkpoint, source, end)
+        else:
+            #later batches may still be delivered, they are sent again when the import is resumed
+            counts['failed'] += count
+            stopped.set()
+        if progress is not None:
+            progress(dict(counts))
+
+    def submit(bodies, end):
+        nonlocal queued
+        #rate limit in events per second over the whole import
+        if rate:
+            wait = started + queued / rate - time.monotonic()
+            if wait > 0:
+                time.sleep(wait)
+        queued += len(bodies)
+        while len(inflight) >= concurrency * 2:
+            settle()
+        inflight.append((executor.submit(__send, url, bodies, retries), end, len(bodies)))
+
+    executor = ThreadPoolExecutor(max_workers=max(1, concurrency), thread_name_prefix='reconify-import')
+    try:
+        bodies = []
+        size = 0
+        end = offset
+        for end, record in __records(source, offset):
+            if stopped.is_set():
+                break
+            if isinstance(record, bytes) and not record.strip():
+                continue
+            counts['read'] += 1
+            try:
+                mapped = mapRecord(record, fields)
+            except ValueError:
+                mapped = None
+            if mapped is None:
+                counts['skipped'] += 1
+                if debug:
+                    print('Skipped record ending at', end)
+                continue
+            body = reconifyEncoder.encodePayload(build(mapped))
+            bodies.append(body)
+            size += len(body)
+            if len(bodies) >= batchSize or size >= batchBytes:
+                submit(bodies, end)
+                bodies = []
+                size = 0
+        if bodies and not stopped.is_set():
+            submit(bodies, end)
+    finally:
+        #an interrupted import still records how far it got
+        while inflight:
+            settle()
+        executor.shutdown()
+    counts['seconds'] = round(time.monotonic() - started, 3)
+    counts['complete'] = not stopped.is_set()
+    return counts
@@ -0,0 +1,140 @@
+import bisect
+import re
+import threading
+
+#constants
+LATENCY_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+EVENTS = ('queued', 'sent', 'dropped', 'spooled')
+REQUESTS = ('sent', 'failed')
+BYTES = ('encoded', 'sent')
+LATENCIES = ('serialize', 'send')
+
+#private variables
+__enabled = True
+__formats = {}
+__lock = threading.Lock()
+
+class Histogram:
+    __slots__ = ('counts', 'sum', 'count')
+
+    def __init__(self):
+        self.counts = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, seconds):
+        self.counts[bisect.bisect_left(LATENCY_BUCKETS, seconds)] += 1
+        self.sum += seconds
+        self.count += 1
+
+    def snapshot(self):
+        buckets = {}
+        total = 0
+        for bound, count in zip(LATENCY_BUCKETS + ('+Inf',), self.counts):
+            total += count
+            buckets[str(bound)] = total
+        return {'buckets': buckets, 'sum': round(self.sum, 6), 'count': self.count}
+
+def __new():
+    return {
+        'events': dict.fromkeys(EVENTS, 0),
+        'requests': dict.fromkeys(REQUESTS, 0),
+        'bytes': dict.fromkeys(BYTES, 0),
+        'latency': {name: Histogram() for name in LATENCIES}
+    }
+
+def __get(format):
+    metrics = __formats.get(format)
+    if metrics is None:
+        metrics = __formats.setdefault(format, __new())
+    return metrics
+
+def configure(**options):
+    global __enabled
+    if 'metrics' in options:
+        __enabled = options.get('metrics') != False
+
+def event(format, name, count=1):
+    if __enabled:
+        with __lock:
+            __get(format)['events'][name] += count
+
+def request(format, name, size=0):
+    if __enabled:
+        with __lock:
+            metrics = __get(format)
+            metrics['requests'][name] += 1
+            if size:
+                metrics['bytes']['sent'] += size
+
+def encoded(format, size, seconds):
+    if __enabled:
+        with __lock:
+            metrics = __get(format)
+            metrics['bytes']['encoded'] += size
+            metrics['latency']['serialize'].observe(seconds)
+
+def latency(format, name, seconds):
+    if __enabled:
+        with __lock:
+            __get(format)['latency'][name].observe(seconds)
+
+def reset():
+    with __lock:
+        __formats.clear()
+
+def afterFork():
+    #a forked child starts counting from zero so parent and child are not reported twice
+    global __lock
+    __lock = threading.Lock()
+    __formats.clear()
+
+def snapshot(gauges):
+    with __lock:
+        formats = {
+            format: {
+                'events': dict(metrics['events']),
+                'requests': dict(metrics['requests']),
+                'bytes': dict(metrics['bytes']),
+                'latency': {name: h.snapshot() for name, h in metrics['latency'].items()}
+            } for format, metrics in __formats.items()
+        }
+    return {'formats': formats, 'gauges': gauges}
+
+def __snake(name):
+    return re.sub(r'([A-Z])', lambda m: '_' + m.group(1).lower(), name)
+
+def __label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def prometheus(gauges):
+    #prometheus text exposition format
+    stats = snapshot(gauges)
+    lines = []
+    for name, kind, key, label in (
+        ('reconify_events_total', 'counter', 'events', 'state'),
+        ('reconify_requests_total', 'counter', 'requests', 'result'),
+        ('reconify_bytes_total', 'counter', 'bytes', 'stage')
+    ):
+        lines.append(f'# TYPE {name} {kind}')
+        for format, metrics in stats['formats'].items():
+            for state, value in metrics[key].items():
+                lines.append(f'{name}{{format="{__label(format)}",{label}="{state}"}} {value}')
+    for latencyName in LATENCIES:
+        name = f'reconify_{latencyName}_seconds'
+        lines.append(f'# TYPE {name} histogram')
+        for format, metrics in stats['formats'].items():
+            histogram = metrics['latency'][latencyName]
+            for bound, count in histogram['buckets'].items():
+                lines.append(f'{name}_bucket{{format="{__label(format)}",le="{bound}"}} {count}')
+            lines.append(f'{name}_sum{{format="{__label(format)}"}} {histogram["sum"]}')
+            lines.append(f'{name}_count{{format="{__label(format)}"}} {histogram["count"]}')
+    for gauge, value in stats['gauges'].items():
+        name = f'reconify_{__snake(gauge)}'
+        lines.append(f'# TYPE {name} gauge')
+        lines.append(f'{name} {value}')
+    return '\n'.join(lines) + '\n'
+
+def dumps(gauges):
+    import json
+    return json.dumps(snapshot(gauges))
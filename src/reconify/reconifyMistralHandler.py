@@ -1,19 +1,15 @@
 import time
-import requests
-import json
-import uuid
+from . import reconifyTransport
+from . import reconifyContext
+from . import reconifyModelStats
+from . import reconifyRollup
+from . import reconifyStream
 
 #constants
 RECONIFY_TRACKER = 'https://track.reconify.com/track'
 RECONIFY_UPLOADER = 'https://track.reconify.com/upload'
 RECONIFY_MODULE_VERSION = '3.0.0'
 
-#private class
-class __CompletionEncoder(json.JSONEncoder):
-    def default(self, o):
-        if hasattr(o, '__dict__'):
-            return o.__dict__
-
 #private variables 
 __format = 'mistral'
 __appKey = None
@@ -26,12 +22,28 @@ __session = ''
 __sessionTimeout = ''
 __trackImages = True
 
-def __logInteraction(input, output, timestampIn, timestampOut, type):
+def __record(input, output, type, seconds):
+    #local model stats for every call, and the usage summary in rollup mode
+    reconifyModelStats.record(__format, input, output, type, seconds)
+    if reconifyRollup.isEnabled():
+        reconifyTransport.rollup(__tracker, {
+            "format": __format,
+            "appKey": __appKey,
+            "apiKey": __apiKey,
+            "version": RECONIFY_MODULE_VERSION,
+        }, input, output, type, seconds, reconifyContext.resolve(__user, __session, __sessionTimeout))
+
+def __logInteraction(input, output, timestampIn, timestampOut, type, background=False, timestampFirstToken=None, sampleRate=None, identity=None):
+    if identity is None:
+        identity = reconifyContext.resolve(__user, __session, __sessionTimeout)
+    user, session, sessionTimeout = identity
+    if sampleRate is None:
+        sampleRate = reconifyTransport.sample(user, session)
+        if sampleRate is None:
+            return
     if __debug:
         print('Logging interaction')
 
-    json_input = json.loads(json.dumps(input, cls=__CompletionEncoder))
-    json_output = json.loads(json.dumps(output, cls=__CompletionEncoder))
     payload = {
         "reconify" :{
             "format": __format,
@@ -40,26 +52,43 @@ def __logInteraction(input, output, timestampIn, timestampOut, type):
             "type": type,
             "version": RECONIFY_MODULE_VERSION,
         },
-        "request": json_input,
-        "response": json_output,
-        "user": __user,
-        "session": __session,
-        "sessionTimeout": __sessionTimeout,
+        "request": input,
+        "response": output,
+        "user": user,
+        "session": session,
+        "sessionTimeout": sessionTimeout,
         "timestamps": {
             "request": timestampIn,
             "response": timestampOut
         },
     }
+    if timestampFirstToken is not None:
+        payload['timestamps']['firstToken'] = timestampFirstToken
+    if sampleRate < 1:
+        payload['sampleRate'] = sampleRate
     if __debug:
         print('Sending payload: ', payload)
-    try:
-        requests.post(__tracker, json=payload)
-    except requests.exceptions.RequestException as err:
-        if __debug:
-            print('Send error: ', err)
+    reconifyTransport.send(__tracker, payload, background)
 
     return
 
+def __wrapStream(input, stream, timestampIn, type, isAsync=False, started=None):
+    #sampled out streams are returned as they are unless they are needed for the model stats or rollup
+    identity = reconifyContext.resolve(__user, __session, __sessionTimeout)
+    user, session, sessionTimeout = identity
+    sampleRate = reconifyTransport.sample(user, session)
+    if sampleRate is None and not reconifyModelStats.isEnabled() and not reconifyRollup.isEnabled():
+        return stream
+    #log once the caller has consumed the stream, chunks are passed through untouched
+    def onComplete(output, timestampFirstToken, timestampOut):
+        if started is not None:
+            __record(input, output, type, time.perf_counter() - started)
+        if sampleRate is not None:
+            __logInteraction(input, output, timestampIn, timestampOut, type, isAsync, timestampFirstToken, sampleRate, identity)
+    if isAsync:
+        return reconifyStream.AsyncStreamWrapper(stream, reconifyStream.ChatChunkAccumulator(), onComplete, __debug)
+    return reconifyStream.StreamWrapper(stream, reconifyStream.ChatChunkAccumulator(), onComplete, __debug)
+
 
 def config (client, appKey, apiKey, **options):
     global __appKey
@@ -89,16 +118,41 @@ def config (client, appKey, apiKey, **options):
     if 'trackImages' in options and options.get('trackImages') == False:
         __trackImages = False
 
+    reconifyTransport.configure(**options)
+
     #override chat 
     client.originalChat = client.chat
-    def __reconifyChat(*args, **kwargs):
-        tsIn = round(time.time()*1000)
-        response = client.originalChat(*args, **kwargs)
-        tsOut = round(time.time()*1000)
-        __logInteraction(kwargs, response, tsIn, tsOut, 'chat')
-        return response 
+    if reconifyStream._isAsync(client.originalChat):
+        async def __reconifyChat(*args, **kwargs):
+            tsIn = round(time.time()*1000)
+            started = time.perf_counter()
+            response = await client.originalChat(*args, **kwargs)
+            tsOut = round(time.time()*1000)
+            __record(kwargs, response, 'chat', time.perf_counter() - started)
+            __logInteraction(kwargs, response, tsIn, tsOut, 'chat', True)
+            return response
+    else:
+        def __reconifyChat(*args, **kwargs):
+            tsIn = round(time.time()*1000)
+            started = time.perf_counter()
+            response = client.originalChat(*args, **kwargs)
+            tsOut = round(time.time()*1000)
+            __record(kwargs, response, 'chat', time.perf_counter() - started)
+            __logInteraction(kwargs, response, tsIn, tsOut, 'chat')
+            return response 
     client.chat = __reconifyChat 
 
+    #override chat stream
+    if hasattr(client, 'chat_stream'):
+        client.originalChatStream = client.chat_stream
+        isAsyncStream = reconifyStream._isAsyncGenerator(client.originalChatStream)
+        def __reconifyChatStream(*args, **kwargs):
+            tsIn = round(time.time()*1000)
+            started = time.perf_counter()
+            response = client.originalChatStream(*args, **kwargs)
+            return __wrapStream(kwargs, response, tsIn, 'chat', isAsyncStream, started)
+        client.chat_stream = __reconifyChatStream
+
 
 def setUser(user):
     global __user
@@ -110,4 +164,19 @@ def setSession(session):
 
 def setSessionTimeout(sessionTimeout):
     global __sessionTimeout
-    __sessionTimeout = sessionTimeout
\ No newline at end of file
+    __sessionTimeout = sessionTimeout
+
+def context(**values):
+    return reconifyContext.context(**values)
+
+def flush(timeout=None):
+    return reconifyTransport.flush(timeout)
+
+def invocation(function):
+    return reconifyTransport.invocation(function)
+
+def stats(output='dict'):
+    return reconifyTransport.stats(output)
+
+def modelStats():
+    return reconifyModelStats.snapshot()
\ No newline at end of file
@@ -0,0 +1,153 @@
+import threading
+from array import array
+from . import reconifyUsage
+
+#constants
+DEFAULT_MAX_KEYS = 100
+OTHER_MODEL = 'other'
+PRECISION_BITS = 6
+MAX_MICROS = 3600 * 1000000
+TOKEN_RATE_SCALE = 100
+PERCENTILES = (0.5, 0.9, 0.99)
+
+#private variables
+__enabled = True
+__maxKeys = DEFAULT_MAX_KEYS
+__models = {}
+__lock = threading.Lock()
+
+#log-linear histogram in the style of HdrHistogram, values within about 3% in a fixed number of buckets
+class Histogram:
+    SUB_BUCKETS = 1 << PRECISION_BITS
+    HALF = 1 << (PRECISION_BITS - 1)
+
+    def __init__(self, maxValue):
+        self.maxValue = maxValue
+        self.counts = array('q', [0]) * (self.__index(maxValue) + 1)
+        self.count = 0
+        self.total = 0
+        self.max = 0
+
+    def __index(self, value):
+        shift = value.bit_length() - PRECISION_BITS
+        if shift <= 0:
+            return value
+        return (shift << (PRECISION_BITS - 1)) + (value >> shift)
+
+    def __value(self, index):
+        #midpoint of the bucket
+        if index < self.SUB_BUCKETS:
+            return index
+        shift = index // self.HALF - 1
+        top = index - (shift << (PRECISION_BITS - 1))
+        return (top << shift) + (1 << shift) // 2
+
+    def record(self, value):
+        value = min(max(0, int(value)), self.maxValue)
+        self.counts[self.__index(value)] += 1
+        self.count += 1
+        self.total += value
+        if value > self.max:
+            self.max = value
+
+    def percentile(self, q):
+        if self.count == 0:
+            return None
+        rank = max(1, int(round(q * self.count)))
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank:
+                return min(self.__value(index), self.max)
+        return self.max
+
+    def summary(self, scale):
+        if self.count == 0:
+            return {'count': 0}
+        result = {'count': self.count, 'mean': self.total / self.count / scale, 'max': self.max / scale}
+        for q in PERCENTILES:
+            result[f'p{int(q * 100)}'] = self.percentile(q) / scale
+        return result
+
+class _ModelStats:
+    def __init__(self):
+        self.latency = Histogram(MAX_MICROS)
+        self.tokensPerSecond = Histogram(1000000 * TOKEN_RATE_SCALE)
+        self.inputTokens = 0
+        self.outputTokens = 0
+
+def configure(**options):
+    global __enabled
+    global __maxKeys
+
+    if 'modelStats' in options:
+        __enabled = options.get('modelStats') != False
+
+    if 'modelStatsKeys' in options:
+        __maxKeys = max(1, int(options.get('modelStatsKeys')))
+
+def isEnabled():
+    return __enabled
+
+def __stats(model, operation):
+    key = (model, operation)
+    stats = __models.get(key)
+    if stats is None:
+        #models past the limit share one entry so memory stays fixed
+        if len(__models) >= __maxKeys:
+            key = (OTHER_MODEL, operation)
+            stats = __models.get(key)
+        if stats is None:
+            stats = __models[key] = _ModelStats()
+    return stats
+
+def record(format, input, output, operation, seconds):
+    #called by the wrappers for every call, sampled or not, seconds come from perf_counter
+    if not __enabled:
+        return
+    try:
+        model = reconifyUsage.modelOf(input, output)
+        inputTokens, outputTokens = reconifyUsage.extract(format, output)
+        with __lock:
+            stats = __stats(model, operation)
+            stats.latency.record(seconds * 1000000)
+            if inputTokens:
+                stats.inputTokens += inputTokens
+            if outputTokens:
+                stats.outputTokens += outputTokens
+                if seconds > 0:
+                    stats.tokensPerSecond.record(outputTokens / seconds * TOKEN_RATE_SCALE)
+    except Exception:
+        #local stats must never fail the wrapped call
+        pass
+
+def latency(model, operation, q=0.99):
+    #latency in seconds at percentile q, None before the first call
+    with __lock:
+        stats = __models.get((model, operation))
+        if stats is None:
+            return None
+        value = stats.latency.percentile(q)
+    return None if value is None else value / 1000000
+
+def snapshot():
+    #{model: {operation: {calls, latency, tokensPerSecond, usage}}}, latency is in seconds
+    result = {}
+    with __lock:
+        for (model, operation), stats in __models.items():
+            result.setdefault(model, {})[operation] = {
+                'calls': stats.latency.count,
+                'latency': stats.latency.summary(1000000),
+                'tokensPerSecond': stats.tokensPerSecond.summary(TOKEN_RATE_SCALE),
+                'usage': {'inputTokens': stats.inputTokens, 'outputTokens': stats.outputTokens}
+            }
+    return result
+
+def reset():
+    with __lock:
+        __models.clear()
+
+def afterFork():
+    global __lock
+    __lock = threading.Lock()
+    __models.clear()
@@ -1,18 +1,15 @@
 import time
-import requests
-import json
-import uuid
+from . import reconifyTransport
+from . import reconifyContext
+from . import reconifyModelStats
+from . import reconifyRollup
+from . import reconifyStream
 
 #constants
 RECONIFY_TRACKER = 'https://track.reconify.com/track'
 RECONIFY_UPLOADER = 'https://track.reconify.com/upload'
 RECONIFY_MODULE_VERSION = '3.0.0'
 
-#private class
-class __CompletionEncoder(json.JSONEncoder):
-    def default(self, o):
-        return o.__dict__
-
 #private variables 
 __format = 'openai'
 __appKey = None
@@ -25,11 +22,28 @@ __session = ''
 __sessionTimeout = ''
 __trackImages = True
 
-def __logInteraction(input, output, timestampIn, timestampOut, type):
+def __record(input, output, type, seconds):
+    #local model stats for every call, and the usage summary in rollup mode
+    reconifyModelStats.record(__format, input, output, type, seconds)
+    if reconifyRollup.isEnabled():
+        reconifyTransport.rollup(__tracker, {
+            "format": __format,
+            "appKey": __appKey,
+            "apiKey": __apiKey,
+            "version": RECONIFY_MODULE_VERSION,
+        }, input, output, type, seconds, reconifyContext.resolve(__user, __session, __sessionTimeout))
+
+def __logInteraction(input, output, timestampIn, timestampOut, type, background=False, timestampFirstToken=None, sampleRate=None, identity=None):
+    if identity is None:
+        identity = reconifyContext.resolve(__user, __session, __sessionTimeout)
+    user, session, sessionTimeout = identity
+    if sampleRate is None:
+        sampleRate = reconifyTransport.sample(user, session)
+        if sampleRate is None:
+            return
     if __debug:
         print('Logging interaction')
 
-    json_output = json.loads(json.dumps(output, cls=__CompletionEncoder))
     payload = {
         "reconify" :{
             "format": __format,
@@ -39,49 +53,69 @@ def __logInteraction(input, output, timestampIn, timestampOut, type):
             "version": RECONIFY_MODULE_VERSION,
         },
         "request": input,
-        "response": json_output,
-        "user": __user,
-        "session": __session,
-        "sessionTimeout": __sessionTimeout,
+        "response": output,
+        "user": user,
+        "session": session,
+        "sessionTimeout": sessionTimeout,
         "timestamps": {
             "request": timestampIn,
             "response": timestampOut
         },
     }
+    if timestampFirstToken is not None:
+        payload['timestamps']['firstToken'] = timestampFirstToken
+    if sampleRate < 1:
+        payload['sampleRate'] = sampleRate
     if __debug:
         print('Sending payload: ', payload)
-    try:
-        requests.post(__tracker, json=payload)
-    except requests.exceptions.RequestException as err:
-        if __debug:
-            print('Send error: ', err)
+    reconifyTransport.send(__tracker, payload, background)
 
     return
 
+def __wrapStream(input, stream, timestampIn, type, isAsync=False, started=None):
+    #sampled out streams are returned as they are unless they are needed for the model stats or rollup
+    identity = reconifyContext.resolve(__user, __session, __sessionTimeout)
+    user, session, sessionTimeout = identity
+    sampleRate = reconifyTransport.sample(user, session)
+    if sampleRate is None and not reconifyModelStats.isEnabled() and not reconifyRollup.isEnabled():
+        return stream
+    #log once the caller has consumed the stream, chunks are passed through untouched
+    def onComplete(output, timestampFirstToken, timestampOut):
+        if started is not None:
+            __record(input, output, type, time.perf_counter() - started)
+        if sampleRate is not None:
+            __logInteraction(input, output, timestampIn, timestampOut, type, isAsync, timestampFirstToken, sampleRate, identity)
+    if isAsync:
+        return reconifyStream.AsyncStreamWrapper(stream, reconifyStream.ChatChunkAccumulator(), onComplete, __debug)
+    return reconifyStream.StreamWrapper(stream, reconifyStream.ChatChunkAccumulator(), onComplete, __debug)
+
 def __uploadImage(payload):
     if __debug:
         print('uploading image')
     
-    try:
-        requests.post(__uploader, json=payload)
-    except requests.exceptions.RequestException as err:
-        if __debug:
-            print('upload error: ', err)
+    reconifyTransport.upload(__uploader, payload)
     return
 
-def __logInteractionWithImageData(input, output, timestampIn, timestampOut, type):
+def __logInteractionWithImageData(input, output, timestampIn, timestampOut, type, background=False):
+    identity = reconifyContext.resolve(__user, __session, __sessionTimeout)
+    user, session, sessionTimeout = identity
+    sampleRate = reconifyTransport.sample(user, session)
+    if sampleRate is None:
+        return
     if __debug:
         print('Logging interaction with image data')
 
-    json_output = json.loads(json.dumps(output, cls=__CompletionEncoder))
-    _copy = json_output.copy()
-    n = len(_copy.get('data'))
+    #shallow copy, the image data itself is only referenced by the uploads
+    _copy = dict(output) if isinstance(output, dict) else dict(vars(output))
+    data = _copy.get('data')
+    n = len(data)
     filenames = []
+    import uuid
     randomId = str(uuid.uuid4())
     for i in range(n):
         filenames.append(f"{randomId}-{_copy.get('created')}-{i}.png")
     _copy['data'] = filenames
-    __logInteraction(input, _copy, timestampIn, timestampOut, type)
+    __logInteraction(input, _copy, timestampIn, timestampOut, type, background, sampleRate=sampleRate, identity=identity)
 
     #send each image
     for i in range(n):
@@ -96,7 +130,7 @@ def __logInteractionWithImageData(input, output, timestampIn, timestampOut, type
         "upload": {
             "filename": filenames[i],
             "type": 'response-image',
-            'data': json_output.get('data')[i],
+            'data': data[i],
             'format': 'b64_json'
         }
         })
@@ -131,39 +165,90 @@ def config (openai, appKey, apiKey, **options):
     if 'trackImages' in options and options.get('trackImages') == False:
         __trackImages = False
 
+    reconifyTransport.configure(**options)
+
     #override chat create
     openai.chat.completions.originalCreate = openai.chat.completions.create
-    def __reconifyCreateChatCompletion(*args, **kwargs):
-        tsIn = round(time.time()*1000)
-        response = openai.chat.completions.originalCreate(*args, **kwargs)
-        tsOut = round(time.time()*1000)
-        __logInteraction(kwargs, response, tsIn, tsOut, 'chat')
-        return response 
+    if reconifyStream._isAsync(openai.chat.completions.originalCreate):
+        async def __reconifyCreateChatCompletion(*args, **kwargs):
+            tsIn = round(time.time()*1000)
+            started = time.perf_counter()
+            response = await openai.chat.completions.originalCreate(*args, **kwargs)
+            if kwargs.get('stream') == True:
+                return __wrapStream(kwargs, response, tsIn, 'chat', True, started)
+            tsOut = round(time.time()*1000)
+            __record(kwargs, response, 'chat', time.perf_counter() - started)
+            __logInteraction(kwargs, response, tsIn, tsOut, 'chat', True)
+            return response
+    else:
+        def __reconifyCreateChatCompletion(*args, **kwargs):
+            tsIn = round(time.time()*1000)
+            started = time.perf_counter()
+            response = openai.chat.completions.originalCreate(*args, **kwargs)
+            if kwargs.get('stream') == True:
+                return __wrapStream(kwargs, response, tsIn, 'chat', False, started)
+            tsOut = round(time.time()*1000)
+            __record(kwargs, response, 'chat', time.perf_counter() - started)
+            __logInteraction(kwargs, response, tsIn, tsOut, 'chat')
+            return response 
     openai.chat.completions.create = __reconifyCreateChatCompletion 
 
     #override completion create
     openai.completions.originalCreate = openai.completions.create
-    def __reconifyCreateCompletion(*args, **kwargs):
-        tsIn = round(time.time()*1000)
-        response = openai.completions.originalCreate(*args, **kwargs)
-        tsOut = round(time.time()*1000)
-        __logInteraction(kwargs, response, tsIn, tsOut, 'completion')
-        return response 
+    if reconifyStream._isAsync(openai.completions.originalCreate):
+        async def __reconifyCreateCompletion(*args, **kwargs):
+            tsIn = round(time.time()*1000)
+            started = time.perf_counter()
+            response = await openai.completions.originalCreate(*args, **kwargs)
+            if kwargs.get('stream') == True:
+                return __wrapStream(kwargs, response, tsIn, 'completion', True, started)
+            tsOut = round(time.time()*1000)
+            __record(kwargs, response, 'completion', time.perf_counter() - started)
+            __logInteraction(kwargs, response, tsIn, tsOut, 'completion', True)
+            return response
+    else:
+        def __reconifyCreateCompletion(*args, **kwargs):
+            tsIn = round(time.time()*1000)
+            started = time.perf_counter()
+            response = openai.completions.originalCreate(*args, **kwargs)
+            if kwargs.get('stream') == True:
+                return __wrapStream(kwargs, response, tsIn, 'completion', False, started)
+            tsOut = round(time.time()*1000)
+            __record(kwargs, response, 'completion', time.perf_counter() - started)
+            __logInteraction(kwargs, response, tsIn, tsOut, 'completion')
+            return response 
     openai.completions.create = __reconifyCreateCompletion
 
     #override image create
     openai.images.originalCreateImage = openai.images.generate
-    def __reconifyCreateImage(*args, **kwargs):
-        tsIn = round(time.time()*1000)
-        response = openai.images.originalCreateImage(*args, **kwargs)
-        tsOut = round(time.time()*1000)
-        if __trackImages:
-            if 'response_format' not in kwargs or kwargs.get('response_format') == 'url':
-                __logInteraction(kwargs, response, tsIn, tsOut, 'image')
-            else:
-                __logInteractionWithImageData(kwargs, response, tsIn, tsOut, 'image')
-        
-        return response 
+    if reconifyStream._isAsync(openai.images.originalCreateImage):
+        async def __reconifyCreateImage(*args, **kwargs):
+            tsIn = round(time.time()*1000)
+            started = time.perf_counter()
+            response = await openai.images.originalCreateImage(*args, **kwargs)
+            tsOut = round(time.time()*1000)
+            __record(kwargs, response, 'image', time.perf_counter() - started)
+            if __trackImages:
+                if 'response_format' not in kwargs or kwargs.get('response_format') == 'url':
+                    __logInteraction(kwargs, response, tsIn, tsOut, 'image', True)
+                else:
+                    __logInteractionWithImageData(kwargs, response, tsIn, tsOut, 'image', True)
+
+            return response
+    else:
+        def __reconifyCreateImage(*args, **kwargs):
+            tsIn = round(time.time()*1000)
+            started = time.perf_counter()
+            response = openai.images.originalCreateImage(*args, **kwargs)
+            tsOut = round(time.time()*1000)
+            __record(kwargs, response, 'image', time.perf_counter() - started)
+            if __trackImages:
+                if 'response_format' not in kwargs or kwargs.get('response_format') == 'url':
+                    __logInteraction(kwargs, response, tsIn, tsOut, 'image')
+                else:
+                    __logInteractionWithImageData(kwargs, response, tsIn, tsOut, 'image')
+            
+            return response 
     openai.images.generate = __reconifyCreateImage
     return
 
@@ -177,4 +262,19 @@ def setSession(session):
 
 def setSessionTimeout(sessionTimeout):
     global __sessionTimeout
-    __sessionTimeout = sessionTimeout
\ No newline at end of file
+    __sessionTimeout = sessionTimeout
+
+def context(**values):
+    return reconifyContext.context(**values)
+
+def flush(timeout=None):
+    return reconifyTransport.flush(timeout)
+
+def invocation(function):
+    return reconifyTransport.invocation(function)
+
+def stats(output='dict'):
+    return reconifyTransport.stats(output)
+
+def modelStats():
+    return reconifyModelStats.snapshot()
\ No newline at end of file
@@ -1,7 +1,8 @@
 import time
-import requests
-import json
-import uuid
+from . import reconifyTransport
+from . import reconifyContext
+from . import reconifyModelStats
+from . import reconifyRollup
 
 #constants
 RECONIFY_TRACKER = 'https://track.reconify.com/track'
@@ -19,7 +20,25 @@ __session = ''
 __sessionTimeout = ''
 __trackImages = True
 
-def __logInteraction(input, output, timestampIn, timestampOut, type):
+def __record(input, output, type, seconds):
+    #local model stats for every call, and the usage summary in rollup mode
+    reconifyModelStats.record('openai', input, output, type, seconds)
+    if reconifyRollup.isEnabled():
+        reconifyTransport.rollup(__tracker, {
+            "format": 'openai',
+            "appKey": __appKey,
+            "apiKey": __apiKey,
+            "version": RECONIFY_MODULE_VERSION,
+        }, input, output, type, seconds, reconifyContext.resolve(__user, __session, __sessionTimeout))
+
+def __logInteraction(input, output, timestampIn, timestampOut, type, sampleRate=None, identity=None):
+    if identity is None:
+        identity = reconifyContext.resolve(__user, __session, __sessionTimeout)
+    user, session, sessionTimeout = identity
+    if sampleRate is None:
+        sampleRate = reconifyTransport.sample(user, session)
+        if sampleRate is None:
+            return
     if __debug:
         print('Logging interaction')
     payload = {
@@ -32,21 +51,19 @@ def __logInteraction(input, output, timestampIn, timestampOut, type):
         },
         "request": input,
         "response": output,
-        "user": __user,
-        "session": __session,
-        "sessionTimeout": __sessionTimeout,
+        "user": user,
+        "session": session,
+        "sessionTimeout": sessionTimeout,
         "timestamps": {
             "request": timestampIn,
             "response": timestampOut
         },
     }
+    if sampleRate < 1:
+        payload['sampleRate'] = sampleRate
     if __debug:
         print('Sending payload: ', payload)
-    try:
-        requests.post(__tracker, json=payload)
-    except requests.exceptions.RequestException as err:
-        if __debug:
-            print('Send error: ', err)
+    reconifyTransport.send(__tracker, payload)
 
     return
 
@@ -54,25 +71,27 @@ def __uploadImage(payload):
     if __debug:
         print('uploading image')
     
-    try:
-        requests.post(__uploader, json=payload)
-    except requests.exceptions.RequestException as err:
-        if __debug:
-            print('upload error: ', err)
+    reconifyTransport.upload(__uploader, payload)
     return
 
 def __logInteractionWithImageData(input, output, timestampIn, timestampOut, type):
+    identity = reconifyContext.resolve(__user, __session, __sessionTimeout)
+    user, session, sessionTimeout = identity
+    sampleRate = reconifyTransport.sample(user, session)
+    if sampleRate is None:
+        return
     if __debug:
         print('Logging interaction with image data')
 
     _copy = output.copy()
     n = len(_copy.get('data'))
     filenames = []
+    import uuid
     randomId = str(uuid.uuid4())
     for i in range(n):
         filenames.append(f"{randomId}-{_copy.get('created')}-{i}.png")
     _copy['data'] = filenames
-    __logInteraction(input, _copy, timestampIn, timestampOut, type)
+    __logInteraction(input, _copy, timestampIn, timestampOut, type, sampleRate, identity)
 
     #send each image
     for i in range(n):
@@ -122,12 +141,16 @@ def config (openai, appKey, apiKey, **options):
     if 'trackImages' in options and options.get('trackImages') == False:
         __trackImages = False
 
+    reconifyTransport.configure(**options)
+
     #override chat create
     openai.ChatCompletion.originalCreate = openai.ChatCompletion.create
     def __reconifyCreateChatCompletion(*args, **kwargs):
         tsIn = round(time.time()*1000)
+        started = time.perf_counter()
         response = openai.ChatCompletion.originalCreate(*args, **kwargs)
         tsOut = round(time.time()*1000)
+        __record(kwargs, response, 'chat', time.perf_counter() - started)
         __logInteraction(kwargs, response, tsIn, tsOut, 'chat')
         return response 
     openai.ChatCompletion.create = __reconifyCreateChatCompletion 
@@ -136,8 +159,10 @@ def config (openai, appKey, apiKey, **options):
     openai.Completion.originalCreate = openai.Completion.create
     def __reconifyCreateCompletion(*args, **kwargs):
         tsIn = round(time.time()*1000)
+        started = time.perf_counter()
         response = openai.Completion.originalCreate(*args, **kwargs)
         tsOut = round(time.time()*1000)
+        __record(kwargs, response, 'completion', time.perf_counter() - started)
         __logInteraction(kwargs, response, tsIn, tsOut, 'completion')
         return response 
     openai.Completion.create = __reconifyCreateCompletion
@@ -146,8 +171,10 @@ def config (openai, appKey, apiKey, **options):
     openai.Image.originalCreateImage = openai.Image.create
     def __reconifyCreateImage(*args, **kwargs):
         tsIn = round(time.time()*1000)
+        started = time.perf_counter()
         response = openai.Image.originalCreateImage(*args, **kwargs)
         tsOut = round(time.time()*1000)
+        __record(kwargs, response, 'image', time.perf_counter() - started)
         if __trackImages:
             if 'response_format' not in kwargs or kwargs.get('response_format') == 'url':
                 __logInteraction(kwargs, response, tsIn, tsOut, 'image')
@@ -168,4 +195,19 @@ def setSession(session):
 
 def setSessionTimeout(sessionTimeout):
     global __sessionTimeout
-    __sessionTimeout = sessionTimeout
\ No newline at end of file
+    __sessionTimeout = sessionTimeout
+
+def context(**values):
+    return reconifyContext.context(**values)
+
+def flush(timeout=None):
+    return reconifyTransport.flush(timeout)
+
+def invocation(function):
+    return reconifyTransport.invocation(function)
+
+def stats(output='dict'):
+    return reconifyTransport.stats(output)
+
+def modelStats():
+    return reconifyModelStats.snapshot()
\ No newline at end of file
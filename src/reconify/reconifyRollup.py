@@ -0,0 +1,120 @@
+import threading
+import time
+from . import reconifyUsage
+from . import reconifyMetrics
+
+#constants
+DEFAULT_INTERVAL = 60
+DEFAULT_MAX_KEYS = 1000
+DEFAULT_DIMENSIONS = ('model', 'type')
+DIMENSIONS = ('model', 'type', 'user', 'session')
+OTHER = 'other'
+
+#private variables
+__enabled = False
+__interval = DEFAULT_INTERVAL
+__maxKeys = DEFAULT_MAX_KEYS
+__dimensions = DEFAULT_DIMENSIONS
+__windows = {}
+__windowStart = None
+__lock = threading.Lock()
+
+def configure(**options):
+    global __enabled
+    global __interval
+    global __maxKeys
+    global __dimensions
+
+    if 'rollup' in options:
+        __enabled = options.get('rollup') == True
+
+    if 'rollupInterval' in options:
+        __interval = max(1, float(options.get('rollupInterval')))
+
+    if 'rollupMaxKeys' in options:
+        __maxKeys = max(1, int(options.get('rollupMaxKeys')))
+
+    if 'rollupDimensions' in options:
+        dimensions = tuple(options.get('rollupDimensions'))
+        for dimension in dimensions:
+            if dimension not in DIMENSIONS:
+                raise Exception(f'Unknown rollup dimension: {dimension}')
+        __dimensions = dimensions
+
+def isEnabled():
+    return __enabled
+
+def interval():
+    return __interval
+
+def __dimension(name, model, type, identity):
+    if name == 'model':
+        return model
+    if name == 'type':
+        return type
+    user, session, sessionTimeout = identity
+    if name == 'user':
+        return user.get('userId') if isinstance(user, dict) else None
+    return session or None
+
+def add(url, header, input, output, type, seconds, identity):
+    #aggregates one call into the current window, only usage, model, type and latency are kept
+    global __windowStart
+    model = reconifyUsage.modelOf(input, output)
+    inputTokens, outputTokens = reconifyUsage.extract(header.get('format'), output)
+    dimensions = tuple((name, __dimension(name, model, type, identity)) for name in __dimensions)
+    headerKey = tuple(header.items())
+    with __lock:
+        if __windowStart is None:
+            __windowStart = round(time.time()*1000)
+        key = (url, headerKey, dimensions)
+        rollup = __windows.get(key)
+        if rollup is None:
+            #past the limit further keys share one entry per tracker and app so memory stays fixed
+            if len(__windows) >= __maxKeys:
+                key = (url, headerKey, tuple((name, OTHER) for name in __dimensions))
+                rollup = __windows.get(key)
+            if rollup is None:
+                rollup = __windows[key] = {'calls': 0, 'inputTokens': 0, 'outputTokens': 0, 'latency': reconifyMetrics.Histogram()}
+        rollup['calls'] += 1
+        rollup['inputTokens'] += inputTokens or 0
+        rollup['outputTokens'] += outputTokens or 0
+        rollup['latency'].observe(seconds)
+
+def drain():
+    #ends the current window, returns a list of (url, payload) with one summary per tracker and app
+    global __windows
+    global __windowStart
+    with __lock:
+        windows = __windows
+        start = __windowStart
+        __windows = {}
+        __windowStart = None
+    if not windows:
+        return []
+    end = round(time.time()*1000)
+    payloads = {}
+    for (url, headerKey, dimensions), rollup in windows.items():
+        payload = payloads.get((url, headerKey))
+        if payload is None:
+            header = dict(headerKey)
+            header['type'] = 'rollup'
+            payload = payloads[(url, headerKey)] = {
+                'reconify': header,
+                'window': {'start': start, 'end': end},
+                'rollups': []
+            }
+        summary = dict(dimensions)
+        summary['calls'] = rollup['calls']
+        summary['usage'] = {'inputTokens': rollup['inputTokens'], 'outputTokens': rollup['outputTokens']}
+        summary['latency'] = rollup['latency'].snapshot()
+        payload['rollups'].append(summary)
+    return [(url, payload) for (url, headerKey), payload in payloads.items()]
+
+def afterFork():
+    global __lock
+    global __windows
+    global __windowStart
+    __lock = threading.Lock()
+    __windows = {}
+    __windowStart = None
@@ -0,0 +1,51 @@
+import random
+import zlib
+
+#constants
+ADAPTIVE_BACKLOG = 0.5
+ADAPTIVE_MIN_FACTOR = 0.05
+
+#private variables
+__sampleRate = 1.0
+__sampleBy = 'call'
+__adaptive = False
+
+def configure(**options):
+    global __sampleRate
+    global __sampleBy
+    global __adaptive
+
+    if 'sampleRate' in options:
+        __sampleRate = min(1.0, max(0.0, float(options.get('sampleRate'))))
+
+    if 'sampleBy' in options:
+        __sampleBy = options.get('sampleBy')
+
+    if 'adaptiveSampling' in options:
+        __adaptive = options.get('adaptiveSampling') == True
+
+def __key(user, session):
+    if __sampleBy == 'user' and isinstance(user, dict) and user.get('userId'):
+        return str(user.get('userId'))
+    if __sampleBy == 'session' and session:
+        return str(session)
+    return None
+
+def sample(user, session, backlog=0):
+    #returns the rate the call was kept at, or None when it is sampled out
+    rate = __sampleRate
+    if __adaptive and backlog > ADAPTIVE_BACKLOG:
+        #scale down linearly as the backlog fills past half
+        rate = rate * max(ADAPTIVE_MIN_FACTOR, (1 - backlog) / (1 - ADAPTIVE_BACKLOG))
+        rate = round(rate, 3)
+    if rate >= 1:
+        return 1.0
+    key = __key(user, session)
+    if key is None:
+        point = random.random()
+    else:
+        #the same user or session always maps to the same point so whole conversations are kept
+        point = zlib.crc32(key.encode('utf-8')) / 0x100000000
+    if point < rate:
+        return rate
+    return None
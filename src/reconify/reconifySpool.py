@@ -0,0 +1,334 @@
+import os
+import shutil
+import struct
+import threading
+import time
+import zlib
+
+#constants
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+DEFAULT_SEGMENT_BYTES = 4 * 1024 * 1024
+DEFAULT_FSYNC = 'interval'
+DEFAULT_FSYNC_INTERVAL = 1
+SEGMENT_PREFIX = 'segment-'
+SEGMENT_SUFFIX = '.log'
+CHECKPOINT_FILE = 'checkpoint'
+ADOPTING_SEPARATOR = '.'
+RECORD_HEADER = struct.Struct('>III')
+
+#private variables
+__debug = False
+__root = None
+__dir = None
+__maxBytes = DEFAULT_MAX_BYTES
+__segmentBytes = DEFAULT_SEGMENT_BYTES
+__fsync = DEFAULT_FSYNC
+__fsyncInterval = DEFAULT_FSYNC_INTERVAL
+__lastFsync = 0
+__segments = []
+__sizes = {}
+__active = None
+__activeSeq = None
+__readSeq = None
+__readOffset = 0
+__lock = threading.RLock()
+
+def __segmentPath(seq):
+    return os.path.join(__dir, f"{SEGMENT_PREFIX}{seq:012d}{SEGMENT_SUFFIX}")
+
+def __checkpointPath():
+    return os.path.join(__dir, CHECKPOINT_FILE)
+
+def __open():
+    #pick up segments left by an earlier process, replay resumes from the last checkpoint
+    global __segments
+    global __readSeq
+    global __readOffset
+    os.makedirs(__dir, exist_ok=True)
+    __segments = []
+    __sizes.clear()
+    for name in os.listdir(__dir):
+        if name.startswith(SEGMENT_PREFIX) and name.endswith(SEGMENT_SUFFIX):
+            try:
+                seq = int(name[len(SEGMENT_PREFIX):-len(SEGMENT_SUFFIX)])
+            except ValueError:
+                continue
+            __segments.append(seq)
+            __sizes[seq] = os.path.getsize(__segmentPath(seq))
+    __segments.sort()
+    __adopt()
+    __readSeq = None
+    __readOffset = 0
+    checkpoint = __readCheckpoint(__checkpointPath())
+    if checkpoint is not None:
+        __readSeq, __readOffset = checkpoint
+
+def __isAlive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        pass
+    return True
+
+def __owner(name):
+    #the pid that owns a worker directory, a directory being adopted is named worker.adopter
+    parts = name.split(ADOPTING_SEPARATOR)
+    if len(parts) > 2 or not all(part.isdigit() for part in parts):
+        return None
+    return int(parts[-1])
+
+def __readCheckpoint(path):
+    try:
+        with open(path, 'r') as f:
+            seq, offset = f.read().split()
+            return int(seq), int(offset)
+    except (OSError, ValueError):
+        return None
+
+def __adopt():
+    #segments left by forked workers that have exited are replayed by this process
+    for name in sorted(os.listdir(__root)):
+        path = os.path.join(__root, name)
+        owner = __owner(name)
+        if owner is None or path == __dir or not os.path.isdir(path) or __isAlive(owner):
+            continue
+        #renaming claims the directory, when workers race for it the others find it gone and move on
+        claimed = os.path.join(__root, name.split(ADOPTING_SEPARATOR)[0] + ADOPTING_SEPARATOR + str(os.getpid()))
+        try:
+            os.rename(path, claimed)
+            __adoptSegments(claimed)
+        except OSError as err:
+            if __debug:
+                print('Could not adopt spool of exited process', name, err)
+            continue
+        if __debug:
+            print('Adopted spool of exited process', name)
+
+def __adoptSegments(path):
+    #records before the checkpoint of the exited worker were delivered, only the rest is carried over
+    checkpoint = __readCheckpoint(os.path.join(path, CHECKPOINT_FILE))
+    for segment in sorted(os.listdir(path)):
+        if not segment.startswith(SEGMENT_PREFIX) or not segment.endswith(SEGMENT_SUFFIX):
+            continue
+        source = os.path.join(path, segment)
+        try:
+            old = int(segment[len(SEGMENT_PREFIX):-len(SEGMENT_SUFFIX)])
+        except ValueError:
+            continue
+        if checkpoint is not None and old < checkpoint[0]:
+            os.remove(source)
+            continue
+        seq = __segments[-1] + 1 if __segments else 0
+        if checkpoint is not None and old == checkpoint[0] and checkpoint[1] > 0:
+            tmp = __segmentPath(seq) + '.tmp'
+            with open(source, 'rb') as f, open(tmp, 'wb') as out:
+                f.seek(checkpoint[1])
+                shutil.copyfileobj(f, out)
+                if __fsync != 'never':
+                    out.flush()
+                    os.fsync(out.fileno())
+            os.replace(tmp, __segmentPath(seq))
+            os.remove(source)
+        else:
+            os.replace(source, __segmentPath(seq))
+        __segments.append(seq)
+        __sizes[seq] = os.path.getsize(__segmentPath(seq))
+    for leftover in os.listdir(path):
+        try:
+            os.remove(os.path.join(path, leftover))
+        except OSError:
+            pass
+    try:
+        os.rmdir(path)
+    except OSError:
+        pass
+
+def __close():
+    global __active
+    global __activeSeq
+    if __active is not None:
+        __active.flush()
+        if __fsync != 'never':
+            os.fsync(__active.fileno())
+        __active.close()
+    __active = None
+    __activeSeq = None
+
+def __sync(force=False):
+    global __lastFsync
+    if __active is None or __fsync == 'never':
+        return
+    now = time.monotonic()
+    if force or __fsync == 'always' or now - __lastFsync >= __fsyncInterval:
+        __active.flush()
+        os.fsync(__active.fileno())
+        __lastFsync = now
+
+def __remove(seq):
+    global __readSeq
+    global __readOffset
+    try:
+        os.remove(__segmentPath(seq))
+    except OSError:
+        pass
+    if seq in __segments:
+        __segments.remove(seq)
+    __sizes.pop(seq, None)
+    if __readSeq == seq:
+        __readSeq = None
+        __readOffset = 0
+
+def configure(**options):
+    global __debug
+    global __root
+    global __dir
+    global __maxBytes
+    global __segmentBytes
+    global __fsync
+    global __fsyncInterval
+
+    with __lock:
+        if 'debug' in options and options.get('debug') == True:
+            __debug = True
+
+        if 'spoolMaxBytes' in options:
+            __maxBytes = max(1, int(options.get('spoolMaxBytes')))
+
+        if 'spoolSegmentBytes' in options:
+            __segmentBytes = max(1, int(options.get('spoolSegmentBytes')))
+
+        if 'spoolFsync' in options:
+            __fsync = options.get('spoolFsync')
+
+        if 'spoolFsyncInterval' in options:
+            __fsyncInterval = max(0, float(options.get('spoolFsyncInterval')))
+
+        if 'spoolDir' in options and options.get('spoolDir') != __root:
+            __close()
+            __root = options.get('spoolDir')
+            __dir = __root
+            if __dir is not None:
+                __open()
+
+def isEnabled():
+    return __dir is not None
+
+def hasPending():
+    with __lock:
+        return any(__sizes.get(seq, 0) > 0 for seq in __segments)
+
+def append(url, body):
+    #returns False when the spool is full
+    global __active
+    global __activeSeq
+    urlBytes = url.encode('utf-8')
+    record = RECORD_HEADER.pack(len(urlBytes), len(body), zlib.crc32(urlBytes + body)) + urlBytes + body
+    with __lock:
+        if __dir is None:
+            return False
+        if sum(__sizes.values()) + len(record) > __maxBytes:
+            return False
+        if __active is not None and __sizes[__activeSeq] + len(record) > __segmentBytes:
+            __close()
+        if __active is None:
+            seq = __segments[-1] + 1 if __segments else 0
+            #unbuffered so a process crash loses nothing, fsync only matters for power loss
+            __active = open(__segmentPath(seq), 'ab', buffering=0)
+            __activeSeq = seq
+            __segments.append(seq)
+            __sizes[seq] = 0
+        __active.write(record)
+        __sizes[__activeSeq] += len(record)
+        __sync()
+        return True
+
+def read(maxEvents, maxBytes):
+    #returns (url, bodies, position) for the oldest records that share a url, or None when the spool is empty
+    with __lock:
+        while __segments:
+            seq = __segments[0]
+            if seq == __activeSeq:
+                #segments are only read once they are closed
+                __close()
+            offset = __readOffset if __readSeq == seq else 0
+            url = None
+            bodies = []
+            size = 0
+            with open(__segmentPath(seq), 'rb') as f:
+                f.seek(offset)
+                while len(bodies) < maxEvents and size < maxBytes:
+                    header = f.read(RECORD_HEADER.size)
+                    if len(header) < RECORD_HEADER.size:
+                        break
+                    urlLength, bodyLength, crc = RECORD_HEADER.unpack(header)
+                    data = f.read(urlLength + bodyLength)
+                    #a torn or corrupt record ends the segment, it was never acknowledged to the caller
+                    if len(data) < urlLength + bodyLength or zlib.crc32(data) != crc:
+                        if __debug:
+                            print('Spool segment', seq, 'is truncated at', offset)
+                        break
+                    recordUrl = data[:urlLength].decode('utf-8')
+                    if url is not None and recordUrl != url:
+                        break
+                    url = recordUrl
+                    bodies.append(data[urlLength:])
+                    size += bodyLength
+                    offset = f.tell()
+            if bodies:
+                return url, bodies, (seq, offset)
+            __remove(seq)
+        return None
+
+def commit(position):
+    #records up to position have been delivered
+    global __readSeq
+    global __readOffset
+    seq, offset = position
+    with __lock:
+        if seq not in __segments:
+            return
+        __readSeq = seq
+        __readOffset = offset
+        if offset >= __sizes.get(seq, 0) and seq != __activeSeq:
+            __remove(seq)
+            try:
+                os.remove(__checkpointPath())
+            except OSError:
+                pass
+            return
+        tmp = __checkpointPath() + '.tmp'
+        with open(tmp, 'w') as f:
+            f.write(f"{seq} {offset}")
+            if __fsync != 'never':
+                f.flush()
+                os.fsync(f.fileno())
+        os.replace(tmp, __checkpointPath())
+
+def size():
+    with __lock:
+        return sum(__sizes.values())
+
+def sync():
+    with __lock:
+        __sync()
+
+def afterFork():
+    #a forked child writes to its own directory so it never shares a file with the parent
+    global __lock
+    global __active
+    global __activeSeq
+    global __dir
+    __lock = threading.RLock()
+    if __active is not None:
+        __active.close()
+    __active = None
+    __activeSeq = None
+    if __root is not None:
+        __dir = os.path.join(__root, str(os.getpid()))
+        __open()
+
+def close():
+    with __lock:
+        __close()
@@ -0,0 +1,445 @@
+import time
+from . import reconifyEncoder
+
+def _get(o, key, default=None):
+    if o is None:
+        return default
+    if isinstance(o, dict):
+        return o.get(key, default)
+    return getattr(o, key, default)
+
+def _timestamp():
+    return round(time.time()*1000)
+
+def _isAsync(function):
+    #the openai and anthropic sdks wrap async methods in sync decorators such as required_args,
+    #so the check looks through functools.wraps to the method itself
+    import inspect
+    return inspect.iscoroutinefunction(inspect.unwrap(function))
+
+def _isAsyncGenerator(function):
+    import inspect
+    return inspect.isasyncgenfunction(inspect.unwrap(function))
+
+#collects openai style chat and completion chunks (also used by mistral)
+class ChatChunkAccumulator:
+    def __init__(self):
+        self.id = None
+        self.model = None
+        self.created = None
+        self.object = None
+        self.usage = None
+        self.choices = {}
+
+    def add(self, chunk):
+        if self.id is None:
+            self.id = _get(chunk, 'id')
+            self.model = _get(chunk, 'model')
+            self.created = _get(chunk, 'created')
+        usage = _get(chunk, 'usage')
+        if usage is not None:
+            self.usage = usage
+        for choice in _get(chunk, 'choices') or []:
+            index = _get(choice, 'index', 0)
+            current = self.choices.get(index)
+            if current is None:
+                current = {'role': None, 'parts': [], 'toolCalls': {}, 'finish_reason': None}
+                self.choices[index] = current
+            delta = _get(choice, 'delta')
+            if delta is None:
+                self.object = 'text_completion'
+                text = _get(choice, 'text')
+                if text:
+                    current['parts'].append(text)
+            else:
+                self.object = 'chat.completion'
+                role = _get(delta, 'role')
+                if role:
+                    current['role'] = role
+                content = _get(delta, 'content')
+                if content:
+                    current['parts'].append(content)
+                for toolCall in _get(delta, 'tool_calls') or []:
+                    self.__addToolCall(current['toolCalls'], toolCall)
+            finishReason = _get(choice, 'finish_reason')
+            if finishReason:
+                current['finish_reason'] = finishReason
+
+    def __addToolCall(self, toolCalls, delta):
+        index = _get(delta, 'index', len(toolCalls))
+        current = toolCalls.get(index)
+        if current is None:
+            current = {'id': None, 'type': 'function', 'name': None, 'arguments': []}
+            toolCalls[index] = current
+        if _get(delta, 'id'):
+            current['id'] = _get(delta, 'id')
+        function = _get(delta, 'function')
+        if _get(function, 'name'):
+            current['name'] = _get(function, 'name')
+        if _get(function, 'arguments'):
+            current['arguments'].append(_get(function, 'arguments'))
+
+    def result(self):
+        choices = []
+        for index in sorted(self.choices):
+            current = self.choices[index]
+            text = ''.join(current['parts'])
+            if self.object == 'text_completion':
+                choices.append({'index': index, 'text': text, 'finish_reason': current['finish_reason']})
+                continue
+            message = {'role': current['role'] or 'assistant', 'content': text}
+            if current['toolCalls']:
+                message['tool_calls'] = [{
+                    'id': call['id'],
+                    'type': call['type'],
+                    'function': {'name': call['name'], 'arguments': ''.join(call['arguments'])}
+                } for i, call in sorted(current['toolCalls'].items())]
+            choices.append({'index': index, 'message': message, 'finish_reason': current['finish_reason']})
+        return {
+            'id': self.id,
+            'object': self.object or 'chat.completion',
+            'created': self.created,
+            'model': self.model,
+            'choices': choices,
+            'usage': self.usage
+        }
+
+#collects anthropic message and completion stream events
+class AnthropicEventAccumulator:
+    def __init__(self):
+        self.message = None
+        self.blocks = {}
+        self.stopReason = None
+        self.stopSequence = None
+        self.usage = {}
+        self.completion = []
+        self.model = None
+
+    def add(self, event):
+        type = _get(event, 'type')
+        if type == 'message_start':
+            message = _get(event, 'message')
+            self.message = {'id': _get(message, 'id'), 'type': 'message', 'role': _get(message, 'role'), 'model': _get(message, 'model')}
+            self.__addUsage(_get(message, 'usage'))
+        elif type == 'content_block_start':
+            block = _get(event, 'content_block')
+            current = {'type': _get(block, 'type'), 'parts': []}
+            if current['type'] == 'tool_use':
+                current['id'] = _get(block, 'id')
+                current['name'] = _get(block, 'name')
+            elif current['type'] == 'redacted_thinking':
+                current['data'] = _get(block, 'data')
+            self.blocks[_get(event, 'index', len(self.blocks))] = current
+        elif type == 'content_block_delta':
+            delta = _get(event, 'delta')
+            current = self.blocks.setdefault(_get(event, 'index', 0), {'type': 'text', 'parts': []})
+            if _get(delta, 'signature'):
+                current['signature'] = _get(delta, 'signature')
+            part = _get(delta, 'text') or _get(delta, 'partial_json') or _get(delta, 'thinking')
+            if part:
+                current['parts'].append(part)
+        elif type == 'message_delta':
+            delta = _get(event, 'delta')
+            self.stopReason = _get(delta, 'stop_reason') or self.stopReason
+            self.stopSequence = _get(delta, 'stop_sequence') or self.stopSequence
+            self.__addUsage(_get(event, 'usage'))
+        elif type == 'completion':
+            if _get(event, 'completion'):
+                self.completion.append(_get(event, 'completion'))
+            self.stopReason = _get(event, 'stop_reason') or self.stopReason
+            self.model = _get(event, 'model') or self.model
+
+    def __addUsage(self, usage):
+        for key in ('input_tokens', 'output_tokens'):
+            if _get(usage, key) is not None:
+                self.usage[key] = _get(usage, key)
+
+    def result(self):
+        if self.message is None:
+            return {'type': 'completion', 'completion': ''.join(self.completion), 'stop_reason': self.stopReason, 'model': self.model}
+        content = []
+        for index in sorted(self.blocks):
+            block = self.blocks[index]
+            text = ''.join(block['parts'])
+            if block['type'] == 'tool_use':
+                try:
+                    import json
+                    input = json.loads(text) if text else {}
+                except ValueError:
+                    input = text
+                content.append({'type': 'tool_use', 'id': block.get('id'), 'name': block.get('name'), 'input': input})
+            elif block['type'] == 'thinking':
+                content.append({'type': 'thinking', 'thinking': text, 'signature': block.get('signature')})
+            elif block['type'] == 'redacted_thinking':
+                content.append({'type': 'redacted_thinking', 'data': block.get('data')})
+            else:
+                content.append({'type': 'text', 'text': text})
+        result = dict(self.message)
+        result['content'] = content
+        result['stop_reason'] = self.stopReason
+        result['stop_sequence'] = self.stopSequence
+        result['usage'] = self.usage
+        return result
+
+#collects bedrock invoke_model_with_response_stream events into the body invoke_model returns for the model family
+class BedrockChunkAccumulator:
+    def __init__(self, family):
+        self.family = family
+        self.anthropic = AnthropicEventAccumulator() if family == 'anthropic' else None
+        #nova streams the same events as converse_stream
+        self.converse = ConverseEventAccumulator() if family == 'nova' else None
+        self.parts = []
+        self.fields = {}
+        self.invocationMetrics = None
+
+    def add(self, event):
+        data = _get(_get(event, 'chunk'), 'bytes')
+        if not data:
+            return
+        try:
+            chunk = reconifyEncoder.loads(data)
+        except ValueError:
+            return
+        if not isinstance(chunk, dict):
+            return
+        #every family ends with the token counts measured by bedrock
+        if 'amazon-bedrock-invocationMetrics' in chunk:
+            self.invocationMetrics = chunk.get('amazon-bedrock-invocationMetrics')
+        if self.anthropic is not None:
+            if 'type' not in chunk and 'completion' in chunk:
+                chunk = dict(chunk, type='completion')
+            self.anthropic.add(chunk)
+        elif self.converse is not None:
+            self.converse.add(chunk)
+        elif self.family == 'meta':
+            self.__addText(chunk.get('generation'))
+            self.__keep(chunk, ('prompt_token_count', 'generation_token_count', 'stop_reason'))
+        elif self.family == 'mistral':
+            for output in chunk.get('outputs') or []:
+                self.__addText(output.get('text'))
+                self.__keep(output, ('stop_reason',))
+        elif self.family == 'cohere':
+            #command streams generations, command-r streams text-generation events
+            for generation in chunk.get('generations') or []:
+                self.__addText(generation.get('text'))
+                self.__keep(generation, ('finish_reason',))
+            if 'event_type' in chunk:
+                self.fields['event_type'] = True
+                if chunk.get('event_type') == 'text-generation':
+                    self.__addText(chunk.get('text'))
+            self.__keep(chunk, ('finish_reason',))
+        elif self.family == 'amazon':
+            self.__addText(chunk.get('outputText'))
+            self.__keep(chunk, ('inputTextTokenCount', 'totalOutputTextTokenCount', 'completionReason'))
+        else:
+            self.__keep(chunk, tuple(chunk))
+
+    def __addText(self, text):
+        if text:
+            self.parts.append(text)
+
+    def __keep(self, chunk, keys):
+        for key in keys:
+            if chunk.get(key) is not None:
+                self.fields[key] = chunk.get(key)
+
+    def result(self):
+        text = ''.join(self.parts)
+        fields = self.fields
+        if self.anthropic is not None:
+            result = self.anthropic.result()
+        elif self.converse is not None:
+            result = self.converse.result()
+        elif self.family == 'meta':
+            result = {'generation': text, 'prompt_token_count': fields.get('prompt_token_count'),
+                'generation_token_count': fields.get('generation_token_count'), 'stop_reason': fields.get('stop_reason')}
+        elif self.family == 'mistral':
+            result = {'outputs': [{'text': text, 'stop_reason': fields.get('stop_reason')}]}
+        elif self.family == 'cohere':
+            if fields.get('event_type'):
+                result = {'text': text, 'finish_reason': fields.get('finish_reason')}
+            else:
+                result = {'generations': [{'text': text, 'finish_reason': fields.get('finish_reason')}]}
+        elif self.family == 'amazon':
+            result = {'inputTextTokenCount': fields.get('inputTextTokenCount'), 'results': [{'outputText': text,
+                'tokenCount': fields.get('totalOutputTextTokenCount'), 'completionReason': fields.get('completionReason')}]}
+        else:
+            result = dict(fields)
+        if self.invocationMetrics is not None:
+            result['amazon-bedrock-invocationMetrics'] = self.invocationMetrics
+        return result
+
+#collects bedrock converse_stream events into the response converse returns
+class ConverseEventAccumulator:
+    def __init__(self):
+        self.role = None
+        self.blocks = {}
+        self.stopReason = None
+        self.usage = None
+        self.metrics = None
+
+    def add(self, event):
+        if 'contentBlockDelta' in event:
+            delta = event['contentBlockDelta']
+            current = self.__block(delta.get('contentBlockIndex', 0))
+            part = delta.get('delta') or {}
+            if 'text' in part:
+                current['parts'].append(part['text'])
+            elif 'toolUse' in part:
+                current['parts'].append(part['toolUse'].get('input') or '')
+        elif 'contentBlockStart' in event:
+            start = event['contentBlockStart']
+            toolUse = (start.get('start') or {}).get('toolUse')
+            if toolUse is not None:
+                current = self.__block(start.get('contentBlockIndex', 0))
+                current['toolUse'] = {'toolUseId': toolUse.get('toolUseId'), 'name': toolUse.get('name')}
+        elif 'messageStart' in event:
+            self.role = event['messageStart'].get('role')
+        elif 'messageStop' in event:
+            self.stopReason = event['messageStop'].get('stopReason')
+        elif 'metadata' in event:
+            self.usage = event['metadata'].get('usage')
+            self.metrics = event['metadata'].get('metrics')
+
+    def __block(self, index):
+        current = self.blocks.get(index)
+        if current is None:
+            current = {'toolUse': None, 'parts': []}
+            self.blocks[index] = current
+        return current
+
+    def result(self):
+        content = []
+        for index in sorted(self.blocks):
+            block = self.blocks[index]
+            text = ''.join(block['parts'])
+            if block['toolUse'] is not None:
+                try:
+                    import json
+                    input = json.loads(text) if text else {}
+                except ValueError:
+                    input = text
+                content.append({'toolUse': dict(block['toolUse'], input=input)})
+            else:
+                content.append({'text': text})
+        return {
+            'output': {'message': {'role': self.role or 'assistant', 'content': content}},
+            'stopReason': self.stopReason,
+            'usage': self.usage,
+            'metrics': self.metrics
+        }
+
+#instrumentation errors must never reach the caller's loop, a stream that cannot be followed is not logged
+def _accumulate(wrapper, chunk):
+    if wrapper._accumulator is None:
+        return
+    try:
+        wrapper._accumulator.add(chunk)
+    except Exception as err:
+        wrapper._accumulator = None
+        if wrapper._debug:
+            print('Stream error, not logging this stream: ', err)
+
+def _complete(wrapper):
+    if wrapper._accumulator is None:
+        return
+    try:
+        wrapper._onComplete(wrapper._accumulator.result(), wrapper._firstToken, _timestamp())
+    except Exception as err:
+        if wrapper._debug:
+            print('Stream log error: ', err)
+
+#pass-through iterator that yields chunks as they arrive and logs the assembled response when the stream ends
+class StreamWrapper:
+    def __init__(self, stream, accumulator, onComplete, debug=False):
+        self._stream = stream
+        self._iterator = None
+        self._accumulator = accumulator
+        self._onComplete = onComplete
+        self._debug = debug
+        self._firstToken = None
+        self._finished = False
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        if self._iterator is None:
+            self._iterator = iter(self._stream)
+        try:
+            chunk = next(self._iterator)
+        except StopIteration:
+            self._finish()
+            raise
+        if self._firstToken is None:
+            self._firstToken = _timestamp()
+        _accumulate(self, chunk)
+        return chunk
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self):
+        if hasattr(self._stream, 'close'):
+            self._stream.close()
+        self._finish()
+
+    def _finish(self):
+        if self._finished:
+            return
+        self._finished = True
+        _complete(self)
+
+    def __getattr__(self, name):
+        return getattr(self._stream, name)
+
+class AsyncStreamWrapper:
+    def __init__(self, stream, accumulator, onComplete, debug=False):
+        self._stream = stream
+        self._iterator = None
+        self._accumulator = accumulator
+        self._onComplete = onComplete
+        self._debug = debug
+        self._firstToken = None
+        self._finished = False
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        if self._iterator is None:
+            self._iterator = self._stream.__aiter__()
+        try:
+            chunk = await self._iterator.__anext__()
+        except StopAsyncIteration:
+            self._finish()
+            raise
+        if self._firstToken is None:
+            self._firstToken = _timestamp()
+        _accumulate(self, chunk)
+        return chunk
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        await self.close()
+
+    async def close(self):
+        if hasattr(self._stream, 'close'):
+            await self._stream.close()
+        elif hasattr(self._stream, 'aclose'):
+            await self._stream.aclose()
+        self._finish()
+
+    def _finish(self):
+        if self._finished:
+            return
+        self._finished = True
+        _complete(self)
+
+    def __getattr__(self, name):
+        return getattr(self._stream, name)
@@ -0,0 +1,901 @@
+import atexit
+import functools
+import os
+import queue
+import random
+import signal
+import threading
+import time
+from . import reconifyBedrockModels
+from . import reconifyEncoder
+from . import reconifySpool
+from . import reconifySampler
+from . import reconifyDedupe
+from . import reconifyDelta
+from . import reconifyMetrics
+from . import reconifyModelStats
+from . import reconifyRollup
+from . import reconifyWire
+
+#constants
+DEFAULT_QUEUE_SIZE = 1000
+DEFAULT_WORKERS = 1
+DEFAULT_SHUTDOWN_TIMEOUT = 5
+DEFAULT_BATCH_SIZE = 100
+DEFAULT_BATCH_BYTES = 1024 * 1024
+DEFAULT_BATCH_LINGER = 1
+DEFAULT_POOL_CONNECTIONS = 4
+DEFAULT_POOL_SIZE = 10
+DEFAULT_CONNECT_TIMEOUT = 2
+DEFAULT_READ_TIMEOUT = 5
+DEFAULT_RETRIES = 2
+DEFAULT_RETRY_BACKOFF = 0.5
+DEFAULT_RETRY_BACKOFF_MAX = 10
+DEFAULT_BREAKER_THRESHOLD = 5
+DEFAULT_BREAKER_COOLDOWN = 30
+DEFAULT_UPLOAD_CONCURRENCY = 2
+DEFAULT_UPLOAD_QUEUE_SIZE = 16
+DEFAULT_UPLOAD_FORMAT = 'b64_json'
+DEFAULT_SERVERLESS_DEADLINE = 2
+#seconds the SIGTERM handler waits for the drain beyond shutdownTimeout
+SIGTERM_MARGIN = 1
+SERVERLESS_MARGIN = 0.2
+BATCH_PATH = '/batch'
+UNSUPPORTED_MEDIA_TYPE = 415
+
+#private variables
+__debug = False
+__background = False
+__queueSize = DEFAULT_QUEUE_SIZE
+__workers = DEFAULT_WORKERS
+__shutdownTimeout = DEFAULT_SHUTDOWN_TIMEOUT
+__batch = False
+__batchSize = DEFAULT_BATCH_SIZE
+__batchBytes = DEFAULT_BATCH_BYTES
+__batchLinger = DEFAULT_BATCH_LINGER
+__batchTracker = None
+__poolConnections = DEFAULT_POOL_CONNECTIONS
+__poolSize = DEFAULT_POOL_SIZE
+__http2 = False
+__http = None
+__httpx = False
+__httpErrors = ()
+__connectTimeout = DEFAULT_CONNECT_TIMEOUT
+__readTimeout = DEFAULT_READ_TIMEOUT
+__retries = DEFAULT_RETRIES
+__retryBackoff = DEFAULT_RETRY_BACKOFF
+__retryBackoffMax = DEFAULT_RETRY_BACKOFF_MAX
+__breakerThreshold = DEFAULT_BREAKER_THRESHOLD
+__breakerCooldown = DEFAULT_BREAKER_COOLDOWN
+__breakerLatency = None
+__breakerFailures = 0
+__breakerOpenUntil = 0
+__breakerLock = threading.Lock()
+__dropped = {'queueFull': 0, 'breakerOpen': 0, 'failed': 0, 'spoolFull': 0, 'deadline': 0}
+__queue = None
+__threads = []
+__lock = threading.Lock()
+__idle = threading.Condition(__lock)
+__flushing = threading.Event()
+__pending = 0
+__uploadConcurrency = DEFAULT_UPLOAD_CONCURRENCY
+__uploadQueueSize = DEFAULT_UPLOAD_QUEUE_SIZE
+__uploadFormat = DEFAULT_UPLOAD_FORMAT
+__uploadQueue = None
+__uploadThreads = []
+__replayThread = None
+__spoolSignal = threading.Event()
+__rollupThread = None
+__rollupSignal = threading.Event()
+__serverless = False
+__serverlessDeadline = DEFAULT_SERVERLESS_DEADLINE
+__held = []
+__terminating = threading.Event()
+#encoded events that carry dedupe blocks or a delta history, by id, until they are delivered, spooled or dropped
+__references = {}
+
+def __encode(url, payload):
+    try:
+        return reconifyEncoder.encodePayload(payload, reconifyWire.accepts(url))
+    except (TypeError, ValueError) as err:
+        if __debug:
+            print('Encode error: ', err)
+        return None
+
+def __createHttp():
+    #the http client is imported on the first send so importing a handler stays cheap
+    global __httpErrors
+    global __httpx
+    if __http2:
+        try:
+            import httpx
+            client = httpx.Client(
+                http2=True,
+                limits=httpx.Limits(max_connections=__poolSize, max_keepalive_connections=__poolSize),
+                timeout=httpx.Timeout(__readTimeout, connect=__connectTimeout)
+            )
+            __httpErrors = (httpx.HTTPError,)
+            __httpx = True
+            return client
+        except ImportError as err:
+            if __debug:
+                print('HTTP/2 unavailable, using HTTP/1.1: ', err)
+    import requests
+    session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(pool_connections=__poolConnections, pool_maxsize=__poolSize)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    __httpErrors = (requests.exceptions.RequestException,)
+    __httpx = False
+    return session
+
+def __getHttp():
+    #one keep-alive pool shared by every handler in the process
+    global __http
+    if __http is None:
+        with __lock:
+            if __http is None:
+                __http = __createHttp()
+    return __http
+
+def __resetHttp():
+    global __http
+    with __lock:
+        http = __http
+        __http = None
+    if http is not None:
+        http.close()
+    reconifyDedupe.reset()
+    reconifyDelta.reset()
+
+def __post(url, data, headers):
+    #returns a tuple of (delivered, retryable, status)
+    http = __getHttp()
+    try:
+        if __httpx:
+            response = http.post(url, content=data, headers=headers)
+        else:
+            response = http.post(url, data=data, headers=headers, timeout=(__connectTimeout, __readTimeout))
+    except __httpErrors as err:
+        if __debug:
+            print('Send error: ', err)
+        return False, True, None
+    status = response.status_code
+    if status >= 400:
+        if __debug:
+            print('Send error: status', status)
+        return False, status == 429 or status >= 500, status
+    return True, False, status
+
+def __count(name, bodies):
+    for body in bodies:
+        reconifyMetrics.event(reconifyEncoder.formatOf(body), name)
+
+def __settle(bodies, delivered):
+    #blocks and histories are only referred to once an event that carries them has been delivered,
+    #events spooled or dropped before that leave them to be sent in full again
+    if not __references:
+        return
+    for body in bodies:
+        entry = __references.pop(id(body), None)
+        if entry is None or not delivered:
+            continue
+        body, blocks, history = entry
+        if blocks is not None:
+            reconifyDedupe.delivered(blocks)
+        if history is not None:
+            reconifyDelta.delivered(history)
+
+def __drop(reason, bodies):
+    count = len(bodies)
+    with __breakerLock:
+        __dropped[reason] += count
+    __count('dropped', bodies)
+    __settle(bodies, False)
+    if __debug:
+        print('Dropped', count, 'event(s): ', reason)
+
+def __breakerAllows():
+    return __breakerOpenUntil <= time.monotonic()
+
+def __breakerRecord(healthy):
+    global __breakerFailures
+    global __breakerOpenUntil
+    with __breakerLock:
+        if healthy:
+            __breakerFailures = 0
+            return
+        __breakerFailures += 1
+        #after the cool-down a single further failure re-opens the breaker
+        if __breakerFailures >= __breakerThreshold:
+            __breakerOpenUntil = time.monotonic() + __breakerCooldown
+            if __debug:
+                print('Circuit breaker open for', __breakerCooldown, 'seconds')
+
+def __backoff(attempt):
+    #exponential backoff with full jitter
+    return random.uniform(0, min(__retryBackoffMax, __retryBackoff * (2 ** attempt)))
+
+def __deliver(url, body, retries, format):
+    #returns None once delivered, otherwise the reason the send was given up,
+    #'rejected' when the tracker answered with a status that sending again would not change
+    #the body is compressed once, sent bytes are counted as they went on the wire
+    data, headers = reconifyWire.prepare(url, body)
+    attempt = 0
+    while True:
+        if not __breakerAllows():
+            return 'breakerOpen'
+        started = time.perf_counter()
+        delivered, retryable, status = __post(url, data, headers)
+        elapsed = time.perf_counter() - started
+        reconifyMetrics.latency(format, 'send', elapsed)
+        reconifyMetrics.request(format, 'sent' if delivered else 'failed', len(data) if delivered else 0)
+        #a tracker that does not take the encoding gets plain json from then on, without counting as a retry
+        if status == UNSUPPORTED_MEDIA_TYPE and reconifyWire.refuse(url, headers):
+            data, headers = reconifyWire.prepare(url, body)
+            continue
+        slow = __breakerLatency is not None and elapsed > __breakerLatency
+        #a rejected event says nothing about the tracker, only errors, rate limits and slow answers count against it
+        if delivered or retryable or slow:
+            __breakerRecord(delivered and not slow)
+        if delivered:
+            return None
+        if not retryable:
+            return 'rejected'
+        if attempt >= retries:
+            return 'failed'
+        time.sleep(__backoff(attempt))
+        attempt += 1
+
+def __spool(url, bodies, reason='failed'):
+    #undelivered events go to the disk spool when one is configured, otherwise they are dropped
+    if not reconifySpool.isEnabled():
+        __drop(reason, bodies)
+        return
+    __settle(bodies, False)
+    for body in bodies:
+        if reconifySpool.append(url, body):
+            __count('spooled', [body])
+        else:
+            __drop('spoolFull', [body])
+    __startReplay()
+    __spoolSignal.set()
+
+def __sendEvents(url, bodies, retries, batched=False):
+    #while older events wait in the spool new ones queue up behind them to keep the order
+    if reconifySpool.isEnabled() and reconifySpool.hasPending():
+        __spool(url, bodies)
+        return
+    #a batch is timed under the format of its first event
+    format = reconifyEncoder.formatOf(bodies[0])
+    if batched:
+        reason = __deliverBatch(url, bodies, retries, format)
+    else:
+        reason = __deliver(url, bodies[0], retries, format)
+    if reason is None:
+        __count('sent', bodies)
+        __settle(bodies, True)
+    elif reason == 'rejected':
+        #spooled they would be sent again forever and hold up every later event
+        __drop('failed', bodies)
+    else:
+        __spool(url, bodies, reason)
+
+def __replay():
+    attempt = 0
+    while True:
+        if not reconifySpool.hasPending() or not __breakerAllows():
+            __spoolSignal.wait(1)
+            __spoolSignal.clear()
+            reconifySpool.sync()
+            continue
+        try:
+            record = reconifySpool.read(__batchSize, __batchBytes)
+            if record is None:
+                continue
+            url, bodies, position = record
+            if __debug:
+                print('Replaying', len(bodies), 'spooled events')
+            reason = __deliverBatch(url, bodies, 0, reconifyEncoder.formatOf(bodies[0]))
+            if reason is None:
+                reconifySpool.commit(position)
+                __count('sent', bodies)
+                attempt = 0
+            elif reason == 'rejected':
+                #events the tracker will not take are skipped so the ones behind them can go
+                reconifySpool.commit(position)
+                __drop('failed', bodies)
+                attempt = 0
+            else:
+                time.sleep(__backoff(attempt))
+                attempt = min(attempt + 1, 10)
+        except Exception as err:
+            if __debug:
+                print('Replay error: ', err)
+            time.sleep(1)
+
+def __startReplay():
+    global __replayThread
+    if __replayThread is not None or not reconifySpool.isEnabled():
+        return
+    with __lock:
+        if __replayThread is not None:
+            return
+        __replayThread = threading.Thread(target=__replay, name='reconify-spool', daemon=True)
+        __replayThread.start()
+
+def __batchUrl(url):
+    if __batchTracker is not None:
+        return __batchTracker
+    return url.rstrip('/') + BATCH_PATH
+
+def __deliverBatch(url, bodies, retries, format):
+    #json and msgpack events cannot share a request, they are mixed in the queue or spool after
+    #the encoding is changed or a tracker refuses msgpack, so each run of one encoding is sent on its own
+    start = 0
+    while start < len(bodies):
+        binary = reconifyEncoder.isBinary(bodies[start])
+        end = start + 1
+        while end < len(bodies) and reconifyEncoder.isBinary(bodies[end]) == binary:
+            end += 1
+        reason = __deliver(__batchUrl(url), reconifyEncoder.frame(bodies[start:end]), retries, format)
+        if reason is not None:
+            return reason
+        start = end
+    return None
+
+def __done(count=1):
+    global __pending
+    with __idle:
+        __pending -= count
+        if __pending == 0:
+            __flushing.clear()
+            __idle.notify_all()
+
+def __sendBatch(url, bodies):
+    if __debug:
+        print('Sending batch of', len(bodies), 'events')
+    try:
+        __sendEvents(url, bodies, __retries, True)
+    except Exception as err:
+        if __debug:
+            print('Worker error: ', err)
+    finally:
+        __done(len(bodies))
+
+def __work():
+    batchUrl = None
+    bodies = []
+    size = 0
+    started = 0
+    while True:
+        timeout = None
+        if bodies:
+            if __flushing.is_set():
+                timeout = 0
+            else:
+                timeout = max(0, min(started + __batchLinger - time.monotonic(), 0.1))
+        try:
+            if timeout == 0:
+                url, body, batchable = __queue.get_nowait()
+            else:
+                url, body, batchable = __queue.get(timeout=timeout)
+        except queue.Empty:
+            if bodies and (__flushing.is_set() or time.monotonic() - started >= __batchLinger):
+                __sendBatch(batchUrl, bodies)
+                bodies = []
+                size = 0
+            continue
+
+        if not batchable:
+            try:
+                __sendEvents(url, [body], __retries)
+            except Exception as err:
+                if __debug:
+                    print('Worker error: ', err)
+            finally:
+                __done()
+            continue
+
+        #events for another tracker close the current batch
+        if bodies and url != batchUrl:
+            __sendBatch(batchUrl, bodies)
+            bodies = []
+            size = 0
+        if not bodies:
+            batchUrl = url
+            started = time.monotonic()
+        bodies.append(body)
+        size += len(body)
+        if len(bodies) >= __batchSize or size >= __batchBytes:
+            __sendBatch(batchUrl, bodies)
+            bodies = []
+            size = 0
+
+def __start():
+    global __queue
+    with __lock:
+        if __queue is not None:
+            return
+        __queue = queue.Queue(maxsize=__queueSize)
+        for i in range(__workers):
+            thread = threading.Thread(target=__work, name=f"reconify-sender-{i}", daemon=True)
+            thread.start()
+            __threads.append(thread)
+
+def __sendUpload(url, payload, retries):
+    #images are encoded here so the wrapped call never pays for it
+    format = reconifyEncoder.formatOf(payload)
+    started = time.perf_counter()
+    body = None
+    if __uploadFormat == 'multipart':
+        body = reconifyEncoder.encodeImageUpload(payload)
+    if body is None:
+        body = __encode(url, payload)
+    if body is not None:
+        reconifyMetrics.encoded(format, len(body), time.perf_counter() - started)
+        reason = __deliver(url, body, retries, format)
+        if reason is None:
+            __count('sent', [body])
+        else:
+            __drop('failed' if reason == 'rejected' else reason, [body])
+
+def __uploadWork():
+    while True:
+        url, payload = __uploadQueue.get()
+        try:
+            __sendUpload(url, payload, __retries)
+        except Exception as err:
+            if __debug:
+                print('Upload worker error: ', err)
+        finally:
+            payload = None
+            __done()
+
+def __startUploads():
+    global __uploadQueue
+    with __lock:
+        if __uploadQueue is not None:
+            return
+        __uploadQueue = queue.Queue(maxsize=__uploadQueueSize)
+        for i in range(__uploadConcurrency):
+            thread = threading.Thread(target=__uploadWork, name=f"reconify-uploader-{i}", daemon=True)
+            thread.start()
+            __uploadThreads.append(thread)
+
+def __hold(url, item, batchable, upload=False):
+    #serverless mode keeps the events of an invocation in memory until flush, no threads are started
+    with __lock:
+        if len(__held) >= __queueSize:
+            full = True
+        else:
+            __held.append((url, item, batchable, upload))
+            full = False
+    if full:
+        __drop('queueFull', [item])
+    else:
+        __count('queued', [item])
+
+def __sendHeld(timeout):
+    #sends the held events on the calling thread, whatever is left at the deadline is spooled or dropped
+    global __held
+    with __lock:
+        held = __held
+        __held = []
+    end = time.monotonic() + max(0, timeout)
+    i = 0
+    while i < len(held):
+        url, item, batchable, upload = held[i]
+        if time.monotonic() >= end:
+            if upload:
+                __drop('deadline', [item])
+            else:
+                __spool(url, [item], 'deadline')
+            i += 1
+            continue
+        try:
+            if upload:
+                __sendUpload(url, item, 0)
+                i += 1
+                continue
+            bodies = [item]
+            size = len(item)
+            i += 1
+            #consecutive batchable events for the same tracker go in one request
+            while batchable and i < len(held) and len(bodies) < __batchSize and size < __batchBytes:
+                nextUrl, nextItem, nextBatchable, nextUpload = held[i]
+                if nextUrl != url or not nextBatchable or nextUpload:
+                    break
+                bodies.append(nextItem)
+                size += len(nextItem)
+                i += 1
+            __sendEvents(url, bodies, 0, batchable)
+        except Exception as err:
+            if __debug:
+                print('Send error: ', err)
+    return time.monotonic() < end
+
+def __enqueue(url, body, batchable):
+    global __pending
+    if __queue is None:
+        __start()
+    with __lock:
+        __pending += 1
+    try:
+        __queue.put_nowait((url, body, batchable))
+        __count('queued', [body])
+    except queue.Full:
+        __done()
+        __drop('queueFull', [body])
+
+def configure(**options):
+    global __debug
+    global __background
+    global __queueSize
+    global __workers
+    global __shutdownTimeout
+    global __batch
+    global __batchSize
+    global __batchBytes
+    global __batchLinger
+    global __batchTracker
+    global __poolConnections
+    global __poolSize
+    global __http2
+    global __connectTimeout
+    global __readTimeout
+    global __retries
+    global __retryBackoff
+    global __retryBackoffMax
+    global __breakerThreshold
+    global __breakerCooldown
+    global __breakerLatency
+    global __uploadConcurrency
+    global __uploadQueueSize
+    global __uploadFormat
+    global __serverless
+    global __serverlessDeadline
+
+    if 'debug' in options and options.get('debug') == True:
+        __debug = True
+
+    reconifyEncoder.configure(**options)
+    reconifySpool.configure(**options)
+    reconifySampler.configure(**options)
+    reconifyDedupe.configure(**options)
+    reconifyDelta.configure(**options)
+    reconifyMetrics.configure(**options)
+    reconifyModelStats.configure(**options)
+    reconifyRollup.configure(**options)
+    reconifyWire.configure(**options)
+    if 'spoolDir' in options:
+        reconifyDedupe.reset()
+        reconifyDelta.reset()
+
+    if 'background' in options:
+        __background = options.get('background') == True
+
+    #queue and worker sizing only applies before the sender starts
+    if 'queueSize' in options:
+        __queueSize = max(1, int(options.get('queueSize')))
+
+    if 'workers' in options:
+        __workers = max(1, int(options.get('workers')))
+
+    if 'shutdownTimeout' in options:
+        __shutdownTimeout = options.get('shutdownTimeout')
+
+    if 'serverless' in options:
+        __serverless = options.get('serverless') == True
+
+    if 'serverlessDeadline' in options:
+        __serverlessDeadline = max(0, float(options.get('serverlessDeadline')))
+
+    if 'batch' in options:
+        __batch = options.get('batch') == True
+
+    if 'batchSize' in options:
+        __batchSize = max(1, int(options.get('batchSize')))
+
+    if 'batchBytes' in options:
+        __batchBytes = max(1, int(options.get('batchBytes')))
+
+    if 'batchLinger' in options:
+        __batchLinger = max(0, float(options.get('batchLinger')))
+
+    if 'batchTracker' in options:
+        __batchTracker = options.get('batchTracker')
+
+    if 'retries' in options:
+        __retries = max(0, int(options.get('retries')))
+
+    if 'retryBackoff' in options:
+        __retryBackoff = max(0, float(options.get('retryBackoff')))
+
+    if 'retryBackoffMax' in options:
+        __retryBackoffMax = max(0, float(options.get('retryBackoffMax')))
+
+    if 'breakerThreshold' in options:
+        __breakerThreshold = max(1, int(options.get('breakerThreshold')))
+
+    if 'breakerCooldown' in options:
+        __breakerCooldown = max(0, float(options.get('breakerCooldown')))
+
+    if 'breakerLatency' in options:
+        __breakerLatency = options.get('breakerLatency')
+
+    #upload pool sizing only applies before the first upload
+    if 'uploadConcurrency' in options:
+        __uploadConcurrency = max(1, int(options.get('uploadConcurrency')))
+
+    if 'uploadQueueSize' in options:
+        __uploadQueueSize = max(1, int(options.get('uploadQueueSize')))
+
+    if 'uploadFormat' in options:
+        __uploadFormat = options.get('uploadFormat')
+
+    #pool settings take effect on the next request
+    if 'poolConnections' in options or 'poolSize' in options or 'http2' in options or 'connectTimeout' in options or 'readTimeout' in options:
+        if 'connectTimeout' in options:
+            __connectTimeout = float(options.get('connectTimeout'))
+        if 'readTimeout' in options:
+            __readTimeout = float(options.get('readTimeout'))
+        if 'poolConnections' in options:
+            __poolConnections = max(1, int(options.get('poolConnections')))
+        if 'poolSize' in options:
+            __poolSize = max(1, int(options.get('poolSize')))
+        if 'http2' in options:
+            __http2 = options.get('http2') == True
+        __resetHttp()
+
+    if reconifySpool.isEnabled():
+        __startReplay()
+
+    if options.get('drainOnSigterm') == True:
+        __installSigterm()
+
+def send(url, payload, background=False):
+    #in rollup mode interactions are only aggregated, see rollup
+    if reconifyRollup.isEnabled():
+        return
+    if __replayThread is None and reconifySpool.isEnabled():
+        __startReplay()
+    #delta first so only the new messages are checked for blocks
+    started = time.perf_counter()
+    blocks = None
+    history = None
+    if reconifyDelta.isEnabled():
+        payload = reconifyDelta.apply(payload)
+        history = reconifyDelta.pending(payload)
+    if reconifyDedupe.isEnabled():
+        payload = reconifyDedupe.apply(payload)
+        blocks = reconifyDedupe.pending(payload)
+    body = __encode(url, payload)
+    if body is None:
+        return
+    reconifyMetrics.encoded(reconifyEncoder.formatOf(body), len(body), time.perf_counter() - started)
+    if blocks is not None or history is not None:
+        #the body is kept with its entry so the id is not reused before it is settled
+        __references[id(body)] = (body, blocks, history)
+    if __serverless:
+        __hold(url, body, __batch)
+    #batching always sends from the background
+    elif __batch:
+        __enqueue(url, body, True)
+    elif __background or background:
+        __enqueue(url, body, False)
+    else:
+        #retries only happen in the background so wrapped calls never wait on them
+        __sendEvents(url, [body], 0)
+
+def upload(url, payload):
+    #uploads always use their own worker pool so large images never hold up events
+    global __pending
+    if reconifyRollup.isEnabled():
+        return
+    if __serverless:
+        __hold(url, payload, False, True)
+        return
+    if __uploadQueue is None:
+        __startUploads()
+    with __lock:
+        __pending += 1
+    try:
+        __uploadQueue.put_nowait((url, payload))
+        __count('queued', [payload])
+    except queue.Full:
+        __done()
+        __drop('queueFull', [payload])
+
+def __sendRollups():
+    for url, payload in reconifyRollup.drain():
+        body = __encode(url, payload)
+        if body is None:
+            continue
+        if __serverless:
+            __hold(url, body, False)
+        else:
+            __enqueue(url, body, False)
+
+def __rollupWork():
+    while True:
+        __rollupSignal.wait(reconifyRollup.interval())
+        __rollupSignal.clear()
+        try:
+            __sendRollups()
+        except Exception as err:
+            if __debug:
+                print('Rollup error: ', err)
+
+def __startRollup():
+    global __rollupThread
+    with __lock:
+        if __rollupThread is not None:
+            return
+        __rollupThread = threading.Thread(target=__rollupWork, name='reconify-rollup', daemon=True)
+        __rollupThread.start()
+
+def rollup(url, header, input, output, type, seconds, identity):
+    #adds a call to the usage summary that is sent every rollupInterval instead of the interaction
+    if __rollupThread is None:
+        __startRollup()
+    reconifyRollup.add(url, header, input, output, type, seconds, identity)
+
+def deliver(url, bodies, retries=0):
+    #sends encoded events as one batch on the calling thread, returns True once delivered
+    #used by the bulk importer, which keeps its own checkpoint so nothing is spooled or counted as dropped
+    reason = __deliverBatch(url, bodies, retries, reconifyEncoder.formatOf(bodies[0]))
+    if reason is not None:
+        return False
+    __count('sent', bodies)
+    return True
+
+def sample(user, session):
+    #returns the rate an interaction is kept at, or None when it should not be logged
+    backlog = 0
+    if __queue is not None:
+        backlog = __queue.qsize() / __queueSize
+    return reconifySampler.sample(user, session, backlog)
+
+def flush(timeout=None):
+    #wait for queued events to be delivered, returns False if the timeout expired first
+    #in rollup mode the current window is sent first
+    if reconifyRollup.isEnabled():
+        __sendRollups()
+    if __serverless:
+        return __sendHeld(__serverlessDeadline if timeout is None else timeout)
+    with __idle:
+        if __pending > 0:
+            __flushing.set()
+        return __idle.wait_for(lambda: __pending == 0, timeout)
+
+def invocation(function):
+    #wraps a serverless function handler so the events of each invocation are sent before it returns
+    @functools.wraps(function)
+    def __reconifyInvocation(*args, **kwargs):
+        try:
+            return function(*args, **kwargs)
+        finally:
+            #never run past the remaining time of a lambda invocation
+            timeout = __serverlessDeadline
+            context = args[1] if len(args) > 1 else kwargs.get('context')
+            remaining = getattr(context, 'get_remaining_time_in_millis', None)
+            if callable(remaining):
+                timeout = max(0, min(timeout, remaining() / 1000 - SERVERLESS_MARGIN))
+            flush(timeout)
+    return __reconifyInvocation
+
+def stats(output='dict'):
+    #counters and histograms per handler format, as a dict, 'json' or 'prometheus' text
+    gauges = {
+        'queueDepth': __queue.qsize() if __queue is not None else 0,
+        'uploadBacklog': __uploadQueue.qsize() if __uploadQueue is not None else 0,
+        'pending': __pending + len(__held),
+        'spoolBytes': reconifySpool.size(),
+        'breakerOpen': 0 if __breakerAllows() else 1
+    }
+    if output == 'prometheus':
+        return reconifyMetrics.prometheus(gauges)
+    if output == 'json':
+        return reconifyMetrics.dumps(gauges)
+    return reconifyMetrics.snapshot(gauges)
+
+def getDroppedCounts():
+    #events dropped because the queue was full, the circuit breaker was open or delivery failed
+    with __breakerLock:
+        return dict(__dropped)
+
+def __shutdown():
+    #bounded drain, whatever is left after shutdownTimeout is spooled or dropped
+    if reconifyRollup.isEnabled():
+        __sendRollups()
+    if __queue is not None or __uploadQueue is not None or __held:
+        flush(__shutdownTimeout)
+    #events still queued are kept for the next process
+    if __queue is not None and reconifySpool.isEnabled():
+        while True:
+            try:
+                url, body, batchable = __queue.get_nowait()
+            except queue.Empty:
+                break
+            __spool(url, [body])
+    reconifySpool.close()
+    __resetHttp()
+
+def __installSigterm():
+    previous = signal.getsignal(signal.SIGTERM)
+    if getattr(previous, '__name__', None) == '__onSigterm':
+        return
+    def __onSigterm(signum, frame):
+        #the signal can arrive while this thread holds a transport or metrics lock, so the drain runs
+        #on its own thread and is given up after a bounded wait rather than deadlocking
+        if not __terminating.is_set():
+            __terminating.set()
+            drain = threading.Thread(target=__shutdown, name='reconify-shutdown', daemon=True)
+            drain.start()
+            drain.join(__shutdownTimeout + SIGTERM_MARGIN)
+        if callable(previous):
+            previous(signum, frame)
+        elif previous != signal.SIG_IGN:
+            signal.signal(signal.SIGTERM, signal.SIG_DFL)
+            os.kill(os.getpid(), signal.SIGTERM)
+    try:
+        signal.signal(signal.SIGTERM, __onSigterm)
+    except ValueError as err:
+        #only the main thread can install signal handlers
+        if __debug:
+            print('Could not install SIGTERM handler: ', err)
+
+def __afterFork():
+    #threads do not survive fork, the child starts its own queues, workers and connection pool
+    global __lock
+    global __idle
+    global __flushing
+    global __pending
+    global __queue
+    global __threads
+    global __uploadQueue
+    global __uploadThreads
+    global __replayThread
+    global __spoolSignal
+    global __rollupThread
+    global __rollupSignal
+    global __breakerLock
+    global __http
+    global __held
+    global __terminating
+    global __references
+    global __dropped
+    __lock = threading.Lock()
+    __idle = threading.Condition(__lock)
+    __flushing = threading.Event()
+    __spoolSignal = threading.Event()
+    __rollupSignal = threading.Event()
+    __breakerLock = threading.Lock()
+    __terminating = threading.Event()
+    #events queued before the fork belong to the parent and are sent by it
+    __pending = 0
+    __queue = None
+    __threads = []
+    __uploadQueue = None
+    __uploadThreads = []
+    __replayThread = None
+    __rollupThread = None
+    __held = []
+    __references = {}
+    #like the metrics, drops are counted from zero so the parent's are not reported again
+    __dropped = dict.fromkeys(__dropped, 0)
+    #the parent keeps using its sockets so they are dropped rather than closed
+    __http = None
+    #a failure in one module, such as a spool directory another worker removed, must not leave the locks of the rest shared
+    for module in (reconifySpool, reconifyDedupe, reconifyDelta, reconifyMetrics, reconifyModelStats, reconifyRollup,
+            reconifyWire, reconifyBedrockModels):
+        try:
+            module.afterFork()
+        except Exception as err:
+            if __debug:
+                print('After fork error: ', err)
+
+atexit.register(__shutdown)
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=__afterFork)
@@ -1,18 +1,14 @@
 import time
-import requests
-import json
-import uuid
+from . import reconifyTransport
+from . import reconifyContext
+from . import reconifyModelStats
+from . import reconifyRollup
 
 #constants
 RECONIFY_TRACKER = 'https://track.reconify.com/track'
 RECONIFY_UPLOADER = 'https://track.reconify.com/upload'
 RECONIFY_MODULE_VERSION = '3.0.0'
 
-#private class
-class __CompletionEncoder(json.JSONEncoder):
-    def default(self, o):
-        return o.__dict__
-
 #private variables 
 __format = 'universal'
 __appKey = None
@@ -27,12 +23,30 @@ __trackImages = True
 
 def __convertToJson(str):
     try:
-        json.loads(str)
+        import json
         return json.loads(str)
-    except json.JSONDecodeError:
+    except (TypeError, ValueError):
         return str
 
-def __logInteraction(input, output, timestampIn, timestampOut, type):
+def __record(input, output, type, seconds):
+    #local model stats for every call, and the usage summary in rollup mode
+    reconifyModelStats.record(__format, input, output, type, seconds)
+    if reconifyRollup.isEnabled():
+        reconifyTransport.rollup(__tracker, {
+            "format": __format,
+            "appKey": __appKey,
+            "apiKey": __apiKey,
+            "version": RECONIFY_MODULE_VERSION,
+        }, input, output, type, seconds, reconifyContext.resolve(__user, __session, __sessionTimeout))
+
+def __logInteraction(input, output, timestampIn, timestampOut, type, sampleRate=None, identity=None):
+    if identity is None:
+        identity = reconifyContext.resolve(__user, __session, __sessionTimeout)
+    user, session, sessionTimeout = identity
+    if sampleRate is None:
+        sampleRate = reconifyTransport.sample(user, session)
+        if sampleRate is None:
+            return
     if __debug:
         print('Logging interaction')
 
@@ -48,21 +62,19 @@ def __logInteraction(input, output, timestampIn, timestampOut, type):
         },
         "request": input,
         "response": json_output,
-        "user": __user,
-        "session": __session,
-        "sessionTimeout": __sessionTimeout,
+        "user": user,
+        "session": session,
+        "sessionTimeout": sessionTimeout,
         "timestamps": {
             "request": timestampIn,
             "response": timestampOut
         },
     }
+    if sampleRate < 1:
+        payload['sampleRate'] = sampleRate
     if __debug:
         print('Sending payload: ', payload)
-    try:
-        requests.post(__tracker, json=payload)
-    except requests.exceptions.RequestException as err:
-        if __debug:
-            print('Send error: ', err)
+    reconifyTransport.send(__tracker, payload)
 
     return
 
@@ -94,6 +106,8 @@ def config (appKey, apiKey, **options):
     if 'trackImages' in options and options.get('trackImages') == False:
         __trackImages = False
 
+    reconifyTransport.configure(**options)
+
     
 
 def setUser(user):
@@ -108,9 +122,60 @@ def setSessionTimeout(sessionTimeout):
     global __sessionTimeout
     __sessionTimeout = sessionTimeout
 
+def context(**values):
+    return reconifyContext.context(**values)
+
 def getTimestamp():
     return round(time.time()*1000)
     
 def logChat(request, response, startTimestamp, endTimeStamp):    
+    try:
+        seconds = (endTimeStamp - startTimestamp) / 1000
+    except TypeError:
+        seconds = 0
+    __record(request, response, 'chat', seconds)
     __logInteraction(request, response, startTimestamp, endTimeStamp, 'chat')
-    return
\ No newline at end of file
+    return
+
+def __importPayload(record):
+    #recorded responses are usually already decoded, only strings that look like json are converted
+    response = record.get('response')
+    if isinstance(response, str) and response[:1] in ('{', '['):
+        response = __convertToJson(response)
+    return {
+        "reconify" :{
+            "format": __format,
+            "appKey": __appKey,
+            "apiKey": __apiKey,
+            "type": record.get('type') or 'chat',
+            "version": RECONIFY_MODULE_VERSION,
+        },
+        "request": record.get('request'),
+        "response": response,
+        "user": record.get('user') or {},
+        "session": record.get('session') or '',
+        "sessionTimeout": record.get('sessionTimeout') or '',
+        "timestamps": {
+            "request": record.get('timestampRequest'),
+            "response": record.get('timestampResponse')
+        },
+    }
+
+def importChats(source, mapping=None, **options):
+    #bulk backfill from a jsonl file (optionally gzip) or an iterable of records, sampling and rollup do not apply
+    if __appKey is None or __apiKey is None:
+        raise Exception('An appKey and apiKey are required')
+    from . import reconifyImport
+    return reconifyImport.run(source, __importPayload, __tracker, mapping, debug=__debug, **options)
+
+def flush(timeout=None):
+    return reconifyTransport.flush(timeout)
+
+def invocation(function):
+    return reconifyTransport.invocation(function)
+
+def stats(output='dict'):
+    return reconifyTransport.stats(output)
+
+def modelStats():
+    return reconifyModelStats.snapshot()
\ No newline at end of file
@@ -0,0 +1,67 @@
+from .reconifyStream import _get
+
+#token usage reported by each provider, as (inputTokens, outputTokens) with None when a count is unknown
+
+def __openai(output):
+    usage = _get(output, 'usage')
+    return _get(usage, 'prompt_tokens'), _get(usage, 'completion_tokens')
+
+def __anthropic(output):
+    usage = _get(output, 'usage')
+    return _get(usage, 'input_tokens'), _get(usage, 'output_tokens')
+
+def __cohere(output):
+    meta = _get(output, 'meta')
+    units = _get(meta, 'billed_units') or _get(meta, 'tokens')
+    return _get(units, 'input_tokens'), _get(units, 'output_tokens')
+
+def __bedrock(output):
+    #the runtime reports counts for every model family in the response headers
+    headers = _get(_get(output, 'ResponseMetadata'), 'HTTPHeaders') or {}
+    inputTokens = headers.get('x-amzn-bedrock-input-token-count')
+    outputTokens = headers.get('x-amzn-bedrock-output-token-count')
+    if inputTokens is not None or outputTokens is not None:
+        return __int(inputTokens), __int(outputTokens)
+    body = _get(output, 'parsedBody') or {}
+    #streamed responses end with the counts bedrock measured
+    metrics = body.get('amazon-bedrock-invocationMetrics')
+    if metrics is not None:
+        return metrics.get('inputTokenCount'), metrics.get('outputTokenCount')
+    usage = _get(body, 'usage')
+    if usage is not None:
+        return _get(usage, 'input_tokens') or _get(usage, 'inputTokens'), _get(usage, 'output_tokens') or _get(usage, 'outputTokens')
+    if 'prompt_token_count' in body:
+        return body.get('prompt_token_count'), body.get('generation_token_count')
+    if 'inputTextTokenCount' in body:
+        results = body.get('results') or [{}]
+        return body.get('inputTextTokenCount'), results[0].get('tokenCount')
+    return None, None
+
+def __int(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+EXTRACTORS = {
+    'openai': __openai,
+    'mistral': __openai,
+    'anthropic': __anthropic,
+    'cohere': __cohere,
+    'bedrock': __bedrock
+}
+
+def extract(format, output):
+    extractor = EXTRACTORS.get(format)
+    if extractor is None or output is None:
+        return None, None
+    try:
+        return extractor(output)
+    except (AttributeError, TypeError, ValueError, IndexError):
+        return None, None
+
+def modelOf(input, output):
+    model = None
+    if isinstance(input, dict):
+        model = input.get('model') or input.get('modelId')
+    return str(model or _get(output, 'model') or 'unknown')
@@ -0,0 +1,136 @@
+import threading
+import zlib
+from . import reconifyEncoder
+
+#constants
+DEFAULT_COMPRESSION_THRESHOLD = 1024
+DEFAULT_LEVELS = {'gzip': 1, 'zstd': 3}
+GZIP_WBITS = 31
+JSON_TYPE = 'application/json'
+MSGPACK_TYPE = 'application/msgpack'
+JSON_HEADERS = {'Content-Type': JSON_TYPE}
+MSGPACK_HEADERS = {'Content-Type': MSGPACK_TYPE}
+
+#private variables
+__debug = False
+__compression = None
+__compressionThreshold = DEFAULT_COMPRESSION_THRESHOLD
+__compressionLevel = None
+__compress = None
+__headers = {}
+__refused = set()
+__lock = threading.Lock()
+
+def __gzip(level):
+    def compress(data):
+        #zlib.compress only takes wbits from python 3.11
+        compressor = zlib.compressobj(level, zlib.DEFLATED, GZIP_WBITS)
+        return compressor.compress(data) + compressor.flush()
+    return compress
+
+def __zstd(level):
+    #the standard library has zstd from python 3.14, before that it needs the zstandard package
+    try:
+        from compression import zstd
+        return lambda data: zstd.compress(data, level)
+    except ImportError:
+        pass
+    import zstandard
+    #a compressor is not thread safe, each sender thread gets its own
+    local = threading.local()
+    def compress(data):
+        compressor = getattr(local, 'compressor', None)
+        if compressor is None:
+            compressor = local.compressor = zstandard.ZstdCompressor(level=level)
+        return compressor.compress(data)
+    return compress
+
+def __load():
+    #the compressor is built on the first send so importing a handler stays cheap
+    global __compress
+    global __compression
+    if __compression == 'zstd':
+        try:
+            __compress = __zstd(__compressionLevel if __compressionLevel is not None else DEFAULT_LEVELS['zstd'])
+            return
+        except ImportError as err:
+            if __debug:
+                print('zstd unavailable, using gzip: ', err)
+            __compression = 'gzip'
+    __compress = __gzip(__compressionLevel if __compressionLevel is not None else DEFAULT_LEVELS['gzip'])
+
+def __contentHeaders(contentType):
+    key = (contentType, __compression)
+    headers = __headers.get(key)
+    if headers is None:
+        headers = {'Content-Type': contentType, 'Content-Encoding': __compression}
+        __headers[key] = headers
+    return headers
+
+def __origin(url):
+    #scheme and host, the tracker, batch and upload endpoints of one host share what it accepts
+    return '/'.join(url.split('/', 3)[:3])
+
+def configure(**options):
+    global __debug
+    global __compression
+    global __compressionThreshold
+    global __compressionLevel
+    global __compress
+
+    if 'debug' in options and options.get('debug') == True:
+        __debug = True
+
+    if 'compression' in options:
+        compression = options.get('compression')
+        __compression = compression if compression in DEFAULT_LEVELS else None
+
+    if 'compressionThreshold' in options:
+        __compressionThreshold = max(0, int(options.get('compressionThreshold')))
+
+    if 'compressionLevel' in options:
+        level = options.get('compressionLevel')
+        __compressionLevel = int(level) if level is not None else None
+
+    if 'compression' in options or 'compressionLevel' in options:
+        __compress = None
+        __headers.clear()
+
+def afterFork():
+    #a lock held by a parent thread at the fork would never be released in the child
+    #origins that refused an encoding still refuse it, so they are kept
+    global __lock
+    __lock = threading.Lock()
+
+def accepts(url):
+    #False once the tracker has answered 415 to a compressed or msgpack request
+    if not __refused:
+        return True
+    return __origin(url) not in __refused
+
+def refuse(url, headers):
+    #returns True when the request can be sent again as plain json
+    if headers.get('Content-Encoding') is None and headers.get('Content-Type') != MSGPACK_TYPE:
+        return False
+    with __lock:
+        __refused.add(__origin(url))
+    if __debug:
+        print('Tracker does not accept', headers, 'sending plain json to', __origin(url))
+    return True
+
+def prepare(url, body):
+    #returns the bytes to send and their headers
+    if isinstance(body, reconifyEncoder.MultipartImage):
+        return body, body.headers()
+    if not accepts(url):
+        return reconifyEncoder.toJson(body), JSON_HEADERS
+    contentType = MSGPACK_TYPE if reconifyEncoder.isBinary(body) else JSON_TYPE
+    if __compression is None or len(body) < __compressionThreshold:
+        return body, MSGPACK_HEADERS if contentType == MSGPACK_TYPE else JSON_HEADERS
+    if __compress is None:
+        __load()
+    data = __compress(body)
+    #incompressible bodies such as base64 images are sent as they are
+    if len(data) >= len(body):
+        return body, MSGPACK_HEADERS if contentType == MSGPACK_TYPE else JSON_HEADERS
+    return data, __contentHeaders(contentType)
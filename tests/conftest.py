@@ -0,0 +1,67 @@
+import json
+import os
+import sys
+import pytest
+
+#tests run against the working tree and use the stand-in tracker from the benchmarks
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+for path in (ROOT, os.path.join(ROOT, 'src')):
+    if path not in sys.path:
+        sys.path.insert(0, path)
+
+from benchmarks import standInServer
+
+#the stand-in records what it received, with the headers and body of each post
+class Tracker:
+    def __init__(self, url):
+        self.url = url
+        self.track = url + '/track'
+        self.upload = url + '/upload'
+
+    def received(self, path=None):
+        with standInServer.StandInHandler.lock:
+            received = list(standInServer.StandInHandler.received)
+        return [r for r in received if path is None or r[0] == path]
+
+    def events(self):
+        #every event delivered to the tracker, batches unpacked, in the order they arrived
+        events = []
+        for path, headers, body in self.received():
+            if path == '/track':
+                events.append(json.loads(body))
+            elif path == '/track/batch':
+                events.extend(json.loads(body)['events'])
+        return events
+
+@pytest.fixture(scope='session')
+def standIn():
+    server, url = standInServer.start()
+    yield url
+    server.shutdown()
+
+@pytest.fixture
+def tracker(standIn):
+    handler = standInServer.StandInHandler
+    standInServer.reset()
+    handler.keep = True
+    yield Tracker(standIn)
+    handler.keep = False
+    handler.status = 200
+    handler.delay = 0
+    handler.statuses.clear()
+
+@pytest.fixture(autouse=True)
+def fresh():
+    #each test imports its own copy of reconify, the transport keeps settings, queues and threads in module state
+    for name in [n for n in sys.modules if n == 'reconify' or n.startswith('reconify.')]:
+        del sys.modules[name]
+    yield
+    transport = sys.modules.get('reconify.reconifyTransport')
+    if transport is not None:
+        transport.flush(2)
+
+def payload(n, format='openai', **fields):
+    #a tracker event numbered so the order it arrives in can be checked
+    event = {'reconify': {'format': format, 'appKey': 'test', 'apiKey': 'test', 'type': 'chat'}, 'n': n}
+    event.update(fields)
+    return event
@@ -0,0 +1,87 @@
+import asyncio
+import threading
+import pytest
+from benchmarks import fakeClients
+
+openai = pytest.importorskip('openai')
+anthropic = pytest.importorskip('anthropic')
+
+#the real sdk clients over a mock transport, their create methods are coroutines behind sync decorators
+
+def testSdkMethodsAreDetected():
+    from reconify import reconifyStream
+    assert reconifyStream._isAsync(fakeClients.asyncOpenaiClient().chat.completions.create)
+    assert reconifyStream._isAsync(fakeClients.asyncAnthropicClient().messages.create)
+    assert not reconifyStream._isAsync(openai.OpenAI(api_key='test').chat.completions.create)
+    assert not reconifyStream._isAsync(anthropic.Anthropic(api_key='test').messages.create)
+
+def testAsyncOpenAIChat(tracker):
+    from reconify import reconifyOpenAIHandler
+    client = fakeClients.asyncOpenaiClient()
+    reconifyOpenAIHandler.config(client, 'test', 'test', tracker=tracker.track)
+    response = asyncio.run(client.chat.completions.create(model='gpt-4o', messages=fakeClients.MESSAGES))
+    assert isinstance(response, openai.types.chat.ChatCompletion)
+    assert reconifyOpenAIHandler.flush(5)
+    events = tracker.events()
+    assert len(events) == 1
+    assert events[0]['request']['model'] == 'gpt-4o'
+    assert events[0]['response']['choices'][0]['message']['content'] == fakeClients.CHAT_TEXT
+
+def testAsyncOpenAIStream(tracker):
+    from reconify import reconifyOpenAIHandler
+    client = fakeClients.asyncOpenaiClient()
+    reconifyOpenAIHandler.config(client, 'test', 'test', tracker=tracker.track)
+    async def call():
+        stream = await client.chat.completions.create(model='gpt-4o', messages=fakeClients.MESSAGES, stream=True)
+        return ''.join([chunk.choices[0].delta.content or '' async for chunk in stream])
+    assert asyncio.run(call()).strip() == fakeClients.CHAT_TEXT.strip()
+    assert reconifyOpenAIHandler.flush(5)
+    events = tracker.events()
+    assert len(events) == 1
+    assert events[0]['response']['choices'][0]['message']['content'].strip() == fakeClients.CHAT_TEXT.strip()
+    assert 'firstToken' in events[0]['timestamps']
+
+def testAsyncAnthropicMessages(tracker):
+    from reconify import reconifyAnthropicHandler
+    client = fakeClients.asyncAnthropicClient()
+    reconifyAnthropicHandler.config(client, 'test', 'test', tracker=tracker.track)
+    response = asyncio.run(client.messages.create(model='claude-3-5-sonnet', max_tokens=256, messages=fakeClients.MESSAGES[1:]))
+    assert response.content[0].text == fakeClients.CHAT_TEXT
+    assert reconifyAnthropicHandler.flush(5)
+    events = tracker.events()
+    assert len(events) == 1
+    assert events[0]['response']['content'][0]['text'] == fakeClients.CHAT_TEXT
+    assert events[0]['response']['usage']['output_tokens'] == 80
+
+def testAsyncAnthropicStream(tracker):
+    from reconify import reconifyAnthropicHandler
+    client = fakeClients.asyncAnthropicClient()
+    reconifyAnthropicHandler.config(client, 'test', 'test', tracker=tracker.track)
+    async def call():
+        stream = await client.messages.create(model='claude-3-5-sonnet', max_tokens=256, messages=fakeClients.MESSAGES[1:], stream=True)
+        return [event.type async for event in stream]
+    assert asyncio.run(call())[-1] == 'message_stop'
+    assert reconifyAnthropicHandler.flush(5)
+    events = tracker.events()
+    assert len(events) == 1
+    assert events[0]['response']['content'][0]['text'].strip() == fakeClients.CHAT_TEXT.strip()
+
+def testAsyncDeliveryLeavesTheEventLoop(tracker):
+    from reconify import reconifyOpenAIHandler
+    from reconify import reconifyTransport
+    client = fakeClients.asyncOpenaiClient()
+    reconifyOpenAIHandler.config(client, 'test', 'test', tracker=tracker.track)
+    posted = []
+    post = reconifyTransport.__dict__['__post']
+    def record(*args):
+        posted.append(threading.current_thread())
+        return post(*args)
+    reconifyTransport.__dict__['__post'] = record
+    async def calls():
+        loop = threading.current_thread()
+        await asyncio.gather(*[client.chat.completions.create(model='gpt-4o', messages=fakeClients.MESSAGES) for _ in range(20)])
+        return loop
+    loop = asyncio.run(calls())
+    assert reconifyOpenAIHandler.flush(5)
+    assert len(tracker.events()) == 20
+    assert len(posted) == 20 and loop not in posted
@@ -0,0 +1,78 @@
+import json
+import time
+from conftest import payload
+
+def testBatchFraming(tracker):
+    from reconify import reconifyTransport
+    reconifyTransport.configure(batch=True, batchSize=10, batchLinger=5)
+    for n in range(25):
+        reconifyTransport.send(tracker.track, payload(n))
+    assert reconifyTransport.flush(5)
+    received = tracker.received()
+    assert [path for path, headers, body in received] == ['/track/batch'] * 3
+    for path, headers, body in received:
+        assert headers['Content-Type'] == 'application/json'
+        assert list(json.loads(body)) == ['events']
+    assert [len(json.loads(body)['events']) for path, headers, body in received] == [10, 10, 5]
+
+def testBatchKeepsOrder(tracker):
+    from reconify import reconifyTransport
+    reconifyTransport.configure(batch=True, batchSize=7, batchLinger=5)
+    for n in range(100):
+        reconifyTransport.send(tracker.track, payload(n))
+    assert reconifyTransport.flush(5)
+    assert [event['n'] for event in tracker.events()] == list(range(100))
+
+def testBatchClosesAtMaxBytes(tracker):
+    from reconify import reconifyTransport
+    from reconify import reconifyEncoder
+    size = len(reconifyEncoder.encodePayload(payload(0, text='x' * 1000)))
+    reconifyTransport.configure(batch=True, batchSize=100, batchBytes=size * 3, batchLinger=5)
+    for n in range(9):
+        reconifyTransport.send(tracker.track, payload(n, text='x' * 1000))
+    assert reconifyTransport.flush(5)
+    assert [len(json.loads(body)['events']) for path, headers, body in tracker.received()] == [3, 3, 3]
+
+def testBatchClosesAtMaxAge(tracker):
+    from reconify import reconifyTransport
+    reconifyTransport.configure(batch=True, batchSize=100, batchLinger=0.2)
+    reconifyTransport.send(tracker.track, payload(0))
+    reconifyTransport.send(tracker.track, payload(1))
+    #sent by the linger alone, without a flush
+    deadline = time.monotonic() + 3
+    while not tracker.received() and time.monotonic() < deadline:
+        time.sleep(0.02)
+    assert [event['n'] for event in tracker.events()] == [0, 1]
+    assert tracker.received()[0][0] == '/track/batch'
+
+def testBatchPerTracker(tracker):
+    from reconify import reconifyTransport
+    reconifyTransport.configure(batch=True, batchSize=100, batchLinger=5)
+    other = tracker.url + '/other'
+    for n in range(6):
+        reconifyTransport.send(tracker.track if n < 3 else other, payload(n))
+    assert reconifyTransport.flush(5)
+    received = tracker.received()
+    assert [path for path, headers, body in received] == ['/track/batch', '/other/batch']
+    assert [[e['n'] for e in json.loads(body)['events']] for path, headers, body in received] == [[0, 1, 2], [3, 4, 5]]
+
+def testBatchTrackerOverride(tracker):
+    from reconify import reconifyTransport
+    reconifyTransport.configure(batch=True, batchLinger=5, batchTracker=tracker.url + '/bulk')
+    reconifyTransport.send(tracker.track, payload(0))
+    assert reconifyTransport.flush(5)
+    assert [path for path, headers, body in tracker.received()] == ['/bulk']
+
+def testHandlerEventsAreBatched(tracker):
+    from benchmarks import fakeClients
+    from reconify import reconifyOpenAIHandler
+    client = fakeClients.openaiClient()
+    reconifyOpenAIHandler.config(client, 'test', 'test', tracker=tracker.track, batch=True, batchLinger=5)
+    for _ in range(5):
+        client.chat.completions.create(model='gpt-4o', messages=fakeClients.MESSAGES)
+    assert reconifyOpenAIHandler.flush(5)
+    received = tracker.received()
+    assert len(received) == 1
+    events = json.loads(received[0][2])['events']
+    assert [e['reconify']['format'] for e in events] == ['openai'] * 5
+    assert events[0]['request']['messages'] == fakeClients.MESSAGES
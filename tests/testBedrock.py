@@ -0,0 +1,112 @@
+import pytest
+from benchmarks import fakeClients
+
+#the stub streams the canned text a word at a time, in the chunk layout of each model family
+WORDS = fakeClients.CHAT_TEXT.split(' ')
+TEXT = ''.join(w + ' ' for w in WORDS)
+METRICS = {'inputTokenCount': 120, 'outputTokenCount': 80, 'invocationLatency': 900, 'firstByteLatency': 200}
+
+def __client(tracker):
+    from reconify import reconifyBedrockRuntimeHandler
+    client = fakeClients.bedrockClient()
+    reconifyBedrockRuntimeHandler.config(client, 'test', 'test', tracker=tracker.track, uploader=tracker.upload)
+    return client
+
+def __event(tracker):
+    events = tracker.events()
+    assert len(events) == 1
+    return events[0]
+
+#the text, and the usage or stop reason taken from the last chunk, where each family puts them
+@pytest.mark.parametrize('model, text, last, expected', [
+    ('anthropic.claude-3-haiku-20240307-v1:0', lambda b: b['content'][0]['text'], lambda b: b['usage'], {'input_tokens': 120, 'output_tokens': 80}),
+    ('meta.llama3-8b-instruct-v1:0', lambda b: b['generation'], lambda b: b['generation_token_count'], len(WORDS)),
+    ('mistral.mistral-large-2402-v1:0', lambda b: b['outputs'][0]['text'], lambda b: b['outputs'][0]['stop_reason'], 'stop'),
+    ('cohere.command-text-v14', lambda b: b['generations'][0]['text'], lambda b: b['generations'][0]['finish_reason'], 'COMPLETE'),
+    ('amazon.titan-text-express-v1', lambda b: b['results'][0]['outputText'], lambda b: b['results'][0]['tokenCount'], 80),
+])
+def testInvokeModelWithResponseStream(tracker, model, text, last, expected):
+    client = __client(tracker)
+    response = client.invoke_model_with_response_stream(modelId=model, body='{}')
+    stream = response['body']
+    next(stream)
+    #the call is logged once the caller has read every event
+    assert tracker.events() == []
+    assert len(list(stream)) + 1 == len(WORDS) + (4 if model.startswith('anthropic.') else 1)
+    event = __event(tracker)
+    body = event['response']['body']
+    assert event['response']['requestId'] == 'req-1'
+    assert text(body) == TEXT
+    assert last(body) == expected
+    assert body['amazon-bedrock-invocationMetrics'] == METRICS
+    timestamps = event['timestamps']
+    assert timestamps['request'] <= timestamps['firstToken'] <= timestamps['response']
+
+def testConverse(tracker):
+    client = __client(tracker)
+    response = client.converse(modelId='anthropic.claude-3-haiku-20240307-v1:0', messages=fakeClients.MESSAGES[1:])
+    assert response['output']['message']['content'][0]['text'] == fakeClients.CHAT_TEXT
+    event = __event(tracker)
+    assert event['response']['requestId'] == 'req-1'
+    assert event['response']['body'] == {k: v for k, v in response.items() if k != 'ResponseMetadata'}
+
+def testConverseStream(tracker):
+    client = __client(tracker)
+    response = client.converse_stream(modelId='anthropic.claude-3-haiku-20240307-v1:0', messages=fakeClients.MESSAGES[1:])
+    text = ''.join(e['contentBlockDelta']['delta']['text'] for e in response['stream'] if 'contentBlockDelta' in e)
+    assert text == TEXT
+    event = __event(tracker)
+    body = event['response']['body']
+    assert body['output'] == {'message': {'role': 'assistant', 'content': [{'text': TEXT}]}}
+    assert body['stopReason'] == 'end_turn'
+    #usage and metrics only come with the last, metadata, event
+    assert body['usage'] == {'inputTokens': 120, 'outputTokens': 80, 'totalTokens': 200}
+    assert body['metrics'] == {'latencyMs': 900}
+    timestamps = event['timestamps']
+    assert timestamps['request'] <= timestamps['firstToken'] <= timestamps['response']
+
+def testStreamClosedEarlyIsLogged(tracker):
+    client = __client(tracker)
+    response = client.converse_stream(modelId='anthropic.claude-3-haiku-20240307-v1:0', messages=fakeClients.MESSAGES[1:])
+    stream = response['stream']
+    for _ in range(3):
+        next(stream)
+    stream.close()
+    #what was read so far, without usage as the metadata event never came
+    body = __event(tracker)['response']['body']
+    assert body['output']['message']['content'][0]['text'] == WORDS[0] + ' ' + WORDS[1] + ' '
+    assert body['usage'] is None
+
+def testBodyCanBeReadAfterTheHandler(tracker):
+    import json
+    client = __client(tracker)
+    response = client.invoke_model(modelId='anthropic.claude-3-haiku-20240307-v1:0', body='{}')
+    #the handler has read and logged the body already
+    assert __event(tracker)['response']['body']['content'][0]['text'] == fakeClients.CHAT_TEXT
+    body = response['body']
+    data = body.read()
+    assert json.loads(data) == response['parsedBody']
+    assert body.json() == response['parsedBody']
+    assert response['parsedBody']['content'][0]['text'] == fakeClients.CHAT_TEXT
+    #like a StreamingBody it is empty once read, until it is rewound
+    assert body.read() == b''
+    body.seek(0)
+    assert body.read() == data
+    body.seek(0)
+    assert b''.join(body.iter_chunks(16)) == data
+    body.seek(0)
+    assert list(body.iter_lines()) == data.splitlines()
+
+def testImageBodyCanBeReadAfterTheHandler(tracker):
+    import json
+    client = __client(tracker)
+    response = client.invoke_model(modelId='stability.stable-diffusion-xl-v1', body='{}')
+    body = response['body']
+    assert body.json()['artifacts'][0]['base64'] == fakeClients.IMAGE_B64
+    assert json.loads(body.read()) == body.json()
+    body.seek(0)
+    assert json.loads(body.read())['artifacts'][0]['base64'] == fakeClients.IMAGE_B64
+    assert __event(tracker)['response']['body']['format'] == 'b64_json'
+    from reconify import reconifyBedrockRuntimeHandler
+    assert reconifyBedrockRuntimeHandler.flush(5)
+    assert len(tracker.received('/upload')) == 1
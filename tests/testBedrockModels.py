@@ -0,0 +1,60 @@
+import json
+import pytest
+from benchmarks import fakeClients
+
+@pytest.mark.parametrize('modelId, prefix', [
+    ('anthropic.claude-3-haiku-20240307-v1:0', 'anthropic.'),
+    ('us.anthropic.claude-3-5-sonnet-20240620-v1:0', 'anthropic.'),
+    ('eu.meta.llama3-2-3b-instruct-v1:0', 'meta.'),
+    ('global.anthropic.claude-sonnet-4-20250514-v1:0', 'anthropic.'),
+    ('apac.amazon.nova-lite-v1:0', 'amazon.nova'),
+    ('amazon.titan-text-express-v1', 'amazon.titan-text'),
+    ('amazon.titan-image-generator-v2:0', 'amazon.titan-image'),
+    ('arn:aws:bedrock:us-east-1::foundation-model/mistral.mistral-large-2402-v1:0', 'mistral.'),
+    ('arn:aws:bedrock:us-east-1:123456789012:inference-profile/us.anthropic.claude-3-haiku-20240307-v1:0', 'anthropic.'),
+    ('arn:aws:bedrock:eu-west-1:123456789012:application-inference-profile/cohere.command-r-v1:0', 'cohere.'),
+])
+def testResolve(modelId, prefix):
+    from reconify import reconifyBedrockModels
+    assert reconifyBedrockModels.resolve(modelId).prefix == prefix
+
+@pytest.mark.parametrize('modelId', ['acme.model-v1', 'us.acme.model-v1', 'arn:aws:bedrock:us-east-1::foundation-model/acme.model-v1', '', None])
+def testUnknownModels(modelId):
+    from reconify import reconifyBedrockModels
+    assert reconifyBedrockModels.resolve(modelId) is None
+
+def testUnknownModelIsLoggedWithoutItsBody(tracker):
+    from reconify import reconifyBedrockRuntimeHandler
+    client = fakeClients.bedrockClient()
+    reconifyBedrockRuntimeHandler.config(client, 'test', 'test', tracker=tracker.track)
+    response = client.invoke_model(modelId='acme.model-v1', body='{}')
+    [event] = tracker.events()
+    assert event['reconify']['type'] == 'chat'
+    assert event['response'] == {'requestId': 'req-1', 'body': None}
+    #the body is left for the caller to read
+    assert 'parsedBody' not in response
+    assert json.loads(response['body'].read())['content'][0]['text'] == fakeClients.CHAT_TEXT
+
+def testRegisterFamilyOverridesABuiltInFamily(tracker):
+    from reconify import reconifyBedrockModels
+    from reconify import reconifyBedrockRuntimeHandler
+    client = fakeClients.bedrockClient()
+    reconifyBedrockRuntimeHandler.config(client, 'test', 'test', tracker=tracker.track)
+    #resolved before the override, which must not stay cached
+    assert reconifyBedrockModels.resolve('anthropic.claude-3-haiku-20240307-v1:0').fields is not None
+    reconifyBedrockRuntimeHandler.registerFamily('anthropic.', extract=lambda body: {'text': body['content'][0]['text']})
+    response = client.invoke_model(modelId='us.anthropic.claude-3-haiku-20240307-v1:0', body='{}')
+    assert tracker.events()[0]['response']['body'] == {'text': fakeClients.CHAT_TEXT}
+    #the caller still gets the full body
+    assert response['body'].json()['usage'] == {'input_tokens': 120, 'output_tokens': 80}
+
+def testLongestPrefixWins(tracker):
+    from reconify import reconifyBedrockRuntimeHandler
+    client = fakeClients.bedrockClient()
+    reconifyBedrockRuntimeHandler.config(client, 'test', 'test', tracker=tracker.track)
+    reconifyBedrockRuntimeHandler.registerFamily('anthropic.claude-3-haiku', fields=['stop_reason'])
+    client.invoke_model(modelId='anthropic.claude-3-haiku-20240307-v1:0', body='{}')
+    client.invoke_model(modelId='anthropic.claude-3-5-sonnet-20240620-v1:0', body='{}')
+    haiku, sonnet = [event['response']['body'] for event in tracker.events()]
+    assert haiku == {'stop_reason': 'end_turn'}
+    assert sonnet['content'][0]['text'] == fakeClients.CHAT_TEXT
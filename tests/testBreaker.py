@@ -0,0 +1,126 @@
+import time
+from benchmarks import standInServer
+from conftest import payload
+
+def testReadTimeoutBoundsTheWrappedCall(tracker):
+    from benchmarks import fakeClients
+    from reconify import reconifyOpenAIHandler
+    from reconify import reconifyTransport
+    standInServer.StandInHandler.delay = 2
+    client = fakeClients.openaiClient()
+    reconifyOpenAIHandler.config(client, 'test', 'test', tracker=tracker.track, readTimeout=0.2)
+    started = time.monotonic()
+    client.chat.completions.create(model='gpt-4o', messages=fakeClients.MESSAGES)
+    assert time.monotonic() - started < 1
+    assert reconifyTransport.getDroppedCounts()['failed'] == 1
+
+def testRetriesServerErrorsWithBackoff(tracker):
+    from reconify import reconifyTransport
+    standInServer.StandInHandler.statuses.extend([503, 500])
+    reconifyTransport.configure(background=True, retries=2, retryBackoff=0.01)
+    reconifyTransport.send(tracker.track, payload(0))
+    assert reconifyTransport.flush(5)
+    assert len(tracker.received()) == 3
+    assert sum(reconifyTransport.getDroppedCounts().values()) == 0
+
+def testRetriesRateLimits(tracker):
+    from reconify import reconifyTransport
+    standInServer.StandInHandler.statuses.append(429)
+    reconifyTransport.configure(background=True, retries=1, retryBackoff=0.01)
+    reconifyTransport.send(tracker.track, payload(0))
+    assert reconifyTransport.flush(5)
+    assert len(tracker.received()) == 2
+    assert sum(reconifyTransport.getDroppedCounts().values()) == 0
+
+def testClientErrorsAreNotRetried(tracker):
+    from reconify import reconifyTransport
+    standInServer.StandInHandler.statuses.append(400)
+    reconifyTransport.configure(background=True, retries=3, retryBackoff=0.01)
+    reconifyTransport.send(tracker.track, payload(0))
+    assert reconifyTransport.flush(5)
+    assert len(tracker.received()) == 1
+    assert reconifyTransport.getDroppedCounts()['failed'] == 1
+
+def testRetriesGiveUp(tracker):
+    from reconify import reconifyTransport
+    standInServer.StandInHandler.status = 503
+    reconifyTransport.configure(background=True, retries=2, retryBackoff=0.01, breakerThreshold=100)
+    reconifyTransport.send(tracker.track, payload(0))
+    assert reconifyTransport.flush(5)
+    assert len(tracker.received()) == 3
+    assert reconifyTransport.getDroppedCounts()['failed'] == 1
+
+def testBreakerOpensAfterFailures(tracker):
+    from reconify import reconifyTransport
+    standInServer.StandInHandler.status = 500
+    reconifyTransport.configure(breakerThreshold=3, breakerCooldown=0.5)
+    for n in range(10):
+        reconifyTransport.send(tracker.track, payload(n))
+    #nothing is posted while the breaker is open
+    assert len(tracker.received()) == 3
+    dropped = reconifyTransport.getDroppedCounts()
+    assert dropped['failed'] == 3
+    assert dropped['breakerOpen'] == 7
+    assert reconifyTransport.stats()['gauges']['breakerOpen'] == 1
+
+def testBreakerClosesAfterCooldown(tracker):
+    from reconify import reconifyTransport
+    standInServer.StandInHandler.status = 500
+    reconifyTransport.configure(breakerThreshold=2, breakerCooldown=0.3)
+    for n in range(3):
+        reconifyTransport.send(tracker.track, payload(n))
+    assert len(tracker.received()) == 2
+    standInServer.StandInHandler.status = 200
+    time.sleep(0.4)
+    for n in range(3, 6):
+        reconifyTransport.send(tracker.track, payload(n))
+    assert [event['n'] for event in tracker.events()] == [0, 1, 3, 4, 5]
+    assert reconifyTransport.stats()['gauges']['breakerOpen'] == 0
+
+def testRejectedEventsDoNotOpenTheBreaker(tracker):
+    from reconify import reconifyTransport
+    standInServer.StandInHandler.statuses.extend([400] * 5)
+    reconifyTransport.configure(breakerThreshold=3, breakerCooldown=5)
+    for n in range(10):
+        reconifyTransport.send(tracker.track, payload(n))
+    #the tracker answered, so healthy events after the rejected ones are still posted
+    assert [event['n'] for event in tracker.events()] == list(range(10))
+    dropped = reconifyTransport.getDroppedCounts()
+    assert dropped['failed'] == 5
+    assert dropped['breakerOpen'] == 0
+    assert reconifyTransport.stats()['gauges']['breakerOpen'] == 0
+
+def testBreakerReopensOnFailedTrial(tracker):
+    from reconify import reconifyTransport
+    standInServer.StandInHandler.status = 500
+    reconifyTransport.configure(breakerThreshold=2, breakerCooldown=0.3)
+    for n in range(2):
+        reconifyTransport.send(tracker.track, payload(n))
+    time.sleep(0.4)
+    #a single failed send after the cool-down opens it again
+    for n in range(2, 5):
+        reconifyTransport.send(tracker.track, payload(n))
+    assert len(tracker.received()) == 3
+    assert reconifyTransport.getDroppedCounts()['breakerOpen'] == 2
+
+def testBreakerOpensOnSlowSends(tracker):
+    from reconify import reconifyTransport
+    standInServer.StandInHandler.delay = 0.1
+    reconifyTransport.configure(breakerThreshold=3, breakerCooldown=5, breakerLatency=0.05)
+    for n in range(5):
+        reconifyTransport.send(tracker.track, payload(n))
+    #slow sends are delivered but still count against the tracker
+    assert len(tracker.received()) == 3
+    assert reconifyTransport.getDroppedCounts()['breakerOpen'] == 2
+
+def testBreakerDropsDoNotBlockTheQueue(tracker):
+    from reconify import reconifyTransport
+    standInServer.StandInHandler.delay = 1
+    reconifyTransport.configure(background=True, readTimeout=0.1, retries=0, breakerThreshold=1, breakerCooldown=5)
+    started = time.monotonic()
+    for n in range(50):
+        reconifyTransport.send(tracker.track, payload(n))
+    assert reconifyTransport.flush(5)
+    assert time.monotonic() - started < 2
+    dropped = reconifyTransport.getDroppedCounts()
+    assert dropped['failed'] + dropped['breakerOpen'] == 50
@@ -0,0 +1,111 @@
+import asyncio
+import threading
+import time
+import pytest
+from benchmarks import fakeClients
+
+#constants
+WORKERS = 16
+CALLS = 10
+LATENCY = 0.02
+
+def __message(worker, n):
+    return [{'role': 'user', 'content': f'{worker}-{n}'}]
+
+def __check(events, workers):
+    #every call is tagged with the user and session of the worker that made it
+    assert len(events) == workers * CALLS
+    for event in events:
+        worker = event['request']['messages'][0]['content'].split('-')[0]
+        assert event['user'] == {'userId': 'user-' + worker}
+        assert event['session'] == 'session-' + worker
+
+def __slowClient():
+    #model time so that calls from different workers overlap
+    client = fakeClients.openaiClient()
+    create = client.chat.completions.create
+    def slowCreate(**kwargs):
+        time.sleep(LATENCY)
+        return create(**kwargs)
+    client.chat.completions.create = slowCreate
+    return client
+
+@pytest.mark.parametrize('background', [False, True])
+def testThreadsKeepTheirOwnUser(tracker, background):
+    from reconify import reconifyOpenAIHandler
+    client = __slowClient()
+    reconifyOpenAIHandler.config(client, 'test', 'test', tracker=tracker.track, background=background)
+    reconifyOpenAIHandler.setUser({'userId': 'default'})
+    start = threading.Barrier(WORKERS)
+    def worker(i):
+        start.wait()
+        with reconifyOpenAIHandler.context(user={'userId': f'user-{i}'}, session=f'session-{i}'):
+            for n in range(CALLS):
+                client.chat.completions.create(model='gpt-4o', messages=__message(i, n))
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(WORKERS)]
+    started = time.monotonic()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.monotonic() - started
+    assert reconifyOpenAIHandler.flush(5)
+    __check(tracker.events(), WORKERS)
+    #the shared client is not serialized, one worker alone takes CALLS * LATENCY
+    assert elapsed < WORKERS * CALLS * LATENCY / 2
+
+def testTasksKeepTheirOwnUser(tracker):
+    pytest.importorskip('openai')
+    from reconify import reconifyOpenAIHandler
+    client = fakeClients.asyncOpenaiClient(LATENCY)
+    reconifyOpenAIHandler.config(client, 'test', 'test', tracker=tracker.track)
+    async def worker(i):
+        with reconifyOpenAIHandler.context(user={'userId': f'user-{i}'}, session=f'session-{i}'):
+            for n in range(CALLS):
+                await client.chat.completions.create(model='gpt-4o', messages=__message(i, n))
+    async def run():
+        await asyncio.gather(*[worker(i) for i in range(WORKERS)])
+    started = time.monotonic()
+    asyncio.run(run())
+    elapsed = time.monotonic() - started
+    assert reconifyOpenAIHandler.flush(5)
+    __check(tracker.events(), WORKERS)
+    assert elapsed < WORKERS * CALLS * LATENCY / 2
+
+def testBindAndUnbind(tracker):
+    from reconify import reconifyContext
+    from reconify import reconifyOpenAIHandler
+    client = fakeClients.openaiClient()
+    reconifyOpenAIHandler.config(client, 'test', 'test', tracker=tracker.track)
+    reconifyOpenAIHandler.setUser({'userId': 'default'})
+    reconifyOpenAIHandler.setSession('default')
+    token = reconifyContext.bind(user={'userId': 'bound'})
+    inner = reconifyContext.bind(session='inner')
+    client.chat.completions.create(model='gpt-4o', messages=fakeClients.MESSAGES)
+    reconifyContext.unbind(inner)
+    client.chat.completions.create(model='gpt-4o', messages=fakeClients.MESSAGES)
+    reconifyContext.unbind(token)
+    client.chat.completions.create(model='gpt-4o', messages=fakeClients.MESSAGES)
+    #nested binds add to the values around them, unbind restores them
+    assert [(event['user']['userId'], event['session']) for event in tracker.events()] == [
+        ('bound', 'inner'), ('bound', 'default'), ('default', 'default')]
+
+def testStreamKeepsTheUserAfterTheBlock(tracker):
+    pytest.importorskip('openai')
+    from reconify import reconifyOpenAIHandler
+    client = fakeClients.asyncOpenaiClient()
+    reconifyOpenAIHandler.config(client, 'test', 'test', tracker=tracker.track)
+    async def run():
+        with reconifyOpenAIHandler.context(user={'userId': 'caller'}):
+            stream = await client.chat.completions.create(model='gpt-4o', messages=fakeClients.MESSAGES, stream=True)
+        #the stream is read after the block, the event still belongs to the caller
+        async for _ in stream:
+            pass
+    asyncio.run(run())
+    assert reconifyOpenAIHandler.flush(5)
+    assert [event['user'] for event in tracker.events()] == [{'userId': 'caller'}]
+
+def testUnknownContextValue():
+    from reconify import reconifyContext
+    with pytest.raises(TypeError):
+        reconifyContext.bind(userId='ABC123')
@@ -0,0 +1,102 @@
+import threading
+import time
+import pytest
+from benchmarks import fakeClients
+from benchmarks import standInServer
+
+#constants
+WORKERS = 8
+CALLS = 10
+LATENCY = 0.01
+SYSTEM = {'role': 'system', 'content': 'You are a support agent for an online store. ' * 60}
+TOOLS = [{'type': 'function', 'function': {'name': f'tool{i}', 'description': 'Looks up an order by its number. ' * 20,
+    'parameters': {'type': 'object', 'properties': {'order': {'type': 'string'}}}}} for i in range(4)]
+
+def __history(worker, n):
+    #the conversation so far, each call adds a question and the answer to the one before
+    messages = [SYSTEM]
+    for i in range(n + 1):
+        messages.append({'role': 'user', 'content': f'{worker}-{i}'})
+        if i < n:
+            messages.append({'role': 'assistant', 'content': fakeClients.CHAT_TEXT})
+    return messages
+
+def __rebuild(events):
+    #expands events in the order the tracker received them, as it would
+    from reconify import reconifyDedupe
+    from reconify import reconifyDelta
+    blocks = {}
+    histories = {}
+    return [reconifyDelta.expand(reconifyDedupe.expand(event, blocks), histories) for event in events]
+
+def __call(client, worker, n):
+    client.chat.completions.create(model='gpt-4o', messages=__history(worker, n), tools=TOOLS)
+
+def __slowClient():
+    #model time so that earlier events are delivered while later calls are made
+    client = fakeClients.openaiClient()
+    create = client.chat.completions.create
+    def slowCreate(**kwargs):
+        time.sleep(LATENCY)
+        return create(**kwargs)
+    client.chat.completions.create = slowCreate
+    return client
+
+def __check(events):
+    assert len(events) == WORKERS * CALLS
+    for event in __rebuild(events):
+        worker, n = event['request']['messages'][-1]['content'].split('-')
+        assert event['request']['messages'] == __history(int(worker), int(n))
+        assert event['request']['tools'] == TOOLS
+
+#sync sends from many threads and several workers reach the threaded stand-in in any order
+@pytest.mark.parametrize('options', [{'batch': True, 'batchLinger': 0.02}, {}, {'background': True, 'workers': 4}])
+def testEventsFromConcurrentThreadsRebuild(tracker, options):
+    from reconify import reconifyOpenAIHandler
+    client = __slowClient()
+    reconifyOpenAIHandler.config(client, 'test', 'test', tracker=tracker.track, dedupe=True, deltaEncoding=True, **options)
+    def worker(i):
+        with reconifyOpenAIHandler.context(session=f'session-{i}'):
+            for n in range(CALLS):
+                __call(client, i, n)
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(WORKERS)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert reconifyOpenAIHandler.flush(5)
+    events = tracker.events()
+    #blocks and earlier messages only go again until an event that carried them is delivered
+    assert sum(1 for event in events if 'blocks' in event) < len(events) / 2
+    assert sum(1 for event in events if 'prefix' in event['delta']) > len(events) / 2
+    __check(events)
+
+def testDeltaFollowsDeliveredEvents(tracker):
+    from reconify import reconifyOpenAIHandler
+    client = fakeClients.openaiClient()
+    reconifyOpenAIHandler.config(client, 'test', 'test', tracker=tracker.track, deltaEncoding=True)
+    with reconifyOpenAIHandler.context(session='session'):
+        for n in range(CALLS):
+            __call(client, 0, n)
+    events = tracker.events()
+    #each call is sent before the next one is made, so every later one only carries the new messages
+    assert ['prefix' in event['delta'] for event in events] == [False] + [True] * (CALLS - 1)
+    assert [len(event['request']['messages']) for event in events[1:]] == [2] * (CALLS - 1)
+    assert [event['request']['messages'] for event in __rebuild(events)] == [__history(0, n) for n in range(CALLS)]
+
+def testEventsAfterADropRebuild(tracker):
+    from reconify import reconifyOpenAIHandler
+    from reconify import reconifyTransport
+    client = fakeClients.openaiClient()
+    reconifyOpenAIHandler.config(client, 'test', 'test', tracker=tracker.track, background=True, retries=0,
+        dedupe=True, deltaEncoding=True)
+    standInServer.StandInHandler.statuses.append(500)
+    with reconifyOpenAIHandler.context(session='session'):
+        for n in range(3):
+            __call(client, 0, n)
+    assert reconifyOpenAIHandler.flush(5)
+    assert reconifyTransport.getDroppedCounts()['failed'] == 1
+    #the failed post is recorded too, the tracker only keeps what it accepted
+    events = tracker.events()[1:]
+    assert 'blocks' in events[0]
+    assert [event['request']['messages'] for event in __rebuild(events)] == [__history(0, 1), __history(0, 2)]
@@ -0,0 +1,182 @@
+import collections
+import os
+import signal
+import subprocess
+import sys
+import time
+import pytest
+from benchmarks import standInServer
+from conftest import ROOT
+from conftest import payload
+
+#constants
+WORKERS = 4
+EVENTS = 50
+TIMEOUT = 15
+#a process that queues events behind a slow tracker and waits for SIGTERM, optionally while holding a lock
+SIGTERM = '''
+import os, signal, sys, time
+from reconify import reconifyTransport
+url, events, shutdownTimeout, held, spoolDir = sys.argv[1:]
+reconifyTransport.configure(background=True, drainOnSigterm=True, shutdownTimeout=float(shutdownTimeout), spoolDir=spoolDir or None)
+for n in range(int(events)):
+    reconifyTransport.send(url, {'reconify': {'format': 'openai', 'appKey': 'test', 'apiKey': 'test', 'type': 'chat'}, 'n': n})
+if held:
+    module, name = held.split(':')
+    with sys.modules['reconify.' + module].__dict__[name]:
+        os.kill(os.getpid(), signal.SIGTERM)
+        time.sleep(TIMEOUT)
+print('ready', flush=True)
+time.sleep(TIMEOUT)
+'''.replace('TIMEOUT', str(TIMEOUT))
+
+def __fork(work):
+    #runs work in a forked child, its return value is the exit code
+    pid = os.fork()
+    if pid == 0:
+        code = 1
+        try:
+            code = work()
+        finally:
+            os._exit(code)
+    return pid
+
+def __exitCode(pid):
+    return os.waitstatus_to_exitcode(os.waitpid(pid, 0)[1])
+
+def __wait(tracker, count):
+    end = time.monotonic() + TIMEOUT
+    while len(tracker.events()) < count and time.monotonic() < end:
+        time.sleep(0.02)
+    #anything more would be a duplicate
+    time.sleep(0.2)
+    return tracker.events()
+
+def __restart():
+    for name in [n for n in sys.modules if n == 'reconify' or n.startswith('reconify.')]:
+        del sys.modules[name]
+
+def __exitedWorker(tmp_path, tracker, delivered=0):
+    #a forked worker that spooled EVENTS events while the tracker was down, and delivered the first ones before it exited
+    from reconify import reconifySpool
+    from reconify import reconifyEncoder
+    from reconify import reconifyTransport
+    reconifyTransport.configure(spoolDir=str(tmp_path))
+    def work():
+        for n in range(EVENTS):
+            reconifySpool.append(tracker.track, reconifyEncoder.encodePayload(payload(n)))
+        if delivered:
+            reconifySpool.commit(reconifySpool.read(delivered, 1024 * 1024)[2])
+        return 0
+    pid = __fork(work)
+    assert __exitCode(pid) == 0
+    return os.path.join(str(tmp_path), str(pid))
+
+def __sigterm(tracker, events, shutdownTimeout, held='', spoolDir=''):
+    env = dict(os.environ, PYTHONPATH=os.path.join(ROOT, 'src'))
+    return subprocess.Popen([sys.executable, '-c', SIGTERM, tracker.track, str(events), str(shutdownTimeout), held, spoolDir],
+        env=env, stdout=subprocess.PIPE, text=True)
+
+def testForkedWorkersDeliverEveryEventOnce(tracker, tmp_path):
+    from reconify import reconifyTransport
+    reconifyTransport.configure(background=True, batch=True, batchLinger=0.05, spoolDir=str(tmp_path))
+    #the parent has events queued when it forks, they are sent by the parent only
+    for n in range(EVENTS):
+        reconifyTransport.send(tracker.track, payload(n, worker=-1))
+    def worker(i):
+        def work():
+            for n in range(EVENTS):
+                reconifyTransport.send(tracker.track, payload(n, worker=i))
+            return 0 if reconifyTransport.flush(TIMEOUT) else 1
+        return work
+    pids = [__fork(worker(i)) for i in range(WORKERS)]
+    assert [__exitCode(pid) for pid in pids] == [0] * WORKERS
+    assert reconifyTransport.flush(TIMEOUT)
+    events = __wait(tracker, (WORKERS + 1) * EVENTS)
+    counts = collections.Counter((event['worker'], event['n']) for event in events)
+    assert len(counts) == (WORKERS + 1) * EVENTS
+    assert set(counts.values()) == {1}
+    #each worker sends in order
+    for i in range(-1, WORKERS):
+        assert [event['n'] for event in events if event['worker'] == i] == list(range(EVENTS))
+
+def testAdoptedSpoolResumesFromTheCheckpoint(tracker, tmp_path):
+    workerDir = __exitedWorker(tmp_path, tracker, delivered=5)
+    __restart()
+    from reconify import reconifyTransport
+    reconifyTransport.configure(spoolDir=str(tmp_path), retryBackoff=0.01)
+    assert [event['n'] for event in __wait(tracker, EVENTS - 5)] == list(range(5, EVENTS))
+    assert not os.path.exists(workerDir)
+
+def testAdoptionRaceIsSkipped(tracker, tmp_path, monkeypatch):
+    workerDir = __exitedWorker(tmp_path, tracker)
+    __restart()
+    from reconify import reconifySpool
+    from reconify import reconifyTransport
+    rename = os.rename
+    def lose(source, destination):
+        #another worker, here pid 1 which is always alive, claims the directory first
+        rename(source, source + '.1')
+        rename(source, destination)
+    monkeypatch.setattr(reconifySpool.os, 'rename', lose)
+    reconifyTransport.configure(spoolDir=str(tmp_path))
+    monkeypatch.undo()
+    assert reconifyTransport.stats()['gauges']['spoolBytes'] == 0
+    assert len(os.listdir(workerDir + '.1')) == 1
+
+def testFailedSpoolDoesNotStopTheForkReset(tmp_path, monkeypatch):
+    from reconify import reconifyMetrics
+    from reconify import reconifySpool
+    from reconify import reconifyTransport
+    reconifyTransport.configure(spoolDir=str(tmp_path))
+    def fail():
+        raise FileNotFoundError(str(tmp_path))
+    monkeypatch.setattr(reconifySpool, 'afterFork', fail)
+    lock = reconifyMetrics.__dict__['__lock']
+    #the metrics lock could have been held by another thread at the fork
+    pid = __fork(lambda: 0 if reconifyMetrics.__dict__['__lock'] is not lock else 1)
+    assert __exitCode(pid) == 0
+
+@pytest.mark.parametrize('module', ['reconifyWire', 'reconifyBedrockModels'])
+def testLocksHeldAtTheForkAreReplaced(module):
+    from reconify import reconifyBedrockModels
+    from reconify import reconifyWire
+    #importing the transport registers the fork hook
+    from reconify import reconifyTransport
+    def work():
+        #a deadlock ends the child with SIGALRM
+        signal.alarm(TIMEOUT)
+        reconifyWire.refuse('http://127.0.0.1:1/track', {'Content-Encoding': 'gzip'})
+        reconifyBedrockModels.register('test.')
+        return 0
+    lock = sys.modules['reconify.' + module].__dict__['__lock']
+    #another thread of the parent is in the middle of a call when it forks
+    with lock:
+        pid = __fork(work)
+    assert __exitCode(pid) == 0
+
+def testForkStartsDroppedCountsAtZero(tracker):
+    from reconify import reconifyTransport
+    standInServer.StandInHandler.statuses.append(400)
+    reconifyTransport.send(tracker.track, payload(0))
+    assert reconifyTransport.getDroppedCounts()['failed'] == 1
+    pid = __fork(lambda: 0 if sum(reconifyTransport.getDroppedCounts().values()) == 0 else 1)
+    assert __exitCode(pid) == 0
+    assert reconifyTransport.getDroppedCounts()['failed'] == 1
+
+def testSigtermDrainsTheQueue(tracker):
+    standInServer.StandInHandler.delay = 0.01
+    process = __sigterm(tracker, EVENTS, TIMEOUT)
+    assert process.stdout.readline().strip() == 'ready'
+    process.send_signal(signal.SIGTERM)
+    assert process.wait(TIMEOUT) == -signal.SIGTERM
+    assert [event['n'] for event in tracker.events()] == list(range(EVENTS))
+
+@pytest.mark.parametrize('held', ['reconifyTransport:__lock', 'reconifyMetrics:__lock'])
+def testSigtermWhileHoldingALockDoesNotHang(tracker, tmp_path, held):
+    standInServer.StandInHandler.delay = 0.05
+    started = time.monotonic()
+    #events left at the deadline are spooled, which counts them under the metrics lock
+    process = __sigterm(tracker, 10, 0.5, held, str(tmp_path))
+    assert process.wait(TIMEOUT) == -signal.SIGTERM
+    assert time.monotonic() - started < TIMEOUT / 2
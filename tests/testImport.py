@@ -0,0 +1,99 @@
+import gzip
+import json
+import time
+from benchmarks import standInServer
+
+#constants
+RECORDS = 50
+BATCH = 10
+
+def __record(n):
+    return {'request': {'messages': [{'role': 'user', 'content': str(n)}]}, 'response': {'text': 'ok'}, 'timestamps': {'request': 1700000000 + n}}
+
+def __lines(numbers):
+    return [json.dumps(__record(n)).encode('utf-8') + b'\n' for n in numbers]
+
+def __write(path, lines, compress=False):
+    opener = gzip.open if compress else open
+    with opener(path, 'wb') as f:
+        f.writelines(lines)
+    return str(path)
+
+def __sent(tracker):
+    #the records delivered so far, by number
+    return [int(event['request']['messages'][0]['content']) for event in tracker.events()]
+
+def __handler(tracker):
+    from reconify import reconifyUniversalHandler
+    reconifyUniversalHandler.config('test', 'test', tracker=tracker.track)
+    return reconifyUniversalHandler
+
+def __failBatch(monkeypatch, first):
+    #the batch that starts at record first is delivered last and fails, every other batch is sent
+    from reconify import reconifyImport
+    send = reconifyImport.__dict__['__send']
+    def flaky(url, bodies, retries):
+        if json.loads(bodies[0])['request']['messages'][0]['content'] == str(first):
+            time.sleep(0.2)
+            return False
+        return send(url, bodies, retries)
+    monkeypatch.setitem(reconifyImport.__dict__, '__send', flaky)
+
+def testCheckpointOnlyMovesPastDeliveredBatches(tracker, tmp_path, monkeypatch):
+    lines = __lines(range(RECORDS))
+    source = __write(tmp_path / 'chats.jsonl', lines)
+    checkpoint = str(tmp_path / 'chats.checkpoint')
+    handler = __handler(tracker)
+    __failBatch(monkeypatch, BATCH)
+    counts = handler.importChats(source, batchSize=BATCH, concurrency=4, retries=0, checkpoint=checkpoint)
+    #later batches were delivered while the second one failed, the checkpoint still stops before it
+    assert set(range(2 * BATCH, 3 * BATCH)) <= set(__sent(tracker))
+    assert not set(range(BATCH, 2 * BATCH)) & set(__sent(tracker))
+    assert counts['sent'] == BATCH
+    assert counts['complete'] is False
+    with open(checkpoint) as f:
+        assert json.load(f)['offset'] == sum(len(line) for line in lines[:BATCH])
+    monkeypatch.undo()
+    standInServer.reset()
+    counts = handler.importChats(source, batchSize=BATCH, concurrency=1, retries=0, checkpoint=checkpoint)
+    assert counts['resumedAt'] == sum(len(line) for line in lines[:BATCH])
+    assert counts['sent'] == RECORDS - BATCH
+    assert counts['complete'] is True
+    assert __sent(tracker) == list(range(BATCH, RECORDS))
+
+def testCheckpointOfAnotherSourceIsIgnored(tracker, tmp_path):
+    source = __write(tmp_path / 'chats.jsonl', __lines(range(RECORDS)))
+    checkpoint = str(tmp_path / 'chats.checkpoint')
+    with open(checkpoint, 'w') as f:
+        json.dump({'source': str(tmp_path / 'other.jsonl'), 'offset': 200}, f)
+    counts = __handler(tracker).importChats(source, batchSize=BATCH, concurrency=1, checkpoint=checkpoint)
+    assert counts['resumedAt'] == 0
+    assert counts['sent'] == RECORDS
+    assert __sent(tracker) == list(range(RECORDS))
+
+def testResumeAGzipFile(tracker, tmp_path, monkeypatch):
+    lines = __lines(range(RECORDS))
+    source = __write(tmp_path / 'chats.jsonl.gz', lines, compress=True)
+    checkpoint = str(tmp_path / 'chats.checkpoint')
+    handler = __handler(tracker)
+    __failBatch(monkeypatch, 2 * BATCH)
+    counts = handler.importChats(source, batchSize=BATCH, concurrency=1, retries=0, checkpoint=checkpoint)
+    assert counts['sent'] == 2 * BATCH
+    monkeypatch.undo()
+    standInServer.reset()
+    #the offset is in the decompressed file, it is decompressed again up to there
+    counts = handler.importChats(source, batchSize=BATCH, concurrency=1, retries=0, checkpoint=checkpoint)
+    assert counts['resumedAt'] == sum(len(line) for line in lines[:2 * BATCH])
+    assert counts['read'] == RECORDS - 2 * BATCH
+    assert __sent(tracker) == list(range(2 * BATCH, RECORDS))
+
+def testRecordsWithoutRequestOrResponseAreSkipped(tracker, tmp_path):
+    lines = __lines([0]) + [b'{"user": {"userId": "u1"}, "session": "s1"}\n', b'{"request": null, "response": null}\n',
+        b'not json\n', b'\n', b'[1, 2]\n'] + __lines([1])
+    source = __write(tmp_path / 'chats.jsonl', lines)
+    counts = __handler(tracker).importChats(source, concurrency=1)
+    #blank lines are not records at all
+    assert counts['read'] == 6
+    assert counts['skipped'] == 4
+    assert counts['sent'] == 2
+    assert __sent(tracker) == [0, 1]
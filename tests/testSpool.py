@@ -0,0 +1,179 @@
+import json
+import os
+import subprocess
+import sys
+import time
+import pytest
+from benchmarks import standInServer
+from conftest import ROOT
+from conftest import payload
+
+#constants
+EVENTS = 10
+TIMEOUT = 10
+#a process that spools events while the tracker is down and exits without shutting down, as on a crash
+CRASH = '''
+import json, os, sys
+from reconify import reconifyTransport
+spoolDir, url, events = sys.argv[1:]
+reconifyTransport.configure(spoolDir=spoolDir, retries=0, breakerThreshold=1000)
+for event in json.loads(events):
+    reconifyTransport.send(url, event)
+os._exit(0)
+'''
+
+def __down():
+    #failed posts are not recorded so only delivered events show up
+    handler = standInServer.StandInHandler
+    with handler.lock:
+        handler.keep = False
+        handler.status = 503
+
+def __up():
+    handler = standInServer.StandInHandler
+    with handler.lock:
+        handler.keep = True
+        handler.status = 200
+
+def __wait(tracker, count):
+    end = time.monotonic() + TIMEOUT
+    while len(tracker.events()) < count and time.monotonic() < end:
+        time.sleep(0.02)
+    #anything more would be a duplicate
+    time.sleep(0.2)
+    return [event['n'] for event in tracker.events()]
+
+def __crash(spoolDir, tracker, numbers):
+    env = dict(os.environ, PYTHONPATH=os.path.join(ROOT, 'src'))
+    events = json.dumps([payload(n) for n in numbers])
+    subprocess.run([sys.executable, '-c', CRASH, spoolDir, tracker.track, events], env=env, check=True, timeout=TIMEOUT)
+
+def __restart():
+    #the next import of reconify starts from a clean module state, as a new process would
+    for name in [n for n in sys.modules if n == 'reconify' or n.startswith('reconify.')]:
+        del sys.modules[name]
+
+def __lastSegment(spoolDir):
+    from reconify import reconifySpool
+    names = sorted(n for n in os.listdir(spoolDir) if n.startswith(reconifySpool.SEGMENT_PREFIX))
+    return os.path.join(spoolDir, names[-1])
+
+def testSpooledEventsAreReplayedInOrder(tracker, tmp_path):
+    from reconify import reconifyTransport
+    __down()
+    reconifyTransport.configure(spoolDir=str(tmp_path), retries=0, retryBackoff=0.01, breakerThreshold=1000)
+    for n in range(EVENTS):
+        reconifyTransport.send(tracker.track, payload(n))
+    assert reconifyTransport.stats()['gauges']['spoolBytes'] > 0
+    __up()
+    #events sent after recovery wait behind the spooled ones
+    reconifyTransport.send(tracker.track, payload(EVENTS))
+    assert __wait(tracker, EVENTS + 1) == list(range(EVENTS + 1))
+    assert sum(reconifyTransport.getDroppedCounts().values()) == 0
+
+def testReplayAfterRestart(tracker, tmp_path):
+    __down()
+    __crash(str(tmp_path), tracker, range(EVENTS))
+    from reconify import reconifyTransport
+    __up()
+    reconifyTransport.configure(spoolDir=str(tmp_path), retryBackoff=0.01)
+    assert __wait(tracker, EVENTS) == list(range(EVENTS))
+
+def testTornTailIsDropped(tracker, tmp_path):
+    __down()
+    __crash(str(tmp_path), tracker, range(EVENTS))
+    #a crash in the middle of the last write
+    segment = __lastSegment(str(tmp_path))
+    os.truncate(segment, os.path.getsize(segment) - 5)
+    from reconify import reconifyTransport
+    __up()
+    reconifyTransport.configure(spoolDir=str(tmp_path), retryBackoff=0.01)
+    reconifyTransport.send(tracker.track, payload(EVENTS))
+    assert __wait(tracker, EVENTS) == list(range(EVENTS - 1)) + [EVENTS]
+
+def testCorruptTailIsDropped(tracker, tmp_path):
+    __down()
+    __crash(str(tmp_path), tracker, range(EVENTS))
+    segment = __lastSegment(str(tmp_path))
+    with open(segment, 'r+b') as f:
+        f.seek(-3, os.SEEK_END)
+        f.write(b'???')
+    from reconify import reconifyTransport
+    __up()
+    reconifyTransport.configure(spoolDir=str(tmp_path), retryBackoff=0.01)
+    assert __wait(tracker, EVENTS - 1) == list(range(EVENTS - 1))
+
+def testReplayResumesFromCheckpoint(tracker, tmp_path):
+    from reconify import reconifySpool
+    __down()
+    __crash(str(tmp_path), tracker, range(EVENTS))
+    #an earlier process delivered the first record and crashed before the rest
+    reconifySpool.configure(spoolDir=str(tmp_path))
+    url, bodies, position = reconifySpool.read(1, 1024 * 1024)
+    reconifySpool.commit(position)
+    reconifySpool.close()
+    __restart()
+    from reconify import reconifyTransport
+    __up()
+    reconifyTransport.configure(spoolDir=str(tmp_path), retryBackoff=0.01)
+    assert __wait(tracker, EVENTS - 1) == list(range(1, EVENTS))
+
+def testRejectedEventsAreNotSpooled(tracker, tmp_path):
+    from reconify import reconifyTransport
+    standInServer.StandInHandler.statuses.append(413)
+    reconifyTransport.configure(spoolDir=str(tmp_path), retries=0, retryBackoff=0.01)
+    for n in range(EVENTS):
+        reconifyTransport.send(tracker.track, payload(n))
+    #the rejected event is posted once and the ones after it are not held up
+    assert __wait(tracker, EVENTS) == list(range(EVENTS))
+    assert reconifyTransport.stats()['gauges']['spoolBytes'] == 0
+    assert reconifyTransport.getDroppedCounts()['failed'] == 1
+
+def testRejectedSpooledEventsAreSkipped(tracker, tmp_path):
+    from reconify import reconifyTransport
+    __down()
+    reconifyTransport.configure(spoolDir=str(tmp_path), batchSize=1, retries=0, retryBackoff=0.01, breakerThreshold=1000)
+    for n in range(EVENTS):
+        reconifyTransport.send(tracker.track, payload(n))
+    #the tracker comes back and refuses the first spooled event, as it would one that is too large
+    handler = standInServer.StandInHandler
+    with handler.lock:
+        handler.statuses.append(413)
+        handler.keep = True
+        handler.status = 200
+    assert __wait(tracker, EVENTS) == list(range(EVENTS))
+    assert reconifyTransport.stats()['gauges']['spoolBytes'] == 0
+    assert reconifyTransport.getDroppedCounts()['failed'] == 1
+
+def testSpoolSizeCap(tracker, tmp_path):
+    from reconify import reconifyEncoder
+    from reconify import reconifySpool
+    from reconify import reconifyTransport
+    record = reconifySpool.RECORD_HEADER.size + len(tracker.track) + len(reconifyEncoder.encodePayload(payload(0)))
+    __down()
+    reconifyTransport.configure(spoolDir=str(tmp_path), spoolMaxBytes=3 * record, retries=0, retryBackoff=0.01, breakerThreshold=1000)
+    for n in range(EVENTS):
+        reconifyTransport.send(tracker.track, payload(n))
+    assert reconifyTransport.stats()['gauges']['spoolBytes'] == 3 * record
+    assert reconifyTransport.getDroppedCounts()['spoolFull'] == EVENTS - 3
+    __up()
+    assert __wait(tracker, 3) == [0, 1, 2]
+
+@pytest.mark.parametrize('policy, fsyncs', [('always', EVENTS), ('interval', 1), ('never', 0)])
+def testFsyncPolicies(tracker, tmp_path, monkeypatch, policy, fsyncs):
+    from reconify import reconifyEncoder
+    from reconify import reconifySpool
+    calls = []
+    fsync = os.fsync
+    monkeypatch.setattr(reconifySpool.os, 'fsync', lambda fd: calls.append(fd) or fsync(fd))
+    #the spool on its own, the replay thread of the transport would also sync when it reads
+    reconifySpool.configure(spoolDir=str(tmp_path), spoolFsync=policy, spoolFsyncInterval=3600)
+    for n in range(EVENTS):
+        assert reconifySpool.append(tracker.track, reconifyEncoder.encodePayload(payload(n)))
+    #one for each append, the first one of the interval, or none
+    assert len(calls) == fsyncs
+    reconifySpool.close()
+    __restart()
+    from reconify import reconifyTransport
+    reconifyTransport.configure(spoolDir=str(tmp_path), retryBackoff=0.01)
+    assert __wait(tracker, EVENTS) == list(range(EVENTS))
@@ -0,0 +1,75 @@
+import asyncio
+from types import SimpleNamespace
+import pytest
+from benchmarks import fakeClients
+
+def __chunk(content, finishReason=None):
+    delta = SimpleNamespace(role='assistant', content=content, tool_calls=None)
+    return SimpleNamespace(id='chatcmpl-1', model='gpt-4o', created=1, usage=None,
+        choices=[SimpleNamespace(index=0, delta=delta, finish_reason=finishReason)])
+
+def __streamClient(chunks):
+    client = fakeClients.openaiClient()
+    client.chat.completions.create = lambda **kwargs: iter(chunks)
+    return client
+
+def testInstrumentationErrorsDoNotBreakTheStream(tracker):
+    from reconify import reconifyOpenAIHandler
+    #a chunk the accumulator does not understand, choices is not a list
+    chunks = [__chunk('one '), SimpleNamespace(id='chatcmpl-1', usage=None, choices=5), __chunk('two', 'stop')]
+    client = __streamClient(chunks)
+    reconifyOpenAIHandler.config(client, 'test', 'test', tracker=tracker.track)
+    assert list(client.chat.completions.create(model='gpt-4o', messages=fakeClients.MESSAGES, stream=True)) == chunks
+    assert reconifyOpenAIHandler.flush(5)
+    #the stream could not be followed so it is not logged
+    assert tracker.events() == []
+
+def testLoggingErrorsDoNotBreakTheStream(tracker, monkeypatch):
+    from reconify import reconifyOpenAIHandler
+    from reconify import reconifyTransport
+    chunks = [__chunk('one '), __chunk('two', 'stop')]
+    client = __streamClient(chunks)
+    reconifyOpenAIHandler.config(client, 'test', 'test', tracker=tracker.track)
+    def fail(*args, **kwargs):
+        raise RuntimeError('send failed')
+    monkeypatch.setattr(reconifyTransport, 'send', fail)
+    stream = client.chat.completions.create(model='gpt-4o', messages=fakeClients.MESSAGES, stream=True)
+    assert list(stream) == chunks
+    stream.close()
+
+def testAsyncInstrumentationErrorsDoNotBreakTheStream(tracker, monkeypatch):
+    pytest.importorskip('openai')
+    from reconify import reconifyOpenAIHandler
+    from reconify import reconifyStream
+    client = fakeClients.asyncOpenaiClient()
+    reconifyOpenAIHandler.config(client, 'test', 'test', tracker=tracker.track)
+    def fail(self, chunk):
+        raise KeyError('choices')
+    monkeypatch.setattr(reconifyStream.ChatChunkAccumulator, 'add', fail)
+    async def call():
+        stream = await client.chat.completions.create(model='gpt-4o', messages=fakeClients.MESSAGES, stream=True)
+        return ''.join([chunk.choices[0].delta.content or '' async for chunk in stream])
+    assert asyncio.run(call()).strip() == fakeClients.CHAT_TEXT.strip()
+    assert reconifyOpenAIHandler.flush(5)
+    assert tracker.events() == []
+
+def testThinkingBlocksKeepTheirType():
+    from reconify import reconifyStream
+    accumulator = reconifyStream.AnthropicEventAccumulator()
+    events = [
+        {'type': 'message_start', 'message': {'id': 'msg_1', 'role': 'assistant', 'model': 'claude-sonnet-4', 'usage': {'input_tokens': 12}}},
+        {'type': 'content_block_start', 'index': 0, 'content_block': {'type': 'thinking', 'thinking': ''}},
+        {'type': 'content_block_delta', 'index': 0, 'delta': {'type': 'thinking_delta', 'thinking': 'The user wants '}},
+        {'type': 'content_block_delta', 'index': 0, 'delta': {'type': 'thinking_delta', 'thinking': 'a short answer.'}},
+        {'type': 'content_block_delta', 'index': 0, 'delta': {'type': 'signature_delta', 'signature': 'c2ln'}},
+        {'type': 'content_block_start', 'index': 1, 'content_block': {'type': 'redacted_thinking', 'data': 'ZW5j'}},
+        {'type': 'content_block_start', 'index': 2, 'content_block': {'type': 'text', 'text': ''}},
+        {'type': 'content_block_delta', 'index': 2, 'delta': {'type': 'text_delta', 'text': 'Foxes are quick.'}},
+        {'type': 'message_delta', 'delta': {'stop_reason': 'end_turn'}, 'usage': {'output_tokens': 30}},
+    ]
+    for event in events:
+        accumulator.add(event)
+    assert accumulator.result()['content'] == [
+        {'type': 'thinking', 'thinking': 'The user wants a short answer.', 'signature': 'c2ln'},
+        {'type': 'redacted_thinking', 'data': 'ZW5j'},
+        {'type': 'text', 'text': 'Foxes are quick.'}]
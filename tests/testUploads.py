@@ -0,0 +1,58 @@
+import base64
+import os
+import time
+import tracemalloc
+from types import SimpleNamespace
+import pytest
+from benchmarks import fakeClients
+from benchmarks import standInServer
+
+#constants
+IMAGE_BYTES = 4 * 1024 * 1024
+IMAGES = 4
+
+@pytest.fixture(scope='module')
+def uploader():
+    #in its own process so the bodies the stand-in reads are not traced with the uploads
+    process, url = standInServer.spawn()
+    yield url
+    process.terminate()
+
+def __images():
+    return [SimpleNamespace(b64_json=base64.b64encode(os.urandom(IMAGE_BYTES)).decode('ascii'), url=None, revised_prompt=None)
+        for _ in range(IMAGES)]
+
+def __peak(url, uploadFormat):
+    #peak memory allocated while a call that returns IMAGES images is logged and its uploads are sent
+    from reconify import reconifyOpenAIHandler
+    from reconify import reconifyTransport
+    images = __images()
+    client = fakeClients.openaiClient()
+    client.images.generate = lambda **kwargs: SimpleNamespace(created=int(time.time()), data=images)
+    reconifyOpenAIHandler.config(client, 'test', 'test', tracker=url + '/track', uploader=url + '/upload', uploadFormat=uploadFormat)
+    #the http client and serializers are loaded on the first send
+    client.chat.completions.create(model='gpt-4o', messages=fakeClients.MESSAGES)
+    assert reconifyTransport.flush(10)
+    standInServer.reset(url)
+    tracemalloc.start()
+    try:
+        client.images.generate(model='dall-e-3', prompt='a lighthouse', response_format='b64_json')
+        assert reconifyTransport.flush(30)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return peak, standInServer.snapshot(url)
+
+def testMultipartUploadsStreamEachImage(uploader):
+    peak, received = __peak(uploader, 'multipart')
+    #the image and the call event
+    assert received['requests'] == IMAGES + 1
+    assert received['bytes'] > IMAGES * IMAGE_BYTES
+    #the raw image is decoded a chunk at a time and never held in full, even with two uploads at once
+    assert peak < IMAGE_BYTES // 8
+
+def testJsonUploadsHoldTheEncodedImage(uploader):
+    #the measurement above would catch a body that is built in full
+    peak, received = __peak(uploader, 'b64_json')
+    assert received['requests'] == IMAGES + 1
+    assert peak > IMAGE_BYTES
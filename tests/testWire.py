@@ -0,0 +1,81 @@
+import gzip
+import json
+import pytest
+from benchmarks import standInServer
+from conftest import payload
+
+#constants
+EVENTS = 20
+
+def __posts(tracker, path='/track'):
+    #(content type, content encoding, body) of each post, the body is still encoded
+    return [(headers.get('Content-Type'), headers.get('Content-Encoding'), body) for p, headers, body in tracker.received(path)]
+
+def testCompressed415IsSentAgainAsJson(tracker):
+    from reconify import reconifyTransport
+    from reconify import reconifyWire
+    standInServer.StandInHandler.statuses.append(415)
+    reconifyTransport.configure(compression='gzip', compressionThreshold=0, retries=0)
+    reconifyTransport.send(tracker.track, payload(0, text='compressible ' * 100))
+    reconifyTransport.send(tracker.track, payload(1, text='compressible ' * 100))
+    refused, resent, later = __posts(tracker)
+    assert refused[:2] == ('application/json', 'gzip')
+    assert json.loads(gzip.decompress(refused[2]))['n'] == 0
+    #sent again at once, not counted as a retry or a failure
+    assert resent[:2] == ('application/json', None)
+    assert json.loads(resent[2])['n'] == 0
+    #every later request to that host skips compression
+    assert later[:2] == ('application/json', None)
+    assert json.loads(later[2])['n'] == 1
+    assert sum(reconifyTransport.getDroppedCounts().values()) == 0
+    assert not reconifyWire.accepts(tracker.upload)
+    assert reconifyWire.accepts('http://127.0.0.2:1/track')
+
+def testMsgpack415IsSentAgainAsJson(tracker):
+    msgpack = pytest.importorskip('msgpack')
+    from reconify import reconifyTransport
+    standInServer.StandInHandler.statuses.append(415)
+    reconifyTransport.configure(encoding='msgpack', compression='gzip', compressionThreshold=0, background=True, batch=True, batchLinger=0.02)
+    for n in range(EVENTS):
+        reconifyTransport.send(tracker.track, payload(n))
+    assert reconifyTransport.flush(5)
+    for n in range(EVENTS, 2 * EVENTS):
+        reconifyTransport.send(tracker.track, payload(n))
+    assert reconifyTransport.flush(5)
+    posts = __posts(tracker, '/track/batch')
+    contentType, encoding, body = posts[0]
+    assert (contentType, encoding) == ('application/msgpack', 'gzip')
+    refused = msgpack.unpackb(gzip.decompress(body))['events']
+    #the refused batch is converted to json, and so is everything after it, uncompressed
+    events = []
+    for contentType, encoding, body in posts[1:]:
+        assert (contentType, encoding) == ('application/json', None)
+        events.extend(json.loads(body)['events'])
+    assert events[:len(refused)] == refused
+    assert [event['n'] for event in events] == list(range(2 * EVENTS))
+    assert sum(reconifyTransport.getDroppedCounts().values()) == 0
+
+def testFramedMsgpackBatchRoundTrips(tracker):
+    msgpack = pytest.importorskip('msgpack')
+    from reconify import reconifyEncoder
+    from reconify import reconifyTransport
+    reconifyEncoder.configure(encoding='msgpack')
+    #past 15 events the array header takes two more bytes
+    for count in (1, 15, 16, EVENTS):
+        events = [payload(n, text='ünïcode', usage={'input': n}) for n in range(count)]
+        bodies = [reconifyEncoder.encodePayload(event) for event in events]
+        assert all(reconifyEncoder.isBinary(body) for body in bodies)
+        assert {reconifyEncoder.formatOf(body) for body in bodies} == {'openai'}
+        framed = reconifyEncoder.frame(bodies)
+        assert msgpack.unpackb(framed) == {'events': events}
+        assert json.loads(reconifyEncoder.toJson(framed)) == {'events': events}
+    #and through the batch endpoint
+    reconifyTransport.configure(encoding='msgpack', background=True, batch=True, batchLinger=0.02)
+    for n in range(EVENTS):
+        reconifyTransport.send(tracker.track, payload(n))
+    assert reconifyTransport.flush(5)
+    events = []
+    for contentType, encoding, body in __posts(tracker, '/track/batch'):
+        assert contentType == 'application/msgpack'
+        events.extend(msgpack.unpackb(body)['events'])
+    assert [event['n'] for event in events] == list(range(EVENTS))